@@ -0,0 +1,129 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the automaton that matches all regexes at once."""
+
+
+import contextlib
+import io
+import itertools
+import random
+import re
+import types
+import unittest
+
+from data import metrical_data
+from identify import automaton
+import pattern_bits
+
+
+def _FirstMatch(pattern, known_regexes):
+  for (regex, matches) in known_regexes:
+    if regex.match(pattern if hasattr(regex, 'pattern') else pattern_bits.FromString(pattern)):
+      return matches
+  return {}
+
+
+class KnownValues(unittest.TestCase):
+
+  def testFirstRegexWins(self):
+    regexes = [(re.compile('^(LG|GG)G$'), {'a': True}),
+               (re.compile('^..G$'), {'b': True}),
+               (re.compile('^()()$'), {'c': True})]
+    the_automaton = automaton.Automaton([('full', regexes)])
+    self.assertEqual(the_automaton.Matches(pattern_bits.FromString('LGG')), {'full': {'a': True}})
+    self.assertEqual(the_automaton.Matches(pattern_bits.FromString('LLG')), {'full': {'b': True}})
+    self.assertEqual(the_automaton.Matches(pattern_bits.FromString('')), {'full': {'c': True}})
+    self.assertEqual(the_automaton.Matches(pattern_bits.FromString('LLL')), {})
+    self.assertEqual(the_automaton.Matches(pattern_bits.FromString('LLGL')), {})
+
+  def testBounds(self):
+    self.assertEqual(automaton._Bounds(automaton._Parse('^L(G|LL.)$')), ((2, 4), (3, 5)))
+    self.assertEqual(automaton._Bounds(automaton._Parse('^()$')), ((0, 0), (0, 0)))
+    matcher = types.SimpleNamespace(match=lambda pattern: True, Bounds=lambda: ((2, 2), (4, 4)))
+    the_automaton = automaton.Automaton([('full', [(matcher, {'a': True})])])
+    self.assertEqual(the_automaton.Matches(pattern_bits.FromString('GG')), {'full': {'a': True}})
+    self.assertEqual(the_automaton.Matches(pattern_bits.FromString('GLL')), {})
+
+  def testUnsupported(self):
+    for regex in ['LG', '^L*$', '^LG|GL$', '^(LG$', '^LG)$']:
+      self.assertRaises(ValueError, automaton.Automaton,
+                        [('full', [(types.SimpleNamespace(pattern=regex), {})])])
+
+  def testSameAsRegexesInOrder(self):
+    with contextlib.redirect_stdout(io.StringIO()):
+      database = metrical_data.Default()
+    kinds = [('full', database.known_full_regexes),
+             ('half', database.known_half_regexes),
+             ('pada', database.known_pada_regexes)]
+    the_automaton = automaton.Automaton(kinds)
+    rng = random.Random(0)
+    for _ in range(3000):
+      length = rng.choice([8, 16, 32, rng.randint(0, 60)])
+      pattern = ''.join(rng.choice('LG') for _ in range(length))
+      got = the_automaton.Matches(pattern_bits.FromString(pattern))
+      for (kind, known_regexes) in kinds:
+        expected = _FirstMatch(pattern, known_regexes)
+        if expected:
+          self.assertIs(got.get(kind), expected)
+        else:
+          self.assertNotIn(kind, got)
+
+  def testPrefixLengths(self):
+    with contextlib.redirect_stdout(io.StringIO()):
+      database = metrical_data.Default()
+    the_automaton = automaton.Automaton([('full', database.known_full_regexes)])
+    rng = random.Random(0)
+    for _ in range(200):
+      pattern = pattern_bits.FromString(''.join(rng.choice('LG') for _ in range(rng.randint(0, 80))))
+      expected = [n for n in range(pattern_bits.Length(pattern) + 1)
+                  if 'full' in the_automaton.Matches(pattern_bits.Slice(pattern, 0, n))]
+      self.assertEqual(the_automaton.PrefixLengths(pattern, 'full'), expected)
+
+  def testCouldBegin(self):
+    regexes = [(re.compile('^(LG|GG)G$'), {'a': True}),
+               (re.compile('^L(L|GG.)$'), {'b': True})]
+    the_automaton = automaton.Automaton([('full', regexes)])
+    for length in range(5):
+      for pattern in [''.join(p) for p in itertools.product('LG', repeat=length)]:
+        expected = [matches for (regex, matches) in regexes
+                    if any(regex.match(pattern + ''.join(rest))
+                           for n in range(5) for rest in itertools.product('LG', repeat=n))]
+        bits = pattern_bits.FromString(pattern)
+        state_id = the_automaton.PrefixState(bits)
+        self.assertEqual(the_automaton.CouldBegin(state_id, bits, 'full'), expected, pattern)
+        next_weights = []
+        for (regex, matches) in regexes:
+          weights = set()
+          if regex.match(pattern):
+            weights.add(None)
+          for weight in [pattern_bits.LAGHU, pattern_bits.GURU]:
+            if any(regex.match(pattern + 'LG'[weight] + ''.join(rest))
+                   for n in range(4) for rest in itertools.product('LG', repeat=n)):
+              weights.add(weight)
+          if weights:
+            next_weights.append((matches, weights))
+        self.assertEqual(the_automaton.NextWeights(state_id, bits, 'full'), next_weights, pattern)
+
+  def testCouldBeginMatraMetres(self):
+    """Mātrā metres say whether they could begin with a pattern as their (huge) regexes do."""
+    with contextlib.redirect_stdout(io.StringIO()):
+      database = metrical_data.Default()
+    the_automaton = automaton.Automaton([('full', database.known_full_regexes)])
+    compiled = automaton.Automaton([('full', [
+        (regex if hasattr(regex, 'pattern') else re.compile(regex.Regex()), matches)
+        for (regex, matches) in database.known_full_regexes])])
+    rng = random.Random(0)
+    for _ in range(300):
+      pattern = pattern_bits.FromString(''.join(rng.choice('LG') for _ in range(rng.randint(0, 70))))
+      # Grown a few syllables at a time, continuing the walk.
+      state_id = None
+      for n in range(0, pattern_bits.Length(pattern) + 1, 7):
+        prefix = pattern_bits.Slice(pattern, 0, n)
+        state_id = the_automaton.PrefixState(prefix, state_id, max(n - 7, 0))
+        self.assertEqual(the_automaton.CouldBegin(state_id, prefix, 'full'),
+                         compiled.CouldBegin(compiled.PrefixState(prefix), prefix, 'full'),
+                         pattern_bits.ToString(prefix))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Compares reading Brahmic scripts with the one-pass decoders vs. the passes they replaced.
+
+Usage (from the top-level directory):
+     python -m benchmarks.brahmic_benchmark [--copies N] [GRETIL file ...]
+
+The verses of the files are read, written out (with transliteration.brahmic's
+encoders) in each script, and repeated N times (by default 20) to make a large
+corpus in each. Each line of it is then read to SLP1 with the script's decoder;
+for Devanāgarī and Kannada also with the old passes: Kannada to Devanāgarī,
+fixing up characters, mangling (consonant + vowel sign to consonant + virāma +
+vowel), and the Mangled Devanāgarī state machine. Checks that both give the same SLP1, and reports the throughput of each
+(the best of 3 runs).
+"""
+
+
+import argparse
+import contextlib
+import io
+import re
+import time
+
+import read.read
+import read.split_gretil
+from transliteration import brahmic
+from transliteration import transliterate
+from transliteration import transliterator
+
+
+# The passes, as they were (with what they needed from the devanagari module).
+
+_CONSONANTS = 'कखगघङचछजझञटठडढणतथदधनपफबभमयरलवशषसह'
+_VOWELS = 'अआइईउऊऋॠऌॡएऐओऔ'
+_VOWEL_SIGNS = 'ािीुूृॄॢॣेैोौ'
+_VIRAMA = '्'
+_MANGLED_DEVANAGARI_TO_SLP1_STATE_MACHINE = transliterator.MakeStateMachine(
+    transliterate._AlphabetToSLP1(list(_VOWELS + 'ंः') + [c + _VIRAMA for c in _CONSONANTS]))
+
+
+def _Mangle(text):
+  """consonant + vowel sign -> consonant + virāma + vowel, and consonant + [not virāma] -> consonant + virāma + 'a'."""
+  signs_to_vowels = dict(zip(_VOWEL_SIGNS, _VOWELS[1:]))
+  text = re.sub('([%s])([%s])' % (_CONSONANTS, _VOWEL_SIGNS),
+                lambda match: match.group(1) + _VIRAMA + signs_to_vowels[match.group(2)], text)
+  return re.sub('([%s])(?!%s)' % (_CONSONANTS, _VIRAMA), r'\g<1>%s%s' % (_VIRAMA, _VOWELS[0]), text)
+
+
+_KANNADA_TO_DEVANAGARI = transliterator.MakeStateMachine(dict(zip(
+    'ಅಆಇಈಉಊಋೠಎಏಐಒಓಔ' + 'ಂಃ' + 'ಕಖಗಘಙಚಛಜಝಞಟಠಡಢಣತಥದಧನಪಫಬಭಮಯರಲವಶಷಸಹಳಱೞ' + 'ಾಿೀುೂೃೄೆೇೈೊೋೌಂಃ್',
+    'अआइईउऊऋॠऎएऐऒओऔ' + 'ंः' + 'कखगघङचछजझञटठडढणतथदधनपफबभमयरलवशषसहळरळ' + 'ािीुूृॄॆेैॊोौंः्')))
+
+
+def _FixBadDevanagari(text):
+  text = text.replace('ऎ', 'ए')
+  text = text.replace('ऒ', 'ओ')
+  text = text.replace('ॆ', 'े')
+  text = text.replace('ॊ', 'ो')
+  text = text.replace('ळ', 'ल')
+  text = text.replace('ॐ', 'ओं')
+  text = text.replace(u'ᳲ', 'ः')
+  text = text.replace(u'ᳳ', 'ः')
+  text = text.replace(u'ᳵ', 'ः')
+  text = text.replace(u'ᳶ', 'ः')
+  return text
+
+
+def OldDevanagari(text):
+  return transliterator.Transliterate(_MANGLED_DEVANAGARI_TO_SLP1_STATE_MACHINE,
+                                      _Mangle(_FixBadDevanagari(text)), ' -?')
+
+
+def OldKannada(text):
+  text = transliterator.Transliterate(_KANNADA_TO_DEVANAGARI, text, ' -?')[0]
+  text = _FixBadDevanagari(text)
+  text = text.replace('s', 'ऽ')
+  return transliterator.Transliterate(_MANGLED_DEVANAGARI_TO_SLP1_STATE_MACHINE, _Mangle(text), ' -?')
+
+
+def _Corpus(filenames):
+  """The lines of the verses of the files, in SLP1."""
+  lines = []
+  for filename in filenames:
+    with contextlib.redirect_stdout(io.StringIO()):
+      (verses, _) = read.split_gretil.split(open(filename, encoding='utf-8').read())
+      for verse in verses:
+        lines.extend(read.read.read_text(verse)[1])
+  return lines
+
+
+def _Time(function, lines, runs=3):
+  times = []
+  for _ in range(runs):
+    start = time.perf_counter()
+    result = [function(line)[0] for line in lines]
+    times.append(time.perf_counter() - start)
+  return (result, min(times))
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--copies', type=int, default=20)
+  parser.add_argument('filenames', nargs='*',
+                      default=['texts/gretil_stats/bharst_u.htm', 'texts/gretil_stats/kmeghdpu.htm'])
+  args = parser.parse_args()
+  slp1_lines = _Corpus(args.filenames) * args.copies
+  old_passes = {'Devanagari': OldDevanagari, 'Kannada': OldKannada}
+  for script in brahmic.SCRIPTS:
+    decoder = brahmic.Decoder(script)
+    lines = [brahmic.Encoder(script).Encode(line, ' -?')[0] for line in slp1_lines]
+    num_chars = sum(len(line) for line in lines)
+    (got, new_time) = _Time(lambda line: decoder.Decode(line, ' -?'), lines)
+    print('%s: %d lines, %d characters' % (script, len(lines), num_chars))
+    if script in old_passes:
+      (expected, old_time) = _Time(old_passes[script], lines)
+      assert got == expected
+      print('  Old passes: %6.1f ms, %5.2f M characters/s (the same SLP1)' % (
+          old_time * 1000, num_chars / old_time / 1e6))
+    print('  Decoder:    %6.1f ms, %5.2f M characters/s' % (new_time * 1000, num_chars / new_time / 1e6))
+    if script in old_passes:
+      print('  Speedup:    %6.1fx' % (old_time / new_time))
+
+if __name__ == '__main__':
+  main()
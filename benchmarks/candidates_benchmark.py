@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Compares finding the metres that a partial verse could be in, with the pattern trie vs. by trying each metre.
+
+Usage (from the top-level directory):
+     python -m benchmarks.candidates_benchmark [GRETIL file]
+
+For every prefix of every verse of the file, the metres with a known full
+pattern beginning with it (and the weight each expects next) are found: with
+the data.pattern_trie.PatternTrie, both walking each prefix from the root and
+continuing the walk from the prefix one syllable shorter; by checking each known
+pattern in turn; and by aligning (with display._Align) the prefix to the start
+of each metre's pattern, which is so slow that it is only done for a few
+prefixes.
+"""
+
+
+import contextlib
+import io
+import sys
+import time
+
+from benchmarks import identify_benchmark
+from data import metrical_data
+from data import pattern_trie
+import display
+import pattern_bits
+
+
+def _TryingEach(prefix, entries):
+  """{metre name: next weights}, by checking each (pattern, free, metre name, value) entry."""
+  n = pattern_bits.Length(prefix)
+  expected = {}
+  for (pattern, free, metre_name, _) in entries:
+    length = pattern_bits.Length(pattern)
+    if length < n:
+      continue
+    mask = (free >> (length - n)) ^ (1 << n)
+    if (pattern >> (length - n)) & ~mask != prefix & ~mask:
+      continue
+    weights = expected.setdefault(metre_name, set())
+    if length == n:
+      weights.add(pattern_trie.END)
+    elif (free >> (length - n - 1)) & 1:
+      weights.update([pattern_bits.LAGHU, pattern_bits.GURU])
+    else:
+      weights.add((pattern >> (length - n - 1)) & 1)
+  return expected
+
+
+def _Aligning(prefix, pattern_for_metre):
+  """The metres whose pattern begins like prefix, by aligning it to the start of each."""
+  verse = pattern_bits.ToString(prefix)
+  found = []
+  for (metre_name, pada_patterns) in pattern_for_metre.items():
+    metre = ''.join(pada_patterns)[:len(verse)]
+    (aligned_verse, aligned_metre) = display._Align(verse, metre)
+    if all(v == m or m == '.' for (v, m) in zip(aligned_verse, aligned_metre)):
+      found.append(metre_name)
+  return found
+
+
+def main():
+  filename = sys.argv[1] if len(sys.argv) > 1 else 'texts/gretil_stats/kmeghdpu.htm'
+  with contextlib.redirect_stdout(io.StringIO()):
+    database = metrical_data.Default()
+  entries = database.known_full_patterns.Entries()
+  verses = [pattern_bits.Join(pattern_lines) for pattern_lines in identify_benchmark._PatternLinesOfVerses(filename)]
+  prefixes = [pattern_bits.Slice(verse, 0, n) for verse in verses for n in range(pattern_bits.Length(verse) + 1)]
+
+  start = time.perf_counter()
+  trie = pattern_trie.PatternTrie(entries)
+  build_time = time.perf_counter() - start
+
+  start = time.perf_counter()
+  from_root = [trie.NextWeights(trie.Walk(prefix)) for prefix in prefixes]
+  from_root_time = time.perf_counter() - start
+
+  start = time.perf_counter()
+  continued = []
+  for verse in verses:
+    nodes = trie.Walk(pattern_bits.EMPTY)
+    continued.append(trie.NextWeights(nodes))
+    for n in range(1, pattern_bits.Length(verse) + 1):
+      nodes = trie.Walk(pattern_bits.Slice(verse, 0, n), nodes, n - 1)
+      continued.append(trie.NextWeights(nodes))
+  continued_time = time.perf_counter() - start
+
+  start = time.perf_counter()
+  trying_each = [_TryingEach(prefix, entries) for prefix in prefixes]
+  trying_each_time = time.perf_counter() - start
+  assert from_root == continued == trying_each
+
+  num_aligned = min(20, len(prefixes))
+  start = time.perf_counter()
+  for prefix in prefixes[:num_aligned]:
+    _Aligning(prefix, database.pattern_for_metre)
+  align_time = time.perf_counter() - start
+
+  print('%d verses, %d prefixes, %d known patterns (%d trie nodes): the same metres from all' % (
+      len(verses), len(prefixes), len(entries), trie.NumNodes()))
+  print('Candidates per prefix: %.1f on average' % (sum(len(found) for found in trying_each) / len(prefixes)))
+  print('Building the trie:  %9.1f ms' % (build_time * 1000))
+  print('Trie, from root:    %9.3f ms per prefix' % (from_root_time * 1000 / len(prefixes)))
+  print('Trie, continued:    %9.3f ms per prefix' % (continued_time * 1000 / len(prefixes)))
+  print('Trying each:        %9.3f ms per prefix' % (trying_each_time * 1000 / len(prefixes)))
+  print('Aligning each:      %9.3f ms per prefix' % (align_time * 1000 / num_aligned))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Compares detecting the input scheme by counting characteristic characters vs. by the first one found.
+
+Usage (from the top-level directory):
+     python -m benchmarks.detect_benchmark [GRETIL file ...]
+
+Each file (cleaned up as for reading) is written out in each Brahmic script too,
+and the scheme of each such text, repeated 1, 10 and 100 times, is detected
+with transliteration.detect and with the detector it replaced (a regex search
+for each scheme in turn, over all of the text, taking the first that matches).
+Reports the time for each (the best of 3 runs), the scheme each found and the
+confidence of the new one. The same is done for each verse of the files. Then
+for text with a few characters of another scheme, to show how each decides.
+"""
+
+
+import contextlib
+import io
+import re
+import sys
+import time
+
+import read.read
+import read.split_gretil
+from transliteration import brahmic
+from transliteration import detect
+
+
+# The detector, as it was.
+
+def _BlockRange(script):
+  start = brahmic.BLOCK_STARTS[script]
+  return '%s-%s%s-%s' % (chr(start), chr(start + 0x63), chr(start + 0x70), chr(start + brahmic.BLOCK_SIZE - 1))
+
+
+_BRAHMIC_ORDER = ['Tamil', 'Grantha', 'Kannada', 'Telugu', 'Malayalam', 'Bengali', 'Gujarati', 'Oriya',
+                  'Devanagari']
+_CHARACTERISTIC_BRAHMIC = re.compile('[%s]' % ''.join(_BlockRange(script) for script in _BRAHMIC_ORDER))
+_CHARACTERISTIC_SCRIPT = [(re.compile('[%s]' % _BlockRange(script)), getattr(detect.TRANSLITERATION_SCHEME, script))
+                          for script in _BRAHMIC_ORDER]
+_CHARACTERISTIC_IAST = re.compile('[āīūṛṝḷḹṃḥṅñṭḍṇśṣ]')
+_CHARACTERISTIC_ITRANS = re.compile(r'aa|ii|uu|[RrLl]\^[Ii]|RR[Ii]|LL[Ii]|~N|Ch|~n|N\^|Sh|sh')
+
+
+def OldDetect(text):
+  if _CHARACTERISTIC_BRAHMIC.search(text):
+    for (characteristic, scheme) in _CHARACTERISTIC_SCRIPT:
+      if characteristic.search(text):
+        return scheme
+  if _CHARACTERISTIC_IAST.search(text):
+    return detect.TRANSLITERATION_SCHEME.IAST
+  if _CHARACTERISTIC_ITRANS.search(text):
+    return detect.TRANSLITERATION_SCHEME.ITRANS
+  return detect.TRANSLITERATION_SCHEME.HK
+
+
+def _Time(function, texts, runs=3):
+  times = []
+  for _ in range(runs):
+    start = time.perf_counter()
+    result = [function(text) for text in texts]
+    times.append(time.perf_counter() - start)
+  return (result, min(times))
+
+
+def _Texts(filenames):
+  """{name: (whole text, [its verses])}, for the files as they are and written in each Brahmic script."""
+  texts = {}
+  for filename in filenames:
+    with contextlib.redirect_stdout(io.StringIO()):
+      (verses, _) = read.split_gretil.split(open(filename, encoding='utf-8').read())
+      verses = [read.read.preprocess_and_detect(verse)[0] for verse in verses]
+      texts[filename] = ('\n'.join(verses), verses)
+      slp1_verses = ['\n'.join(read.read.read_text(verse)[1]) for verse in verses]
+    for script in brahmic.SCRIPTS:
+      encoded = [brahmic.Encoder(script).Encode(verse, ' -?\n')[0] for verse in slp1_verses]
+      texts['%s in %s' % (filename, script)] = ('\n'.join(encoded), encoded)
+  return texts
+
+
+def main():
+  filenames = sys.argv[1:] or ['texts/gretil_stats/bharst_u.htm', 'texts/gretil_stats/kmeghdpu.htm']
+  print('%-46s %7s %9s %9s  %-10s %-10s %s' % ('Text', 'Copies', 'Old (ms)', 'New (ms)', 'Old', 'New', 'Confidence'))
+  for (name, (text, verses)) in _Texts(filenames).items():
+    for copies in [1, 10, 100]:
+      ([old], old_time) = _Time(OldDetect, [text * copies])
+      ([(new, confidence)], new_time) = _Time(detect.detect_scheme_and_confidence, [text * copies])
+      print('%-46s %7d %9.3f %9.3f  %-10s %-10s %.3f' % (
+          name, copies, old_time * 1000, new_time * 1000,
+          detect.scheme_name(old), detect.scheme_name(new), confidence))
+    (old, old_time) = _Time(OldDetect, verses)
+    (new, new_time) = _Time(detect.detect_transliteration_scheme, verses)
+    print('%-46s %7s %9.3f %9.3f  %d of %d verses the same' % (
+        '  each verse', '', old_time * 1000 / len(verses), new_time * 1000 / len(verses),
+        sum(a == b for (a, b) in zip(old, new)), len(verses)))
+
+  print('Mixed text:')
+  for text in ['karmaṇyevādhikāraste mā phaleṣu kadācana (कर्म)',
+               'कर्मण्येवाधिकारस्ते मा फलेषु कदाचन (karmaṇi)']:
+    (new, confidence) = detect.detect_scheme_and_confidence(text)
+    print('  %s\n    old: %s, new: %s (confidence %.2f)' % (
+        text, detect.scheme_name(OldDetect(text)), detect.scheme_name(new), confidence))
+
+
+if __name__ == '__main__':
+  main()
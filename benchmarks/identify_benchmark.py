@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Compares matching parts of verses against the regexes one by one vs. with the automaton.
+
+Usage (from the top-level directory):
+     python -m benchmarks.identify_benchmark [GRETIL file]
+
+Counts regex evaluations per verse for the one-by-one approach (the automaton
+makes none, though it still calls matchers that are not regexes, like the mātrā
+metres, when a part's length and mātrās are within their bounds), and times
+both on all parts of all verses in the file.
+
+Also compares identifying the verses one at a time with Identifier.IdentifyMany,
+which matches each distinct part only once, and with the cache of results
+(first empty, then full).
+"""
+
+
+import contextlib
+import io
+import sys
+import time
+
+from data import metrical_data
+from identify import identifier
+import pattern_bits
+import read.read
+import read.split_gretil
+import scan
+
+
+def _PatternLinesOfVerses(filename):
+  with contextlib.redirect_stdout(io.StringIO()):
+    (verses, _) = read.split_gretil.split(open(filename, encoding='utf-8').read())
+  all_pattern_lines = []
+  for verse in verses:
+    (cleaned_lines, _) = read.read.read_text(verse)
+    pattern_lines = scan.ScanVerse(cleaned_lines)
+    if pattern_lines and len(pattern_lines) <= 12:
+      all_pattern_lines.append(pattern_lines)
+  return all_pattern_lines
+
+
+class _CountingMatcher(object):
+  """Wraps a matcher that is not a regex, counting calls."""
+
+  def __init__(self, matcher, counter):
+    self.matcher = matcher
+    self.counter = counter
+
+  def Bounds(self):
+    return self.matcher.Bounds()
+
+  def match(self, pattern):
+    self.counter[0] += 1
+    return self.matcher.match(pattern)
+
+
+def _MatchesOneByOne(pattern, known_patterns, known_regexes, counter):
+  matches = known_patterns.Get(pattern)
+  if matches is not None:
+    return matches
+  for (regex, matches) in known_regexes:
+    is_regex = hasattr(regex, 'pattern')
+    counter[is_regex] += 1
+    if regex.match(pattern_bits.ToString(pattern) if is_regex else pattern):
+      return matches
+  return {}
+
+
+def main():
+  filename = sys.argv[1] if len(sys.argv) > 1 else 'texts/gretil_stats/bharst_u.htm'
+  with contextlib.redirect_stdout(io.StringIO()):
+    database = metrical_data.LoadDatabase()
+  other_counter = [0]
+  def Counting(known_regexes):
+    return [(regex if hasattr(regex, 'pattern') else _CountingMatcher(regex, other_counter), matches)
+            for (regex, matches) in known_regexes]
+  database = metrical_data.MetreDatabase(
+    known_full_patterns=database.known_full_patterns,
+    known_full_regexes=Counting(database.known_full_regexes),
+    known_half_patterns=database.known_half_patterns,
+    known_half_regexes=Counting(database.known_half_regexes),
+    known_pada_patterns=database.known_pada_patterns,
+    known_pada_regexes=Counting(database.known_pada_regexes),
+    pattern_for_metre=database.pattern_for_metre,
+    all_data=database.all_data)
+  the_identifier = identifier.Identifier(database, cache_size=0)
+  verses = _PatternLinesOfVerses(filename)
+  parts = [[pattern for (_, patterns) in identifier._Parts(pattern_lines) for pattern in patterns]
+           for pattern_lines in verses]
+  num_parts = sum(len(verse_parts) for verse_parts in parts)
+
+  kinds = [(database.known_full_patterns, database.known_full_regexes),
+           (database.known_half_patterns, database.known_half_regexes),
+           (database.known_pada_patterns, database.known_pada_regexes)]
+  counter = [0, 0]  # Other matchers, regexes
+  start = time.perf_counter()
+  expected = [[_MatchesOneByOne(pattern, known_patterns, known_regexes, counter)
+               for (known_patterns, known_regexes) in kinds]
+              for verse_parts in parts for pattern in verse_parts]
+  one_by_one_time = time.perf_counter() - start
+
+  def WithAutomaton():
+    got = []
+    for verse_parts in parts:
+      for pattern in verse_parts:
+        matches = the_identifier._MatchesFor(pattern)
+        got.append([matches['full'], matches['half'], matches['pada']])
+    return got
+  other_counter[0] = 0
+  start = time.perf_counter()
+  assert WithAutomaton() == expected
+  automaton_time = time.perf_counter() - start
+  other_calls = other_counter[0]
+  # Again, now that the states the text needs have been created.
+  start = time.perf_counter()
+  WithAutomaton()
+  warm_automaton_time = time.perf_counter() - start
+
+  start = time.perf_counter()
+  one_at_a_time = [the_identifier.Identify(pattern_lines).matches for pattern_lines in verses]
+  identify_time = time.perf_counter() - start
+  start = time.perf_counter()
+  batch = [identification.matches for identification in the_identifier.IdentifyMany(verses)]
+  identify_many_time = time.perf_counter() - start
+  assert batch == one_at_a_time
+  cached_identifier = identifier.Identifier(database)
+  cached_times = []
+  for _ in range(2):
+    start = time.perf_counter()
+    for pattern_lines in verses:
+      cached_identifier.Identify(pattern_lines)
+    cached_times.append(time.perf_counter() - start)
+  num_distinct_parts = len(set(pattern for verse_parts in parts for pattern in verse_parts))
+
+  print('%d verses, %d parts (%d distinct)' % (len(verses), num_parts, num_distinct_parts))
+  print('Regex evaluations per verse: %.1f one by one, 0 with the automaton' % (counter[1] / len(verses)))
+  print('Other matcher calls per verse: %.1f one by one, %.1f with the automaton' % (
+      counter[0] / len(verses), other_calls / len(verses)))
+  print('One by one: %7.1f ms' % (one_by_one_time * 1000))
+  print('Automaton:  %7.1f ms (creating %d states), then %.1f ms' % (
+      automaton_time * 1000, the_identifier.automaton.NumStates(), warm_automaton_time * 1000))
+  print('Identify each verse: %7.1f ms' % (identify_time * 1000))
+  print('IdentifyMany:        %7.1f ms' % (identify_many_time * 1000))
+  print('With a cache:        %7.1f ms, then %.1f ms %s' % (
+      cached_times[0] * 1000, cached_times[1] * 1000, cached_identifier.CacheStats()))
+
+
+if __name__ == '__main__':
+  main()
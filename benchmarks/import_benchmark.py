@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Times importing the modules that every process needs, and the first use of each transliteration scheme.
+
+Usage (from the top-level directory):
+     python -m benchmarks.import_benchmark [--runs N] [module ...]
+
+Each module (by default transliteration.transliterate, and sscan and
+identifier_pipeline, which import it) is imported in a new Python process with
+-X importtime, N times (by default 10). For this repository's own modules, the
+best of those runs of the time spent in each (itself, and with what it imports)
+is reported. Then the time that the first use of each transliteration scheme
+takes in this process, for making its state machine or decoder, is reported.
+"""
+
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+from transliteration import brahmic
+from transliteration import detect
+from transliteration import transliterate
+
+
+_IMPORT_TIME_LINE = re.compile(r'import time:\s*(\d+) \|\s*(\d+) \| (\s*)(\S+)')
+
+
+def _ImportTimes(module, runs):
+  """{imported module: (best self time, best cumulative time, depth)}, in microseconds, in order of import."""
+  best = {}
+  for _ in range(runs):
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+    for match in _IMPORT_TIME_LINE.finditer(output):
+      (self_time, cumulative, indent, name) = match.groups()
+      (best_self, best_cumulative, _) = best.get(name, (float('inf'), float('inf'), 0))
+      best[name] = (min(best_self, int(self_time)), min(best_cumulative, int(cumulative)), len(indent) // 2)
+  return best
+
+
+def _IsOurs(name):
+  top = name.split('.')[0]
+  return os.path.exists(top + '.py') or os.path.isdir(top)
+
+
+def _FirstUse(function):
+  start = time.perf_counter()
+  function()
+  return time.perf_counter() - start
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--runs', type=int, default=10)
+  parser.add_argument('modules', nargs='*', default=['transliteration.transliterate', 'sscan', 'identifier_pipeline'])
+  args = parser.parse_args()
+  for module in args.modules:
+    times = _ImportTimes(module, args.runs)
+    print('import %s: %.1f ms in all (best of %d runs)' % (module, times[module][1] / 1000, args.runs))
+    print('  %-44s %9s %11s' % ('', 'Self (ms)', 'Cumul. (ms)'))
+    for (name, (self_time, cumulative, depth)) in reversed(list(times.items())):
+      if _IsOurs(name):
+        print('  %-44s %9.2f %11.2f' % ('  ' * depth + name, self_time / 1000, cumulative / 1000))
+
+  print('First use of each scheme (making its state machine or decoder):')
+  for (name, state_machine) in [('HK', transliterate._HK_TO_SLP1_STATE_MACHINE),
+                                ('IAST', transliterate._IAST_TO_SLP1_STATE_MACHINE),
+                                ('ITRANS', transliterate._ITRANS_TO_SLP1_STATE_MACHINE),
+                                ('SLP1 to IAST', transliterate._SLP1_TO_IAST_STATE_MACHINE)]:
+    assert not state_machine.IsMade()
+    print('  %-24s %6.3f ms' % (name, _FirstUse(state_machine.Get) * 1000))
+  for script in brahmic.SCRIPTS:
+    print('  %-24s %6.3f ms' % (script, _FirstUse(lambda: brahmic.Decoder(script)) * 1000))
+  print('  %-24s %6.3f ms' % ('SLP1 to Devanagari', _FirstUse(lambda: brahmic.Encoder('Devanagari')) * 1000))
+  assert transliterate.TransliterateFrom('rAma', detect.TRANSLITERATION_SCHEME.HK) == ('rAma', set())
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Times identifying verses as they are typed, with the IncrementalPipeline vs. from scratch.
+
+Usage (from the top-level directory):
+     python -m benchmarks.incremental_benchmark [GRETIL file]
+
+Each verse of the file is "typed" one character at a time, and after each
+character the text so far is given to the IncrementalPipeline, and to the
+IdentifierPipeline (which reads, scans and identifies it all again) for
+comparison. Checks that both find the same exact matches for each whole verse.
+"""
+
+
+import contextlib
+import io
+import sys
+import time
+
+from data import metrical_data
+import identifier_pipeline
+import read.split_gretil
+
+
+def _Percentile(sorted_times, fraction):
+  return sorted_times[min(int(fraction * len(sorted_times)), len(sorted_times) - 1)]
+
+
+def _Report(name, times):
+  times = sorted(times)
+  print('%-12s median %6.3f ms, 90%% %6.3f ms, 99%% %6.3f ms, max %7.3f ms' % (
+      name, _Percentile(times, 0.5) * 1000, _Percentile(times, 0.9) * 1000,
+      _Percentile(times, 0.99) * 1000, times[-1] * 1000))
+
+
+def main():
+  filename = sys.argv[1] if len(sys.argv) > 1 else 'texts/gretil_stats/kmeghdpu.htm'
+  with contextlib.redirect_stdout(io.StringIO()):
+    database = metrical_data.Default()
+    (verses, _) = read.split_gretil.split(open(filename, encoding='utf-8').read())
+  incremental = identifier_pipeline.IncrementalPipeline(database)
+  pipeline = identifier_pipeline.IdentifierPipeline(database)
+
+  incremental_times = []
+  scratch_times = []
+  for verse in verses:
+    for i in range(1, len(verse) + 1):
+      start = time.perf_counter()
+      typed = incremental.Identify(verse[:i])
+      incremental_times.append(time.perf_counter() - start)
+      start = time.perf_counter()
+      result = pipeline.IdentifyFromText(verse[:i])
+      scratch_times.append(time.perf_counter() - start)
+    identification = result.identification
+    expected = list(identification.matches.get('exact', [])) if identification else []
+    assert typed.exact == expected, (verse, typed.exact, expected)
+
+  print('%d verses, %d keystrokes: the same exact matches from both' % (len(verses), len(incremental_times)))
+  _Report('Incremental:', incremental_times)
+  _Report('Scratch:', scratch_times)
+  print('Caches:', incremental.CacheStats())
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Compares checking the Āryā family by mātrā counting vs. with the equivalent regexes.
+
+Usage (from the top-level directory):
+     python -m benchmarks.matra_benchmark [GRETIL file]
+
+Reports the time and memory to set up each, and the time per match on the full
+patterns of the verses in the file.
+"""
+
+
+import contextlib
+import io
+import re
+import sys
+import time
+import tracemalloc
+
+from data import matra
+from data import metrical_data
+import pattern_bits
+from benchmarks.identify_benchmark import _PatternLinesOfVerses
+
+
+def _TimeAndMemory(function):
+  tracemalloc.start()
+  start = time.perf_counter()
+  result = function()
+  elapsed = time.perf_counter() - start
+  (_, peak) = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return (result, elapsed, peak)
+
+
+def main():
+  filename = sys.argv[1] if len(sys.argv) > 1 else 'texts/gretil_stats/bharst_u.htm'
+  with contextlib.redirect_stdout(io.StringIO()):
+    database = metrical_data.LoadDatabase()
+  metres = [metre for (metre, _) in database.known_full_regexes
+            if isinstance(metre, matra.MatraMetre)]
+  sources = [metre.Regex() for metre in metres]
+
+  re.purge()
+  (regexes, regex_time, regex_memory) = _TimeAndMemory(
+      lambda: [re.compile(source) for source in sources])
+  (new_metres, matra_time, matra_memory) = _TimeAndMemory(
+      lambda: [matra.MatraMetre(metre.name, metre.padas) for metre in metres])
+  print('Setting up %d metres:' % len(metres))
+  print('  Regexes:        %8.1f ms, %8.1f KB' % (regex_time * 1000, regex_memory / 1024))
+  print('  Mātrā counting: %8.1f ms, %8.1f KB' % (matra_time * 1000, matra_memory / 1024))
+
+  patterns = [pattern_bits.Join(pattern_lines) for pattern_lines in _PatternLinesOfVerses(filename)]
+  pattern_strings = [pattern_bits.ToString(pattern) for pattern in patterns]
+  num_calls = len(patterns) * len(metres)
+  start = time.perf_counter()
+  expected = [bool(regex.match(pattern)) for regex in regexes for pattern in pattern_strings]
+  regex_time = time.perf_counter() - start
+  start = time.perf_counter()
+  got = [bool(metre.match(pattern)) for metre in new_metres for pattern in patterns]
+  matra_time = time.perf_counter() - start
+  assert got == expected
+  print('Matching %d verses (%d matches found):' % (len(patterns), sum(got)))
+  print('  Regexes:        %8.2f µs per match' % (regex_time * 1e6 / num_calls))
+  print('  Mātrā counting: %8.2f µs per match' % (matra_time * 1e6 / num_calls))
+
+
+if __name__ == '__main__':
+  main()
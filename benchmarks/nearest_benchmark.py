@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Compares finding the metres nearest a verse with a few wrong syllables, with the index vs. by scanning.
+
+Usage (from the top-level directory):
+     python -m benchmarks.nearest_benchmark [GRETIL file] [--errors N]
+
+Each verse of the file gets N random syllable changes, insertions or deletions,
+and then the metres within N edits of it are found: with the BK-tree of
+identify/nearest.py, by computing the (bit-parallel) distance to every metre's
+pattern (with its free syllables), and by aligning (with display._Align) to every metre's pattern, which
+is so slow that it is only done for a few verses.
+"""
+
+
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from benchmarks import identify_benchmark
+from data import metrical_data
+import display
+from identify import nearest
+import pattern_bits
+
+
+def _WithErrors(pattern, num_errors, rng):
+  syllables = list(pattern_bits.ToString(pattern))
+  for _ in range(num_errors):
+    i = rng.randrange(len(syllables))
+    change = rng.choice(['change', 'insert', 'delete'])
+    if change == 'change':
+      syllables[i] = 'L' if syllables[i] == 'G' else 'G'
+    elif change == 'insert':
+      syllables.insert(i, rng.choice('LG'))
+    else:
+      del syllables[i]
+  return pattern_bits.FromString(''.join(syllables))
+
+
+def _AlignDistance(verse, metre):
+  (aligned_verse, aligned_metre) = display._Align(verse, metre)
+  return sum(1 for (v, m) in zip(aligned_verse, aligned_metre) if v != m and m != '.')
+
+
+def main():
+  argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  argument_parser.add_argument('filename', nargs='?', default='texts/gretil_stats/bharst_u.htm')
+  argument_parser.add_argument('--errors', type=int, default=2)
+  args = argument_parser.parse_args()
+
+  with contextlib.redirect_stdout(io.StringIO()):
+    database = metrical_data.Default()
+  rng = random.Random(0)
+  verses = [_WithErrors(pattern_bits.Join(pattern_lines), args.errors, rng)
+            for pattern_lines in identify_benchmark._PatternLinesOfVerses(args.filename)]
+
+  entries = [(pattern, free, metre_name) for (pattern, free, metre_name, _) in database.known_full_patterns.Entries()]
+  start = time.perf_counter()
+  index = nearest.NearestMetreIndex(entries)
+  build_time = time.perf_counter() - start
+
+  start = time.perf_counter()
+  searched = [index.Search(verse, args.errors) for verse in verses]
+  search_time = time.perf_counter() - start
+  num_tried = sum(tried for (_, tried) in searched)
+
+  patterns = [(nearest._Pattern(nearest._WithFreeSyllables(pattern, free)), metre_name)
+              for (pattern, free, metre_name) in entries]
+  start = time.perf_counter()
+  for (verse, (found, _)) in zip(verses, searched):
+    distance_for_metre = {}
+    for (pattern, metre_name) in patterns:
+      distance = pattern.Distance(verse)
+      distance_for_metre[metre_name] = min(distance, distance_for_metre.get(metre_name, distance))
+    assert found == sorted((distance, metre_name) for (metre_name, distance) in distance_for_metre.items()
+                           if distance <= args.errors)
+  scan_time = time.perf_counter() - start
+
+  num_aligned = min(5, len(verses))
+  start = time.perf_counter()
+  for verse in verses[:num_aligned]:
+    for (pattern, _) in patterns:
+      _AlignDistance(pattern_bits.ToString(verse), pattern.pattern)
+  align_time = time.perf_counter() - start
+
+  print('%d verses with %d errors each, %d metres (%d distinct patterns)' % (
+      len(verses), args.errors, len(set(metre_name for (_, metre_name) in patterns)), index.num_patterns))
+  print('Verses with a metre within %d errors: %d' % (
+      args.errors, sum(1 for (found, _) in searched if found)))
+  print('Building the index: %7.1f ms' % (build_time * 1000))
+  print('BK-tree:            %7.3f ms per verse (%.1f distances)' % (
+      search_time * 1000 / len(verses), num_tried / len(verses)))
+  print('Scanning:           %7.3f ms per verse (%d distances)' % (
+      scan_time * 1000 / len(verses), len(patterns)))
+  print('Aligning each:      %7.3f ms per verse' % (align_time * 1000 / num_aligned))
+
+
+if __name__ == '__main__':
+  main()
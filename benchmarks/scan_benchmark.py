@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Compares the table-driven scanner with the regex one it replaced (kept in scan_test).
+
+Usage (from the top-level directory):
+     python -m benchmarks.scan_benchmark [GRETIL file ...]
+
+Checks that both give the same patterns for every verse of the files, and times
+scanning all of them with each.
+"""
+
+
+import contextlib
+import io
+import sys
+import time
+
+import read.read
+import read.split_gretil
+import scan
+from scan_test import RegexScanVerse
+import slp1
+
+
+def CleanedLinesOfVerses(filename):
+  with contextlib.redirect_stdout(io.StringIO()):
+    (verses, _) = read.split_gretil.split(open(filename, encoding='utf-8').read())
+  return [read.read.read_text(verse)[0] for verse in verses]
+
+
+def _Time(function, runs=5):
+  times = []
+  for _ in range(runs):
+    start = time.perf_counter()
+    result = function()
+    times.append(time.perf_counter() - start)
+  return (result, min(times))
+
+
+def main():
+  filenames = sys.argv[1:] or ['texts/gretil_stats/bharst_u.htm', 'texts/gretil_stats/kmeghdpu.htm']
+  verses = [lines for filename in filenames for lines in CleanedLinesOfVerses(filename)]
+  num_syllables = sum(line.count(c) for lines in verses for line in lines for c in slp1.VOWELS)
+
+  (expected, regex_time) = _Time(lambda: [RegexScanVerse(lines) for lines in verses])
+  (got, table_time) = _Time(lambda: [scan.ScanVerse(lines) for lines in verses])
+  assert got == expected
+
+  print('%d verses, %d syllables: the same patterns from both' % (len(verses), num_syllables))
+  print('Regexes: %7.1f ms' % (regex_time * 1000))
+  print('Table:   %7.1f ms' % (table_time * 1000))
+  print('Speedup: %7.1fx' % (regex_time / table_time))
+
+
+if __name__ == '__main__':
+  main()
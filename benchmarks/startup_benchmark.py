@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Compares building the metrical data from its sources with loading a snapshot.
+
+Also reports the memory taken by the data (as traced by tracemalloc) and the
+number of entries in the pattern indexes.
+
+Usage (from the top-level directory):
+     python -m benchmarks.startup_benchmark [--runs N]
+
+Each measurement is made in a fresh process, as for a new gunicorn worker.
+"""
+
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+_TIMED_CODE = '''
+import contextlib, io, sys, time
+start = time.perf_counter()
+from data import metrical_data
+with contextlib.redirect_stdout(io.StringIO()):
+  metrical_data.LoadDatabase(snapshot_file=sys.argv[1] or None)
+print(time.perf_counter() - start)
+'''
+
+_MEMORY_CODE = '''
+import contextlib, io, tracemalloc
+tracemalloc.start()
+from data import metrical_data
+with contextlib.redirect_stdout(io.StringIO()):
+  database = metrical_data.LoadDatabase()
+print(tracemalloc.get_traced_memory()[0])
+print(sum(len(index) for index in [database.known_full_patterns,
+                                   database.known_half_patterns,
+                                   database.known_pada_patterns]))
+'''
+
+
+def _TimeInFreshProcess(snapshot_file):
+  output = subprocess.check_output([sys.executable, '-c', _TIMED_CODE, snapshot_file or ''])
+  return float(output)
+
+
+def main():
+  argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  argument_parser.add_argument('--runs', type=int, default=5)
+  args = argument_parser.parse_args()
+
+  snapshot_file = os.path.join(tempfile.mkdtemp(), 'metrical_data.snapshot')
+  _TimeInFreshProcess(snapshot_file)  # Writes the snapshot.
+  cold = min(_TimeInFreshProcess(None) for _ in range(args.runs))
+  warm = min(_TimeInFreshProcess(snapshot_file) for _ in range(args.runs))
+  print('Cold build:    %7.1f ms' % (cold * 1000))
+  print('Snapshot load: %7.1f ms' % (warm * 1000))
+  print('Speedup:       %7.1fx' % (cold / warm))
+  os.remove(snapshot_file)
+
+  (memory, entries) = subprocess.check_output([sys.executable, '-c', _MEMORY_CODE]).split()
+  print('Memory:        %7.1f MB' % (int(memory) / 1e6))
+  print('Index entries: %7d' % int(entries))
+
+
+if __name__ == '__main__':
+  main()
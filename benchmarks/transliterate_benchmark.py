@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Compares the linear-time transliterator with the one it replaced, as the text grows.
+
+Usage (from the top-level directory):
+     python -m benchmarks.transliterate_benchmark [GRETIL file]
+
+The whole file (cleaned up as for reading) is transliterated to SLP1 as a single
+text, with the state machine for its scheme, and the result back to IAST (whose
+keys are single characters, so str.translate does it); each with the old and new
+transliterators, for the first 1/4 and 1/2 of the text, all of it, and it
+repeated 2 and 4 times. Checks that both give the same output, and reports the
+time per character: about constant for the new one, and growing with the length
+of the text for the old one, which copied the rest of the text at each position.
+"""
+
+
+import contextlib
+import io
+import sys
+import time
+
+import read.read
+from transliteration import transliterate
+from transliteration import transliterator
+
+
+# The transliterator, as it was.
+
+def _OldLongestRead(state_machine, text):
+  where = state_machine
+  num_seen = 0
+  num_matched = 0
+  replacement = None
+  for c in text:
+    num_seen += 1
+    where = where.get(c)
+    if not where:
+      return (num_matched, replacement)
+    if '' in where:
+      num_matched = num_seen
+      replacement = where['']
+  return (num_matched, replacement)
+
+
+def OldTransliterate(state_machine, text, pass_through=None):
+  transliterated = ''
+  unparsed_characters = set()
+  num_parsed = 0
+  while num_parsed < len(text):
+    (num_matched, replacement) = _OldLongestRead(state_machine.root, text[num_parsed:])
+    if num_matched > 0:
+      transliterated += replacement
+      num_parsed += num_matched
+    else:
+      char = text[num_parsed]
+      if pass_through and char in pass_through:
+        transliterated += char
+      else:
+        unparsed_characters.add(char)
+      num_parsed += 1
+  return (transliterated, unparsed_characters)
+
+
+_STATE_MACHINES = {
+    'HK': transliterate._HK_TO_SLP1_STATE_MACHINE.Get(),
+    'IAST': transliterate._IAST_TO_SLP1_STATE_MACHINE.Get(),
+    'ITRANS': transliterate._ITRANS_TO_SLP1_STATE_MACHINE.Get(),
+}
+
+
+def _Time(function, *args):
+  start = time.perf_counter()
+  result = function(*args)
+  return (result, time.perf_counter() - start)
+
+
+def main():
+  filename = sys.argv[1] if len(sys.argv) > 1 else 'texts/gretil_stats/bharst_u.htm'
+  with contextlib.redirect_stdout(io.StringIO()):
+    (text, scheme) = read.read.preprocess_and_detect(open(filename, encoding='utf-8').read())
+  scheme_name = [name for (name, value) in vars(transliterate.TRANSLITERATION_SCHEME).items() if value == scheme][0]
+  to_slp1 = _STATE_MACHINES[scheme_name]
+  to_iast = transliterate._SLP1_TO_IAST_STATE_MACHINE.Get()
+  pass_through = ' -?\n'
+
+  print('%s: %d characters, in %s' % (filename, len(text), scheme_name))
+  print('%10s  %-24s %-24s' % ('', '%s to SLP1 (µs/char)' % scheme_name, 'SLP1 to IAST (µs/char)'))
+  print('%10s  %11s %11s  %11s %11s' % ('Characters', 'Old', 'New', 'Old', 'New'))
+  for part in [text[:len(text) // 4], text[:len(text) // 2], text, text * 2, text * 4]:
+    (expected, old_time) = _Time(OldTransliterate, to_slp1, part, pass_through)
+    (got, new_time) = _Time(transliterator.Transliterate, to_slp1, part, pass_through)
+    assert got == expected
+    slp1_text = got[0]
+    (expected, old_back_time) = _Time(OldTransliterate, to_iast, slp1_text, pass_through)
+    (got, new_back_time) = _Time(transliterator.Transliterate, to_iast, slp1_text, pass_through)
+    assert got == expected
+    print('%10d  %11.3f %11.3f  %11.3f %11.3f' % (
+        len(part), old_time * 1e6 / len(part), new_time * 1e6 / len(part),
+        old_back_time * 1e6 / len(slp1_text), new_back_time * 1e6 / len(slp1_text)))
+
+
+if __name__ == '__main__':
+  main()
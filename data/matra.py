@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Mātrā-based metres (like the Āryā family), checked by counting mātrās.
+
+Such a metre is described pāda by pāda. Each pāda is a list of slots, and a slot
+is either a tuple of the strings (gaṇas) allowed there, or a number n meaning
+any syllables adding up to n mātrās (or n - 1 mātrās ending in a laghu, as a
+pāda-final laghu can count as a guru).
+
+Checking a (packed, see pattern_bits) pattern is a dynamic program over the
+slots: the set of positions in the pattern at which the slots so far can end.
+This takes time linear in the length of the pattern, unlike the equivalent
+regex (see Regex()), which for numeric slots has to list every string with the
+right number of mātrās.
+"""
+
+import pattern_bits
+
+
+def _Matras(pattern):
+  return len(pattern) + pattern.count('G')
+
+
+def _PatternsOfLength(n):
+  if n in _patterns_memo:
+    return _patterns_memo[n]
+  _patterns_memo[n] = [p + 'L' for p in _PatternsOfLength(n - 1)]
+  _patterns_memo[n] += [p + 'G' for p in _PatternsOfLength(n - 2)]
+  return _patterns_memo[n]
+_patterns_memo = {0: [''], 1: ['L']}
+
+
+def _LoosePatternsOfLength(n):
+  if n in _loose_patterns_memo:
+    return _loose_patterns_memo[n]
+  _loose_patterns_memo[n] = (_PatternsOfLength(n) +
+                             [p for p in _PatternsOfLength(n - 1)
+                              if p.endswith('L')])
+  return _loose_patterns_memo[n]
+_loose_patterns_memo = {0: [''], 1: ['L']}
+
+
+def _EndsOfMatras(bits, length, start, n):
+  """Where a run of syllables from start, of n (or n - 1 then laghu) mātrās, can end."""
+  matras = 0
+  i = start
+  while matras < n and i < length:
+    weight = (bits >> (length - 1 - i)) & 1
+    matras += 2 if weight == pattern_bits.GURU else 1
+    i += 1
+    if matras == n or (matras == n - 1 and weight == pattern_bits.LAGHU):
+      yield i
+
+
+class MatraMetre(object):
+  """A metre given by the gaṇas or mātrā counts of its four pādas."""
+
+  def __init__(self, name, padas):
+    self.name = name
+    self.padas = padas
+    # Each slot is a number, or a list of (length, bits without the leading 1).
+    self._slots = []
+    self._min_length = self._max_length = 0
+    self._min_matras = self._max_matras = 0
+    for slot in [slot for pada in padas for slot in pada]:
+      if isinstance(slot, int):
+        self._slots.append(slot)
+        # n mātrās, or n - 1 then a laghu: at least n / 2 syllables, at most n.
+        self._min_length += (slot + 1) // 2
+        self._max_length += slot
+        self._min_matras += slot - 1
+        self._max_matras += slot
+      else:
+        self._slots.append([(len(gana), pattern_bits.FromString(gana) ^ (1 << len(gana)))
+                            for gana in slot])
+        self._min_length += min(len(gana) for gana in slot)
+        self._max_length += max(len(gana) for gana in slot)
+        self._min_matras += min(_Matras(gana) for gana in slot)
+        self._max_matras += max(_Matras(gana) for gana in slot)
+
+  def __eq__(self, other):
+    return (isinstance(other, MatraMetre) and
+            (self.name, self.padas) == (other.name, other.padas))
+
+  def __hash__(self):
+    return hash(self.name)
+
+  def Name(self):
+    return self.name
+
+  def Bounds(self):
+    """((min, max) number of syllables, (min, max) number of mātrās) of matching patterns."""
+    return ((self._min_length, self._max_length), (self._min_matras, self._max_matras))
+
+  def match(self, bits):
+    """Whether the whole (packed) pattern fits the metre. (Named like regex.match.)"""
+    if not self._min_matras <= pattern_bits.Matras(bits) <= self._max_matras:
+      return False
+    return pattern_bits.Length(bits) in self._Ends(bits)
+
+  def PrefixLengths(self, bits):
+    """The lengths n such that the first n syllables of the (packed) pattern fit the metre."""
+    return sorted(self._Ends(bits))
+
+  def CouldBegin(self, bits):
+    """Whether some pattern fitting the metre begins with the (packed) pattern."""
+    length = pattern_bits.Length(bits)
+    positions = {0}
+    for slot in self._slots:
+      if length in positions:
+        return True
+      following = set()
+      for start in positions:
+        rest = pattern_bits.Slice(bits, start, length)
+        if isinstance(slot, int):
+          # The rest of the pattern can begin a run of slot mātrās.
+          if pattern_bits.Matras(rest) <= slot:
+            return True
+          following.update(_EndsOfMatras(bits, length, start, slot))
+          continue
+        for (gana_length, gana_bits) in slot:
+          end = start + gana_length
+          if end <= length:
+            if (bits >> (length - end)) & ((1 << gana_length) - 1) == gana_bits:
+              following.add(end)
+          elif (gana_bits | (1 << gana_length)) >> (end - length) == rest:
+            # The rest of the pattern begins this gaṇa.
+            return True
+      if not following:
+        return False
+      positions = following
+    return length in positions
+
+  def _Ends(self, bits):
+    """The positions at which the slots can all end, starting from the start of the pattern."""
+    length = pattern_bits.Length(bits)
+    positions = {0}
+    for slot in self._slots:
+      following = set()
+      for start in positions:
+        if isinstance(slot, int):
+          following.update(_EndsOfMatras(bits, length, start, slot))
+          continue
+        for (gana_length, gana_bits) in slot:
+          end = start + gana_length
+          if end <= length and (bits >> (length - end)) & ((1 << gana_length) - 1) == gana_bits:
+            following.add(end)
+      if not following:
+        return following
+      positions = following
+    return positions
+
+  def Regex(self):
+    """An equivalent regex (which can be very long), for comparison."""
+    def SlotRegex(slot):
+      if isinstance(slot, int):
+        return '(%s)' % '|'.join(_LoosePatternsOfLength(slot))
+      return '(%s)' % '|'.join(slot)
+    return '^%s$' % ''.join('(%s)' % ''.join(SlotRegex(slot) for slot in pada)
+                            for pada in self.padas)
@@ -1,10 +1,18 @@
 # -*- coding: utf-8 -*-
 """Data structures that store matching metres for known patterns."""
 
-import itertools
+import hashlib
+import logging
+import os
+import pickle
 import re
+import threading
+import types
 import unicodedata
 
+from data import matra
+from data import pattern_index
+import pattern_bits
 from print_utils import Print
 
 """
@@ -47,31 +55,74 @@ Adding a new metre:
 
 def to_short_url(pattern):
     assert re.match(r'^[LG]*$', pattern), pattern
-    h = hex(int('1' + pattern.replace('L', '0').replace('G', '1'), 2))
+    h = hex(pattern_bits.FromString(pattern))
     assert h.startswith('0x')
     if h.endswith('L'): h = h[:-1]
     return h[2:]
 
 def from_short_url(shorturl):
     assert shorturl[0] != '0', shorturl
-    b = bin(int(shorturl, 16))
-    assert b.startswith('0b1')
-    return b[3:].replace('0', 'L').replace('1', 'G')
-
-
-known_full_patterns = {}
-known_full_regexes = []
-
-known_half_patterns = {}
-known_half_regexes = []
-
-known_pada_patterns = {}
-known_pada_regexes = []
-
-pattern_for_metre = {}
-all_data = {}
-
-video_for_metre = {}
+    return pattern_bits.ToString(int(shorturl, 16))
+
+
+class MetreDatabase(object):
+  """All known metres, indexed for identification.
+
+  Patterns are packed into ints (see pattern_bits), and each metre is added
+  once, with its pāda-final syllables free (see data/pattern_index.py). A
+  database is read-only once built (see LoadDatabase), so it can be shared by
+  any number of threads, and several (say from different sources) can coexist.
+  """
+
+  def __init__(self, known_full_patterns, known_full_regexes,
+               known_half_patterns, known_half_regexes,
+               known_pada_patterns, known_pada_regexes,
+               pattern_for_metre, all_data):
+    for index in [known_full_patterns, known_half_patterns, known_pada_patterns]:
+      index.Freeze()
+    self.__dict__.update(
+      known_full_patterns=known_full_patterns,
+      known_full_regexes=tuple(known_full_regexes),
+      known_half_patterns=known_half_patterns,
+      known_half_regexes=tuple(known_half_regexes),
+      known_pada_patterns=known_pada_patterns,
+      known_pada_regexes=tuple(known_pada_regexes),
+      pattern_for_metre=types.MappingProxyType(dict(pattern_for_metre)),
+      all_data=types.MappingProxyType(dict(all_data)))
+
+  def __setattr__(self, name, value):
+    raise AttributeError('MetreDatabase is read-only')
+
+  def GetPattern(self, metre):
+    return self.pattern_for_metre.get(metre)
+
+
+class _Builder(object):
+  """The data structures of a MetreDatabase, while they are being filled in."""
+
+  def __init__(self):
+    self.known_full_patterns = pattern_index.PatternIndex(first_only=True)
+    self.known_full_regexes = []
+    self.known_half_patterns = pattern_index.PatternIndex()
+    self.known_half_regexes = []
+    self.known_pada_patterns = pattern_index.PatternIndex()
+    self.known_pada_regexes = []
+    self.pattern_for_metre = {}
+    self.all_data = {}
+
+  def Build(self):
+    return MetreDatabase(**self.__dict__)
+
+
+SOURCE_FILES = ('data/ganesh.json', 'data/curated.json', 'data/vrttaratnakara.json', 'data/mishra.json')
+
+# A snapshot is a pickle of the data structures of a MetreDatabase, so that
+# later processes can skip rebuilding them. It is keyed by a hash of the sources
+# (and of this file), so any change to them causes a rebuild.
+_SNAPSHOT_VERSION = 2
+SNAPSHOT_FILE = os.environ.get(
+    'METRICAL_DATA_SNAPSHOT',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrical_data.snapshot'))
 
 def jsonToPy(filename):
   """Reads JSON from a file, and puts it into a similar data structure as before."""
@@ -92,8 +143,9 @@ def jsonToPy(filename):
   return ret
 
 
-def GetPattern(metre):
-  return pattern_for_metre.get(metre)
+def GetPattern(metre, database=None):
+  """The pāda patterns of the metre, in the given (or the default) database."""
+  return (database or Default()).GetPattern(metre)
 
 
 def _RemoveChars(input_string, chars):
@@ -119,50 +171,61 @@ def _CleanUpSimpleRegex(regex):
   return regex
 
 
-def _AddPatternForMetre(metre_name, pada_patterns):
-  if metre_name in pattern_for_metre:
-    if pattern_for_metre[metre_name] != pada_patterns:
+def _AddPatternForMetre(builder, metre_name, pada_patterns):
+  if metre_name in builder.pattern_for_metre:
+    if builder.pattern_for_metre[metre_name] != pada_patterns:
       # Print('Mismatch for %s' % metre_name)
-      # Print(pattern_for_metre[metre_name])
+      # Print(builder.pattern_for_metre[metre_name])
       # Print('   vs   ')
       # Print(pada_patterns)
       # assert False
       Print('Not overwriting as already present: %s' % metre_name)
     return
-  pattern_for_metre[metre_name] = pada_patterns
+  builder.pattern_for_metre[metre_name] = pada_patterns
+
+
+def _AddFullPattern(builder, full_pattern, metre_name):
+  """Add (pattern, free) for a metre. A pattern already known keeps its first metre."""
+  (pattern, free) = full_pattern
+  builder.known_full_patterns.Add(pattern, free, metre_name)
+
+def _AddHalfPattern(builder, half_pattern, metre_name, which_halves):
+  (pattern, free) = half_pattern
+  builder.known_half_patterns.Add(pattern, free, metre_name, which_halves)
 
+def _AddPadaPattern(builder, pada_pattern, metre_name, which_padas):
+  (pattern, free) = pada_pattern
+  builder.known_pada_patterns.Add(pattern, free, metre_name, which_padas)
 
-def _AddFullPattern(full_pattern, metre_name):
-  if full_pattern in known_full_patterns:
-    # TODO(shreevatsa): Figure out what exactly to do in this case
-    # Print('Error: full pattern already present')
-    # Print(metre_name)
-    # Print(full_pattern)
-    # Print(known_full_patterns[full_pattern])
-    return False
-  assert full_pattern not in known_full_patterns
-  known_full_patterns[full_pattern] = {metre_name: True}
-  return True
+def _PadaWithFreeEnd(pada_pattern):
+  """The pāda's (packed) pattern and free mask, with its last syllable free."""
+  prefix = pattern_bits.FromString(pada_pattern[:-1])
+  n = pattern_bits.Length(prefix) + 1
+  return (pattern_bits.Append(prefix, pattern_bits.LAGHU), (1 << n) | 1)
 
-def _AddHalfPattern(half_pattern, metre_name, which_halves):
-  known_half_patterns.setdefault(half_pattern, {}).setdefault(metre_name, set()).update(which_halves)
+def _PadaFixed(pada_pattern):
+  """The pāda's (packed) pattern and free mask, with no syllable free."""
+  pattern = pattern_bits.FromString(pada_pattern)
+  return (pattern, 1 << pattern_bits.Length(pattern))
 
-def _AddPadaPattern(pada_pattern, metre_name, which_padas):
-  known_pada_patterns.setdefault(pada_pattern, {}).setdefault(metre_name, set()).update(which_padas)
+def _Join(padas):
+  """Join (pattern, free) pairs."""
+  return (pattern_bits.Join(pattern for (pattern, _) in padas),
+          pattern_bits.Join(free for (_, free) in padas))
 
-def _AddSamavrttaPattern(metre_name, each_pada_pattern):
+def _AddSamavrttaPattern(builder, metre_name, each_pada_pattern):
   """Given a sama-vṛtta metre's pattern, add it to the data structures."""
   clean = _CleanUpPattern(each_pada_pattern)
   # assert re.match(r'^[LG]*G$', clean), (each_pada_pattern, metre_name)
-  _AddPatternForMetre(metre_name, [clean] * 4)
+  _AddPatternForMetre(builder, metre_name, [clean] * 4)
 
-  patterns = [clean[:-1] + 'G', clean[:-1] + 'L']
-  for (a, b, c, d) in itertools.product(patterns, repeat=4): _AddFullPattern(a + b + c + d, metre_name)
-  for (a, b) in itertools.product(patterns, repeat=2): _AddHalfPattern(a + b, metre_name, {1, 2})
-  for a in patterns: _AddPadaPattern(a, metre_name, {1, 2, 3, 4})
+  pada = _PadaWithFreeEnd(clean)
+  _AddFullPattern(builder, _Join([pada] * 4), metre_name)
+  _AddHalfPattern(builder, _Join([pada] * 2), metre_name, {1, 2})
+  _AddPadaPattern(builder, pada, metre_name, {1, 2, 3, 4})
 
 
-def _AddArdhasamavrttaPattern(metre_name, odd_and_even_pada_patterns):
+def _AddArdhasamavrttaPattern(builder, metre_name, odd_and_even_pada_patterns):
   """Given an ardha-sama-vṛtta's pattern, add it."""
   (odd_pada_pattern, even_pada_pattern) = odd_and_even_pada_patterns
   clean_odd = _CleanUpPattern(odd_pada_pattern)
@@ -172,17 +235,21 @@ def _AddArdhasamavrttaPattern(metre_name, odd_and_even_pada_patterns):
   #   Print('Not adding %s for now, as %s ends with laghu' % (metre_name, clean_even))
   #   return
   # assert re.match(r'^[LG]*G$', clean_even), (metre_name, clean_even)
-  _AddPatternForMetre(metre_name, [clean_odd, clean_even] * 2)
+  _AddPatternForMetre(builder, metre_name, [clean_odd, clean_even] * 2)
+  if any('.' in p[:-1] for p in [clean_odd, clean_even]):
+    # As for a viṣama-vṛtta (see _AddVishamavrttaPattern); a '.' as the last
+    # syllable is no different from the free last syllable it gets anyway.
+    return
 
-  patterns_odd = [clean_odd[:-1] + 'G', clean_odd[:-1] + 'L']
-  patterns_even = [clean_even[:-1] + 'G', clean_even[:-1] + 'L']
-  for (a, b, c, d) in itertools.product(patterns_odd, patterns_even, repeat=2): _AddFullPattern(a + b + c + d, metre_name)
-  for (a, b) in itertools.product(patterns_odd, patterns_even): _AddHalfPattern(a + b, metre_name, {1, 2})
-  for a in patterns_odd: _AddPadaPattern(a, metre_name, {1, 3})
-  for b in patterns_even: _AddPadaPattern(b, metre_name, {2, 4})
+  odd = _PadaWithFreeEnd(clean_odd)
+  even = _PadaWithFreeEnd(clean_even)
+  _AddFullPattern(builder, _Join([odd, even] * 2), metre_name)
+  _AddHalfPattern(builder, _Join([odd, even]), metre_name, {1, 2})
+  _AddPadaPattern(builder, odd, metre_name, {1, 3})
+  _AddPadaPattern(builder, even, metre_name, {2, 4})
 
 
-def _AddVishamavrttaPattern(metre_name, pada_patterns):
+def _AddVishamavrttaPattern(builder, metre_name, pada_patterns):
   """Given the four pāda-s of a viṣama-vṛtta, add the metre."""
   assert len(pada_patterns) == 4
   pada_patterns = [_CleanUpPattern(p) for p in pada_patterns]
@@ -190,83 +257,87 @@ def _AddVishamavrttaPattern(metre_name, pada_patterns):
   (pa, pb, pc, pd) = pada_patterns
   # assert pb.endswith('G')
   # assert pd.endswith('G')
-  _AddPatternForMetre(metre_name, [pa, pb, pc, pd])
+  _AddPatternForMetre(builder, metre_name, [pa, pb, pc, pd])
+  if any('.' in p for p in pada_patterns):
+    # A '.' (as in padacaturūrdhva) used to be matched literally, so such
+    # patterns never matched any verse; they can't be packed into ints.
+    return
 
-  patterns_a = [pa]
-  patterns_b = [pb[:-1] + 'G', pb[:-1] + 'L']
-  patterns_c = [pc]
-  patterns_d = [pd[:-1] + 'G', pd[:-1] + 'L']
-  for (a, b, c, d) in itertools.product(patterns_a, patterns_b, patterns_c, patterns_d): _AddFullPattern(a + b + c + d, metre_name)
-  for (a, b) in itertools.product(patterns_a, patterns_b): _AddHalfPattern(a + b, metre_name, {1})
-  for (c, d) in itertools.product(patterns_c, patterns_d): _AddHalfPattern(c + d, metre_name, {2})
-  for a in patterns_a: _AddPadaPattern(a, metre_name, {1})
-  for b in patterns_b: _AddPadaPattern(b, metre_name, {2})
-  for c in patterns_c: _AddPadaPattern(c, metre_name, {3})
-  for d in patterns_d: _AddPadaPattern(d, metre_name, {4})
+  a = _PadaFixed(pa)
+  b = _PadaWithFreeEnd(pb)
+  c = _PadaFixed(pc)
+  d = _PadaWithFreeEnd(pd)
+  _AddFullPattern(builder, _Join([a, b, c, d]), metre_name)
+  _AddHalfPattern(builder, _Join([a, b]), metre_name, {1})
+  _AddHalfPattern(builder, _Join([c, d]), metre_name, {2})
+  _AddPadaPattern(builder, a, metre_name, {1})
+  _AddPadaPattern(builder, b, metre_name, {2})
+  _AddPadaPattern(builder, c, metre_name, {3})
+  _AddPadaPattern(builder, d, metre_name, {4})
 
 
-def _AddFullRegex(full_verse_regex, metre_name):
-  known_full_regexes.append((re.compile('^' + full_verse_regex + '$'), {metre_name : True}))
+def _AddFullRegex(builder, full_verse_regex, metre_name):
+  builder.known_full_regexes.append((re.compile('^' + full_verse_regex + '$'), {metre_name : True}))
 
 
-def _AddHalfRegex(half_verse_regex, metre_name, which_halves):
-  known_half_regexes.append((re.compile('^' + half_verse_regex + '$'), {metre_name: which_halves}))
+def _AddHalfRegex(builder, half_verse_regex, metre_name, which_halves):
+  builder.known_half_regexes.append((re.compile('^' + half_verse_regex + '$'), {metre_name: which_halves}))
 
 
-def _AddPadaRegex(pada_regex, metre_name, which_padas):
-  known_pada_regexes.append((re.compile('^' + pada_regex + '$'), {metre_name: which_padas}))
+def _AddPadaRegex(builder, pada_regex, metre_name, which_padas):
+  builder.known_pada_regexes.append((re.compile('^' + pada_regex + '$'), {metre_name: which_padas}))
 
 
-def _AddSamavrttaRegex(metre_name, pada_regex):
+def _AddSamavrttaRegex(builder, metre_name, pada_regex):
   """Add a sama-vṛtta's regex (full, half, pāda). No variants."""
   pada_regex = _CleanUpSimpleRegex(pada_regex)
-  _AddFullRegex(''.join('(%s)' % s for s in [pada_regex] * 4), metre_name)
-  _AddHalfRegex(''.join('(%s)' % s for s in [pada_regex] * 2), metre_name, {1, 2})
-  _AddPadaRegex(pada_regex, metre_name, {1, 2, 3, 4})
+  _AddFullRegex(builder, ''.join('(%s)' % s for s in [pada_regex] * 4), metre_name)
+  _AddHalfRegex(builder, ''.join('(%s)' % s for s in [pada_regex] * 2), metre_name, {1, 2})
+  _AddPadaRegex(builder, pada_regex, metre_name, {1, 2, 3, 4})
 
 
-def _AddMetreRegex(metre_name, pada_regexes, simple=True):
+def _AddMetreRegex(builder, metre_name, pada_regexes, simple=True):
   """Given regexes for the four padas of a metre, add it."""
   assert len(pada_regexes) == 4, (metre_name, pada_regexes)
   if simple:
     pada_regexes = [_CleanUpSimpleRegex(s) for s in pada_regexes]
   full_verse_regex = ''.join('(%s)' % s for s in pada_regexes)
-  _AddFullRegex(full_verse_regex, metre_name)
+  _AddFullRegex(builder, full_verse_regex, metre_name)
 
 
-def _AddAnustup():
+def _AddAnustup(builder):
   """Add Anuṣṭup to the list of regexes."""
   metre_name = 'Anuṣṭup (Śloka)'
   regex_ac = '....LGG.'
   regex_bd = '....LGL.'
   half_regex = regex_ac + regex_bd
 
-  _AddFullRegex(half_regex * 2, metre_name)
-  _AddHalfRegex(half_regex, metre_name, {1, 2})
-  _AddPadaRegex(regex_ac, metre_name, {1, 3})
-  _AddPadaRegex(regex_bd, metre_name, {2, 4})
+  _AddFullRegex(builder, half_regex * 2, metre_name)
+  _AddHalfRegex(builder, half_regex, metre_name, {1, 2})
+  _AddPadaRegex(builder, regex_ac, metre_name, {1, 3})
+  _AddPadaRegex(builder, regex_bd, metre_name, {2, 4})
 
 
-def _AddAnustupExamples():
+def _AddAnustupExamples(builder):
   """Examples of variation from standard Anuṣṭup."""
   # "jayanti te sukṛtino..."
-  _AddMetreRegex('Anuṣṭup (Śloka)',
+  _AddMetreRegex(builder, 'Anuṣṭup (Śloka)',
                  ['LGLGLLLG', '....LGL.', '....LGG.', '....LGL.'])
   # "sati pradīpe saty agnau..." Proof: K48.130 (p. 51)
-  _AddMetreRegex('Anuṣṭup (Śloka)',
+  _AddMetreRegex(builder, 'Anuṣṭup (Śloka)',
                  ['LGLGGGGG', '....LGL.', '....LGG.', '....LGL.'])
   # "guruṇā stana-bhāreṇa [...] śanaiś-carābhyāṃ pādābhyāṃ" K48.132 (52)
-  _AddMetreRegex('Anuṣṭup (Śloka)',
+  _AddMetreRegex(builder, 'Anuṣṭup (Śloka)',
                  ['....LGG.', '....LGL.', 'LGLGGGGG', '....LGL.'])
   # "tāvad evāmṛtamayī..." K48.125 (49)
-  _AddMetreRegex('Anuṣṭup (Śloka)',
+  _AddMetreRegex(builder, 'Anuṣṭup (Śloka)',
                  ['GLGGLLLG', '....LGL.', '....LGG.', '....LGL.'])
   # Covers a lot of cases
-  _AddMetreRegex('Anuṣṭup (Śloka)',
+  _AddMetreRegex(builder, 'Anuṣṭup (Śloka)',
                  ['........', '....LGL.', '....LGG.', '....LGL.'])
-  _AddMetreRegex('Anuṣṭup (Śloka)',
+  _AddMetreRegex(builder, 'Anuṣṭup (Śloka)',
                  ['....LGG.', '....LGL.', '........', '....LGL.'])
-  _AddMetreRegex('Anuṣṭup (Śloka)',
+  _AddMetreRegex(builder, 'Anuṣṭup (Śloka)',
                  ['........', '....LGL.', '........', '....LGL.'])
 
 
@@ -275,55 +346,29 @@ def _MatraCount(pattern):
   return sum(2 if c == 'G' else 1 for c in pattern)
 
 
-def _PatternsOfLength(n):
-  if n in _patterns_memo:
-    return _patterns_memo[n]
-  _patterns_memo[n] = [p + 'L' for p in _PatternsOfLength(n - 1)]
-  _patterns_memo[n] += [p + 'G' for p in _PatternsOfLength(n - 2)]
-  return _patterns_memo[n]
-_patterns_memo = {0: [''], 1: ['L']}
-
-
-def _LoosePatternsOfLength(n):
-  if n in _loose_patterns_memo:
-    return _loose_patterns_memo[n]
-  _loose_patterns_memo[n] = (_PatternsOfLength(n) +
-                             [p for p in _PatternsOfLength(n - 1)
-                              if p.endswith('L')])
-  return _loose_patterns_memo[n]
-_loose_patterns_memo = {0: [''], 1: ['L']}
-
-
-def _AddAryaFamilyRegex():
-  """Add regexes for the Āryā family of metres."""
-  odd_ganas = ['GG', 'LLG', 'GLL', 'LLLL']
-  even_ganas = odd_ganas + ['LGL']
-  odd_gana_re = '(%s)' % '|'.join(odd_ganas)
-  even_gana_re = '(%s)' % '|'.join(even_ganas)
-  pada_12_re = odd_gana_re + even_gana_re + odd_gana_re
-  pada_15_re = even_gana_re + odd_gana_re + 'L' + odd_gana_re + '(L|G)'
-  pada_18_re = even_gana_re + odd_gana_re + '(LLLL|LGL)' + odd_gana_re + '(L|G)'
-  pada_20_re = (even_gana_re + odd_gana_re + '(LLLL|LGL)' + odd_gana_re +
-                '(%s)' % '|'.join(even_ganas + ['GL', 'LLL']))
-  _AddMetreRegex('Āryā',
-                 [pada_12_re, pada_18_re, pada_12_re, pada_15_re], simple=False)
-  _AddMetreRegex('Gīti',
-                 [pada_12_re, pada_18_re, pada_12_re, pada_18_re], simple=False)
-  _AddMetreRegex('Upagīti',
-                 [pada_12_re, pada_15_re, pada_12_re, pada_15_re], simple=False)
-  _AddMetreRegex('Udgīti',
-                 [pada_12_re, pada_15_re, pada_12_re, pada_18_re], simple=False)
-  _AddMetreRegex('Āryāgīti',
-                 [pada_12_re, pada_20_re, pada_12_re, pada_20_re], simple=False)
-  _AddMetreRegex('Āryā (loose schema)',
-                 ['|'.join(_LoosePatternsOfLength(12)),
-                  '|'.join(_LoosePatternsOfLength(18)),
-                  '|'.join(_LoosePatternsOfLength(12)),
-                  '|'.join(_LoosePatternsOfLength(15))],
-                 simple=False)
-
-
-def _AddGiti(pada_patterns):
+def _AddMatraMetre(builder, metre):
+  """Add a mātrā metre (see data/matra.py), which is matched like a full regex."""
+  builder.known_full_regexes.append((metre, {metre.name: True}))
+
+
+def _AddAryaFamily(builder):
+  """Add the Āryā family of metres."""
+  odd_ganas = ('GG', 'LLG', 'GLL', 'LLLL')
+  even_ganas = odd_ganas + ('LGL',)
+  pada_12 = [odd_ganas, even_ganas, odd_ganas]
+  pada_15 = [even_ganas, odd_ganas, ('L',), odd_ganas, ('L', 'G')]
+  pada_18 = [even_ganas, odd_ganas, ('LLLL', 'LGL'), odd_ganas, ('L', 'G')]
+  pada_20 = [even_ganas, odd_ganas, ('LLLL', 'LGL'), odd_ganas,
+             even_ganas + ('GL', 'LLL')]
+  _AddMatraMetre(builder, matra.MatraMetre('Āryā', [pada_12, pada_18, pada_12, pada_15]))
+  _AddMatraMetre(builder, matra.MatraMetre('Gīti', [pada_12, pada_18, pada_12, pada_18]))
+  _AddMatraMetre(builder, matra.MatraMetre('Upagīti', [pada_12, pada_15, pada_12, pada_15]))
+  _AddMatraMetre(builder, matra.MatraMetre('Udgīti', [pada_12, pada_15, pada_12, pada_18]))
+  _AddMatraMetre(builder, matra.MatraMetre('Āryāgīti', [pada_12, pada_20, pada_12, pada_20]))
+  _AddMatraMetre(builder, matra.MatraMetre('Āryā (loose schema)', [[12], [18], [12], [15]]))
+
+
+def _AddGiti(builder, pada_patterns):
   """Add an example of Gīti, with proper morae checking."""
   assert len(pada_patterns) == 4
   expected = [12, 18, 12, 18]
@@ -336,22 +381,19 @@ def _AddGiti(pada_patterns):
     if allow_loose_ending:
       pada_patterns[i] = pada_patterns[i][:-1] + '.'
   # TODO(shreevatsa): Should we just add (up to) 4 patterns instead?
-  _AddMetreRegex('Gīti', pada_patterns, simple=False)
+  _AddMetreRegex(builder, 'Gīti', pada_patterns, simple=False)
 
 
-def InitializeData():
+def _BuildData(builder, source_files):
   """Add all known metres to the data structures."""
-  _AddAnustup()
-  _AddAnustupExamples()
+  _AddAnustup(builder)
+  _AddAnustupExamples(builder)
 
-  sources = sum((jsonToPy(filename)
-                   for filename in ['data/ganesh.json', 'data/curated.json', 'data/vrttaratnakara.json', 'data/mishra.json']),
-                [])
+  sources = sum((jsonToPy(filename) for filename in source_files), [])
 
-  _AddAryaFamilyRegex()
+  _AddAryaFamily(builder)
   vrtta_data = sources
 
-  assert not all_data
   for (name, description) in vrtta_data:
     samatva = None
     regex_or_pattern = None
@@ -368,21 +410,136 @@ def InitializeData():
 
     assert samatva in ['sama', 'ardhasama', 'viṣama']
     assert regex_or_pattern in ['regex', 'pattern']
-    all_data[name] = (samatva, regex_or_pattern, description)
+    builder.all_data[name] = (samatva, regex_or_pattern, description)
 
     if samatva == 'sama' and regex_or_pattern == 'regex':
-      _AddSamavrttaRegex(name, description)
+      _AddSamavrttaRegex(builder, name, description)
     elif samatva == 'sama' and regex_or_pattern == 'pattern':
-      _AddSamavrttaPattern(name, description)
+      _AddSamavrttaPattern(builder, name, description)
     elif samatva == 'ardhasama' and regex_or_pattern == 'pattern':
-      _AddArdhasamavrttaPattern(name, description)
+      _AddArdhasamavrttaPattern(builder, name, description)
     elif samatva == 'viṣama' and regex_or_pattern == 'pattern':
-      _AddVishamavrttaPattern(name, description)
+      _AddVishamavrttaPattern(builder, name, description)
     else:
       assert False, name
 
 
-def HtmlDescription(name):
+class _LazyRegex(object):
+  """A regex from a snapshot, compiled only when first used."""
+
+  def __init__(self, pattern):
+    self.pattern = pattern
+    self._compiled = None
+
+  def match(self, string):
+    if self._compiled is None:
+      self._compiled = re.compile(self.pattern)
+    return self._compiled.match(string)
+
+
+def _SourcesHash(source_files):
+  """Hash of everything the built data depends on."""
+  h = hashlib.sha256()
+  code_files = [__file__, matra.__file__, pattern_index.__file__, pattern_bits.__file__]
+  for filename in list(source_files) + [os.path.abspath(f) for f in code_files]:
+    h.update(filename.encode('utf-8'))
+    with open(filename, 'rb') as f:
+      h.update(f.read())
+  return h.hexdigest()
+
+
+def _SnapshotData(database):
+  """The database's data structures, in a picklable form."""
+  def Sources(known_regexes):
+    # Regexes are stored as their source; other matchers (like MatraMetre) as is.
+    return [(getattr(regex, 'pattern', regex), matches) for (regex, matches) in known_regexes]
+  return {
+    'known_full_patterns': database.known_full_patterns,
+    'known_full_regexes': Sources(database.known_full_regexes),
+    'known_half_patterns': database.known_half_patterns,
+    'known_half_regexes': Sources(database.known_half_regexes),
+    'known_pada_patterns': database.known_pada_patterns,
+    'known_pada_regexes': Sources(database.known_pada_regexes),
+    'pattern_for_metre': dict(database.pattern_for_metre),
+    'all_data': dict(database.all_data),
+  }
+
+
+def _DatabaseFromSnapshotData(data):
+  """The database, from _SnapshotData() output."""
+  def Matchers(known_regexes):
+    return [(_LazyRegex(regex) if isinstance(regex, str) else regex, matches)
+            for (regex, matches) in known_regexes]
+  return MetreDatabase(
+    known_full_patterns=data['known_full_patterns'],
+    known_full_regexes=Matchers(data['known_full_regexes']),
+    known_half_patterns=data['known_half_patterns'],
+    known_half_regexes=Matchers(data['known_half_regexes']),
+    known_pada_patterns=data['known_pada_patterns'],
+    known_pada_regexes=Matchers(data['known_pada_regexes']),
+    pattern_for_metre=data['pattern_for_metre'],
+    all_data=data['all_data'])
+
+
+def _WriteSnapshot(filename, sources_hash, database):
+  temp_filename = '%s.%d.tmp' % (filename, os.getpid())
+  with open(temp_filename, 'wb') as f:
+    pickle.dump((_SNAPSHOT_VERSION, sources_hash, _SnapshotData(database)), f, pickle.HIGHEST_PROTOCOL)
+  os.replace(temp_filename, filename)
+
+
+def _ReadSnapshot(filename, sources_hash):
+  """The data in the snapshot file, or None if it is missing or out of date."""
+  try:
+    with open(filename, 'rb') as f:
+      (version, snapshot_hash, data) = pickle.load(f)
+  except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError) as error:
+    logging.info('Not using snapshot %s: %s', filename, error)
+    return None
+  if version != _SNAPSHOT_VERSION or snapshot_hash != sources_hash:
+    logging.info('Snapshot %s is out of date; rebuilding.', filename)
+    return None
+  return data
+
+
+def LoadDatabase(source_files=SOURCE_FILES, snapshot_file=None):
+  """A new MetreDatabase of all metres in the source files.
+
+  If snapshot_file is given, the data is loaded from it when it is up to date,
+  and otherwise built from the sources and written to it.
+  """
+  sources_hash = None
+  if snapshot_file:
+    sources_hash = _SourcesHash(source_files)
+    data = _ReadSnapshot(snapshot_file, sources_hash)
+    if data is not None:
+      return _DatabaseFromSnapshotData(data)
+  builder = _Builder()
+  _BuildData(builder, source_files)
+  database = builder.Build()
+  if snapshot_file:
+    try:
+      _WriteSnapshot(snapshot_file, sources_hash, database)
+    except OSError as error:
+      logging.warning('Could not write snapshot %s: %s', snapshot_file, error)
+  return database
+
+
+_default_database = None
+_default_database_lock = threading.Lock()
+
+
+def Default():
+  """The database of all sources (loaded via SNAPSHOT_FILE), shared by the whole process."""
+  global _default_database
+  with _default_database_lock:
+    if _default_database is None:
+      _default_database = LoadDatabase(snapshot_file=SNAPSHOT_FILE)
+    return _default_database
+
+
+def HtmlDescription(name, database=None):
+  all_data = (database or Default()).all_data
   if name not in all_data:
     return '[No description currently for %s]' % name
   (samatva, regex_or_pattern, description) = all_data[name]
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""An index from patterns to metres, in which some syllables can be either weight.
+
+The last syllable of a pāda can usually be laghu or guru, so a sama-vṛtta has
+2^4 full patterns, 2^2 half patterns and 2 pāda patterns. Instead of storing all
+of them, each is added once here, as a pattern (packed; see pattern_bits) and a
+mask of its "free" syllables. A query pattern matches if it agrees with the
+pattern on all other syllables.
+
+Entries are grouped by length and mask; within a group they are keyed by the
+pattern with its free syllables set to laghu. So a query is one dict lookup for
+each distinct mask of its length (there are few).
+"""
+
+import pattern_bits
+
+
+class PatternIndex(object):
+  """Maps (packed) patterns to the metres that have them."""
+
+  def __init__(self, first_only=False):
+    """If first_only, a pattern gets only the first metre added for it, as {name: True}.
+
+    Otherwise it gets {name: set()}, the union of the values added for that name.
+    """
+    self._first_only = first_only
+    self._masks_for_length = {}  # length -> [mask], where a mask has no leading 1
+    self._groups = {}            # (length, mask) -> {pattern & ~mask: [(index, name, value)]}
+    self._num_entries = 0
+    self._frozen = False
+
+  def __len__(self):
+    return self._num_entries
+
+  def __eq__(self, other):
+    return (isinstance(other, PatternIndex) and
+            (self._first_only, self._groups) == (other._first_only, other._groups))
+
+  def Lengths(self):
+    """The lengths of the patterns in the index."""
+    return list(self._masks_for_length)
+
+  def Freeze(self):
+    """Disallow further Add()s, so that the index can be shared."""
+    self._frozen = True
+
+  def Add(self, pattern, free, metre_name, value=True):
+    """Add a metre for pattern, with free syllables given by free (a packed pattern with 1s there)."""
+    assert not self._frozen
+    length = pattern_bits.Length(pattern)
+    assert pattern_bits.Length(free) == length, (pattern, free)
+    mask = free ^ (1 << length)
+    masks = self._masks_for_length.setdefault(length, [])
+    if mask not in masks:
+      masks.append(mask)
+    group = self._groups.setdefault((length, mask), {})
+    group.setdefault(pattern & ~mask, []).append((self._num_entries, metre_name, value))
+    self._num_entries += 1
+
+  def PrefixLengths(self, pattern):
+    """The lengths n such that the first n syllables of pattern are a pattern in the index."""
+    length = pattern_bits.Length(pattern)
+    ret = []
+    for (n, masks) in sorted(self._masks_for_length.items()):
+      if n > length:
+        break
+      prefix = pattern >> (length - n)
+      if any(prefix & ~mask in self._groups[(n, mask)] for mask in masks):
+        ret.append(n)
+    return ret
+
+  def Entries(self):
+    """[(pattern, free, metre name, value)], as they were added."""
+    entries = [(index, key, mask | (1 << length), metre_name, value)
+               for ((length, mask), group) in self._groups.items()
+               for (key, group_entries) in group.items()
+               for (index, metre_name, value) in group_entries]
+    entries.sort(key=lambda entry: entry[0])
+    return [entry[1:] for entry in entries]
+
+  def Get(self, pattern):
+    """The {metre name: value} for metres having this pattern, or None if none."""
+    found = []
+    length = pattern_bits.Length(pattern)
+    for mask in self._masks_for_length.get(length, ()):
+      entries = self._groups[(length, mask)].get(pattern & ~mask)
+      if entries:
+        found.extend(entries)
+    if not found:
+      return None
+    # Entries added earlier come first, as in a dict filled in that order.
+    found.sort(key=lambda entry: entry[0])
+    if self._first_only:
+      return {found[0][1]: True}
+    ret = {}
+    for (_, metre_name, value) in found:
+      ret.setdefault(metre_name, set()).update(value)
+    return ret
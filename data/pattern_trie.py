@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""A trie of the patterns of a PatternIndex, to find the metres that a partial verse could be in.
+
+Each pattern (with its free syllables, see data/pattern_index.py) is a path from
+the root, with an edge for each syllable: laghu, guru, or free (either). Walking
+a (packed, see pattern_bits) pattern from the root gives the nodes that it can
+reach: more than one when it goes down both a syllable's edge and a free edge.
+The patterns beginning with it are those below these nodes, and the weight each
+expects next is given by the edge it goes down from there.
+
+The patterns are numbered in the order of a depth-first walk, so those below a
+node are a range of numbers, and listing them takes no search of the subtree.
+
+A walk can be continued from the nodes reached for a prefix of the pattern, so
+as a pattern grows one syllable at a time, each takes only a little work.
+"""
+
+import pattern_bits
+
+# In the weights a pattern expects next: it can end here.
+END = None
+
+_FREE = 2
+
+
+class PatternTrie(object):
+  """The patterns of a PatternIndex, by prefix."""
+
+  def __init__(self, entries):
+    """entries: [(pattern, free, metre name, value)], as from PatternIndex.Entries()."""
+    self._metre_names = [metre_name for (_, _, metre_name, _) in entries]
+    self._children = [[None, None, None]]  # node -> [child by laghu, by guru, by a free syllable]
+    self._ends = [[]]                      # node -> [entry numbers of patterns ending there]
+    for (number, (pattern, free, _, _)) in enumerate(entries):
+      node = 0
+      length = pattern_bits.Length(pattern)
+      for i in range(length - 1, -1, -1):
+        edge = _FREE if (free >> i) & 1 else (pattern >> i) & 1
+        child = self._children[node][edge]
+        if child is None:
+          child = len(self._children)
+          self._children.append([None, None, None])
+          self._ends.append([])
+          self._children[node][edge] = child
+        node = child
+      self._ends[node].append(number)
+    # Number the patterns depth-first, so that those below each node are a range.
+    self._order = []               # position -> entry number
+    self._ranges = [None] * len(self._children)  # node -> (start, end) of positions below it
+    stack = [(0, False)]
+    while stack:
+      (node, done) = stack.pop()
+      if done:
+        self._ranges[node] = (self._ranges[node][0], len(self._order))
+        continue
+      self._ranges[node] = (len(self._order), None)
+      self._order.extend(self._ends[node])
+      stack.append((node, True))
+      stack.extend((child, False) for child in reversed(self._children[node]) if child is not None)
+
+  def NumNodes(self):
+    return len(self._children)
+
+  def Walk(self, pattern, nodes=None, start=0):
+    """The nodes reached by walking syllables start, start + 1, ... of the (packed) pattern from nodes (by default, the root)."""
+    if nodes is None:
+      nodes = (0,)
+    for i in range(pattern_bits.Length(pattern) - 1 - start, -1, -1):
+      if not nodes:
+        break
+      weight = (pattern >> i) & 1
+      following = []
+      for node in nodes:
+        for edge in (weight, _FREE):
+          child = self._children[node][edge]
+          if child is not None:
+            following.append(child)
+      nodes = tuple(following)
+    return nodes
+
+  def MetreNames(self, nodes):
+    """The metres with a pattern below the nodes (from Walk), in the order added."""
+    numbers = set()
+    for node in nodes:
+      (start, end) = self._ranges[node]
+      numbers.update(self._order[start:end])
+    metre_names = {}
+    for number in sorted(numbers):
+      metre_names.setdefault(self._metre_names[number], None)
+    return list(metre_names)
+
+  def NextWeights(self, nodes):
+    """{metre name: the weights (LAGHU, GURU, or END) that its patterns below the nodes (from Walk) expect next}, in the order added."""
+    expected = {}  # entry number -> set of weights
+    for node in nodes:
+      for number in self._ends[node]:
+        expected.setdefault(number, set()).add(END)
+      for (edge, child) in enumerate(self._children[node]):
+        if child is None:
+          continue
+        weights = (pattern_bits.LAGHU, pattern_bits.GURU) if edge == _FREE else (edge,)
+        (start, end) = self._ranges[child]
+        for number in self._order[start:end]:
+          expected.setdefault(number, set()).update(weights)
+    ret = {}
+    for number in sorted(expected):
+      ret.setdefault(self._metre_names[number], set()).update(expected[number])
+    return ret
@@ -1,7 +1,6 @@
 """Align a verse to a given metre."""
 
 
-import slp1
 from transliteration import transliterate
 
 _GAP_CHAR = '-'
@@ -57,54 +56,20 @@ def _Align(s, t):
   return (aligned_s, aligned_t)
 
 
-def _SyllabizeVisual(text):
-  """Break given text into syllables."""
-  syllables = []
-  # Everything until the first vowel is the first syllable
-  i = 0
-  while True:
-    syllable = ''
-    if i == len(text): break
-    while i < len(text):
-      c = text[i]
-      i += 1
-      syllable += c
-      if c in slp1.VOWELS:
-        # Peek ahead to capture all groups until the next vowel
-        groups = []
-        group = ''
-        j = i
-        while j < len(text):
-          c = text[j]
-          group += c
-          j += 1
-          if c in slp1.VOWELS:
-            # This group has a vowel, and shouldn't be consumed
-            break
-          if j == len(text) or c not in slp1.ALPHABET:
-            groups.append(group)
-            group = ''
-        to_add = ''.join(groups)
-        syllable += to_add
-        i += len(to_add)
-        syllables.append(syllable)
-        syllable = ''
-  assert ''.join(syllables) == text, (syllables, text)
-  return syllables
+def AlignVerseToMetre(display_text, spans, metre_pattern_lines):
+  """Match syllables of verse with those of metre.
 
-
-# Take verse_pattern too, because of additional display chars in display_verse
-def AlignVerseToMetre(display_verse, verse_pattern, metre_pattern_lines):
-  """Match syllables of verse with those of metre."""
-  if not verse_pattern:
+  The syllables of the verse are given by spans: the (start, end, weight) of
+  each in display_text, as found by scan.ScanVerseWithSpans.
+  """
+  if not spans:
     return
+  verse_pattern = ''.join('LG'[weight] for (_, _, weight) in spans)
   metre_pattern = ''.join(metre_pattern_lines)
   (aligned_v, aligned_m) = _Align(verse_pattern, metre_pattern)
   assert len(aligned_v) == len(aligned_m)
   assert len(aligned_v) >= len(verse_pattern)
   assert len(aligned_m) >= len(metre_pattern)
-  syllables = _SyllabizeVisual(' '.join(display_verse))
-  assert len(syllables) == len(verse_pattern)
 
   n = len(aligned_m)
   current_line = 0
@@ -113,8 +78,8 @@ def AlignVerseToMetre(display_verse, verse_pattern, metre_pattern_lines):
   out = [[]]
   for i in range(n):
     if aligned_v[i] != _GAP_CHAR:
-      out[-1].append(
-          (syllables[num_consumed_from_verse], aligned_v[i], aligned_m[i]))
+      (start, end, _) = spans[num_consumed_from_verse]
+      out[-1].append((display_text[start:end], aligned_v[i], aligned_m[i]))
       num_consumed_from_verse += 1
     else:
       out[-1].append((aligned_v[i], aligned_v[i], aligned_m[i]))
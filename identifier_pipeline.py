@@ -1,70 +1,284 @@
 """A unified interface to reader + scanner + metrical_data + identifier."""
 
 
+import collections
 import logging
 
 from data import metrical_data
 import display
 from identify import identifier
+from identify import segment
+import pattern_bits
 from read import read
 import scan
-from utils.utils import call_with_log_capture
+from utils import utils
 
 
-class IdentifierPipeline(object):
-  """A single interface to read-scan-data-identify-display."""
+def _Table(database, metre_name, display_text, spans):
+  """The HTML table aligning the verse (its syllables' spans in display_text) to the metre, or None if the metre has no pattern."""
+  known_pattern = database.GetPattern(metre_name)
+  if not known_pattern:
+    return None
+  alignment = display.AlignVerseToMetre(display_text, spans, known_pattern)
+  return display.HtmlTableFromAlignment(alignment)
 
-  def __init__(self):
-    """Initialize whichever of the parts need it."""
-    if not metrical_data.known_full_patterns:
-      metrical_data.InitializeData()
-    self.identifier = identifier.Identifier(metrical_data)
 
-  def _Reset(self):
-    self.debug_read = None
-    self.debug_identify = []
-    self.pattern_lines = []
-    self.tables = []
+class RankedResult(object):
+  """A metre for a verse, with its score (see Identifier.Ranked).
 
-  def IdentifyFromLines(self, input_lines):
-    """Given lines of verse, read-scan-identify-display"""
-    return self.IdentifyFromText('\n'.join(input_lines))
+  Its alignment table is made only when Table() is first called, as aligning is
+  slow.
+  """
 
-  def IdentifyFromText(self, input_text):
-    """Given text of verse, read-scan-identify-display."""
-    self._Reset()
-    logging.info('Got input:\n%s', input_text)
-    ((cleaned_lines, display_lines), self.debug_read) = call_with_log_capture(read.read_text, input_text)
-    pattern_lines = scan.ScanVerse(cleaned_lines)
-    self.pattern_lines = pattern_lines
-    if not pattern_lines:
-      return None
-
-    results = self.identifier.IdentifyFromPatternLines(pattern_lines)
-    self.debug_identify = (['Global:'] + self.identifier.global_debug +
-                           ['Parts:'] + self.identifier.parts_debug)
-    new_results = []
-    if results:
-      for m in list(results.get('exact', [])) + list(results.get('partial', [])) + list(results.get('accidental', [])):
-        known_pattern = metrical_data.GetPattern(m)
-        if known_pattern:
-          alignment = display.AlignVerseToMetre(display_lines,
-                                                ''.join(pattern_lines),
-                                                known_pattern)
-          table = display.HtmlTableFromAlignment(alignment)
-          self.tables.append((m, table))
-        new_results.append(m)
-        break
-    return ('exact' in results, new_results)
+  def __init__(self, ranked_match, database, display_text, spans):
+    (self.metre_name, self.match_type, self.parts_fraction, self.distance, self.score) = ranked_match
+    self._database = database
+    self._display_text = display_text
+    self._spans = spans
+    self._table = None
+
+  def Table(self):
+    """The HTML table aligning the verse to the metre, or None if there is none."""
+    if self._table is None:
+      self._table = _Table(self._database, self.metre_name, self._display_text, self._spans)
+    return self._table
+
+
+def _Scan(display_lines):
+  """(display text, spans of its syllables, pattern lines) of the display lines (see scan.ScanVerseWithSpans)."""
+  (pattern_lines, spans) = scan.ScanVerseWithSpans(display_lines)
+  return (' '.join(display_lines), spans, pattern_lines)
+
+
+class VerseResult(object):
+  """What the pipeline found for a verse: its metre, and how it was read, scanned and identified.
+
+  full_match is whether the verse exactly matches a metre, and results is [the
+  metre found] (exact if there is one, else from a part of the verse), or [] if
+  none. identification is the identifier.Identification, or None if the text
+  had no lines. verse_range is as described in IdentifierPipeline.IdentifyVerses.
+
+  Alignment tables are made only when first asked for, as aligning is slow.
+  """
+
+  def __init__(self, pipeline, scanned, diagnostics, identification, verse_range=None):
+    self._database = pipeline.database
+    self._identifier = pipeline.identifier
+    (self.display_text, self.spans, self.pattern_lines) = scanned
+    self.diagnostics = diagnostics
+    self.identification = identification
+    self.verse_range = verse_range
+    matches = identification.matches if identification is not None else {}
+    self.full_match = 'exact' in matches
+    self.results = []
+    for m in list(matches.get('exact', [])) + list(matches.get('partial', [])) + list(matches.get('accidental', [])):
+      self.results.append(m)
+      break
+    self._tables = None
+
+  @property
+  def tables(self):
+    """[(metre name, HTML alignment table)] for the results."""
+    if self._tables is None:
+      self._tables = []
+      for metre_name in self.results:
+        table = _Table(self._database, metre_name, self.display_text, self.spans)
+        if table is not None:
+          self._tables.append((metre_name, table))
+    return self._tables
+
+  def Ranked(self, k=5):
+    """The k most likely metres (see Identifier.Ranked), as RankedResults."""
+    if self.identification is None:
+      return []
+    return [RankedResult(ranked_match, self._database, self.display_text, self.spans)
+            for ranked_match in self._identifier.Ranked(self.identification, self.pattern_lines, k)]
+
+  def Nearest(self, max_distance=2):
+    """[(distance, metre name)] for the metres nearest the verse (see Identifier.Nearest)."""
+    if self.identification is None:
+      return []
+    return self._identifier.Nearest(self.pattern_lines, max_distance)
 
   def DebugRead(self):
-    return self.debug_read or ''
+    return self.diagnostics.Render()
 
   def DebugScan(self):
-      return '\n'.join(self.pattern_lines)
+    return '\n'.join(pattern_bits.ToString(line) for line in self.pattern_lines)
 
   def DebugIdentify(self):
-    return '\n'.join(self.debug_identify)
+    if self.identification is None:
+      return ''
+    return '\n'.join(['Global:'] + self.identification.global_debug +
+                      ['Parts:'] + self.identification.PartsDebug())
 
   def AllDebugOutput(self):
     return '\n'.join([self.DebugRead(), self.DebugIdentify()])
+
+
+class IdentifierPipeline(object):
+  """A single interface to read-scan-data-identify-display.
+
+  It keeps nothing about the verses it is given: each call returns VerseResults
+  holding all that was found. So one pipeline (made once, as loading the data
+  is slow) can serve any number of threads.
+  """
+
+  def __init__(self, database=None):
+    """Initialize whichever of the parts need it. By default, uses metrical_data.Default()."""
+    self.database = database or metrical_data.Default()
+    self.identifier = identifier.SharedIdentifier(self.database)
+
+  def IdentifyFromLines(self, input_lines, input_scheme=None):
+    """Given lines of verse, read-scan-identify-display"""
+    return self.IdentifyFromText('\n'.join(input_lines), input_scheme)
+
+  def IdentifyFromText(self, input_text, input_scheme=None):
+    """Given text of verse, read-scan-identify-display: the VerseResult.
+
+    The text is read as in input_scheme (a TRANSLITERATION_SCHEME, see
+    transliteration.detect) if given, else in the scheme detected from it.
+    """
+    (scanned, diagnostics) = self._ReadAndScan(input_text, input_scheme)
+    (_, _, pattern_lines) = scanned
+    if not pattern_lines:
+      return VerseResult(self, scanned, diagnostics, None)
+    return VerseResult(self, scanned, diagnostics, self.identifier.Identify(pattern_lines))
+
+  def IdentifyMany(self, input_texts, input_scheme=None):
+    """IdentifyFromText for each of the texts, identifying each distinct part pattern only once.
+
+    Yields the VerseResult for each text in turn. For texts from one document,
+    pass the scheme detected once for all of it (see read.preprocess_and_detect).
+    """
+    read_and_scanned = [self._ReadAndScan(input_text, input_scheme) for input_text in input_texts]
+    identifications = iter(self.identifier.IdentifyMany(
+        [pattern_lines for ((_, _, pattern_lines), _) in read_and_scanned if pattern_lines]))
+    for (scanned, diagnostics) in read_and_scanned:
+      (_, _, pattern_lines) = scanned
+      identification = next(identifications) if pattern_lines else None
+      yield VerseResult(self, scanned, diagnostics, identification)
+
+  def IdentifyVerses(self, input_text, input_scheme=None):
+    """Like IdentifyFromText, for text that may have several verses.
+
+    Text of more than segment.MAX_LINES lines is split into verses (see
+    segment.SegmentLines), and so is a single line too long to be one verse (see
+    segment.SegmentStream). Each verse is then identified by itself.
+
+    Yields the VerseResult for each verse in turn, whose verse_range is its
+    ('lines' or 'syllables', start, end) in the text as read.
+    """
+    (display_lines, diagnostics) = self._Read(input_text, input_scheme)
+    (display_text, spans, pattern_lines) = _Scan(display_lines)
+    verses = []  # (verse range, (display text, spans, pattern lines))
+    nonempty = [i for (i, line) in enumerate(pattern_lines) if pattern_bits.Length(line)]
+    longest = max(self.identifier.VerseLengths(), default=0)
+    if len(nonempty) == 1 and pattern_bits.Length(pattern_lines[nonempty[0]]) > longest:
+      line = pattern_lines[nonempty[0]]
+      for (start, end) in segment.SegmentStream(self.identifier, line):
+        verses.append((('syllables', start, end),
+                       (display_text, spans[start:end], [pattern_bits.Slice(line, start, end)])))
+    elif len(pattern_lines) > segment.MAX_LINES:
+      for (start, end) in segment.SegmentLines(self.identifier, pattern_lines):
+        if any(pattern_bits.Length(line) for line in pattern_lines[start:end]):
+          # Scanned again by itself, as when it is identified alone.
+          verses.append((('lines', start, end), _Scan(display_lines[start:end])))
+    elif pattern_lines:
+      verses.append((('lines', 0, len(pattern_lines)), (display_text, spans, pattern_lines)))
+    identifications = self.identifier.IdentifyMany([verse_pattern_lines for (_, (_, _, verse_pattern_lines)) in verses])
+    for ((verse_range, scanned), identification) in zip(verses, identifications):
+      yield VerseResult(self, scanned, diagnostics, identification, verse_range)
+
+  def _ReadAndScan(self, input_text, input_scheme):
+    """((display text, spans of its syllables, pattern lines), utils.Diagnostics of reading) of the text."""
+    (display_lines, diagnostics) = self._Read(input_text, input_scheme)
+    return (_Scan(display_lines), diagnostics)
+
+  def _Read(self, input_text, input_scheme):
+    """(display lines, utils.Diagnostics of reading) of the text."""
+    logging.info('Got input:\n%s', input_text)
+    with utils.collect_diagnostics() as diagnostics:
+      (_, display_lines) = read.read_text(input_text, input_scheme)
+    return (display_lines, diagnostics)
+
+
+# What IncrementalPipeline.Identify finds for the text typed so far: its pattern
+# lines, the metres it could be the beginning of (taking its last syllable to be
+# either weight), and, if it is a whole verse, the metres it exactly matches.
+TypedVerse = collections.namedtuple('TypedVerse', ['pattern_lines', 'candidates', 'exact'])
+
+class IncrementalPipeline(object):
+  """Read-scan-identify for a verse as it is typed, redoing only what each change affects.
+
+  Each call gets the whole text so far, so no state is kept for each user, but:
+  lines are transliterated and scanned only the first time they are seen (the
+  results are kept, keyed by the line and its transliteration scheme); the
+  candidate metres are narrowed down from those for a prefix of the verse's
+  pattern, if they were found recently (see Identifier.Candidates); and the
+  verse is identified only once it has as many syllables as a verse of some
+  metre can.
+  """
+
+  def __init__(self, database=None, cache_size=4096):
+    """By default, uses metrical_data.Default(). cache_size: the number of lines, and of prefixes, to remember."""
+    self.database = database or metrical_data.Default()
+    self.identifier = identifier.SharedIdentifier(self.database)
+    self._lines = utils.LruCache(cache_size)  # (line, scheme) -> scan.ScanLine of its transliteration
+    self._candidates = utils.LruCache(cache_size)  # pattern -> identifier.Candidates
+    self._verse_lengths = frozenset(self.identifier.VerseLengths())
+    # Makes the pattern trie now, rather than on the first keystroke.
+    self._Candidates(pattern_bits.EMPTY)
+
+  def Identify(self, input_text, input_scheme=None):
+    """The TypedVerse for the text typed so far, in input_scheme if given (else detected)."""
+    (text, input_scheme) = read.preprocess_and_detect(input_text, input_scheme)
+    scanned_lines = []
+    for line in text.splitlines():
+      key = (line, input_scheme)
+      scanned = self._lines.Get(key)
+      if scanned is None:
+        (cleaned_line, _) = read.transliterate_line(line, input_scheme)
+        scanned = scan.ScanLine(cleaned_line)
+        self._lines.Put(key, scanned)
+      scanned_lines.append(scanned)
+    pattern_lines = scan.PatternsOfLines(scanned_lines)
+    pattern = pattern_bits.Join(pattern_lines)
+    length = pattern_bits.Length(pattern)
+    if length:
+      # The last syllable can still become guru (or laghu) as more is typed,
+      # so it is taken to be either.
+      either = (set(self._Candidates(pattern_bits.WithLast(pattern, pattern_bits.LAGHU)).metre_names) |
+                set(self._Candidates(pattern_bits.WithLast(pattern, pattern_bits.GURU)).metre_names))
+      candidates = [metre_name for metre_name in self._Candidates(pattern_bits.Slice(pattern, 0, length - 1)).metre_names
+                    if metre_name in either]
+    else:
+      candidates = self._Candidates(pattern).metre_names
+    exact = []
+    if length in self._verse_lengths and candidates:
+      exact = list(self.identifier.Identify(pattern_lines).matches.get('exact', []))
+    return TypedVerse(pattern_lines, candidates, exact)
+
+  def CacheStats(self):
+    """Stats (see utils.LruCache) of the lines and the prefixes remembered."""
+    return {'lines': self._lines.Stats(), 'candidates': self._candidates.Stats()}
+
+  def _Candidates(self, pattern):
+    """identifier.Candidates for the pattern, narrowed down from those of the longest remembered prefix.
+
+    Those of each prefix in between are found (and remembered) on the way, as
+    the next pattern typed is likely to begin with one of them.
+    """
+    length = pattern_bits.Length(pattern)
+    n = length
+    candidates = self._candidates.Get(pattern)
+    while candidates is None and n > 0:
+      n -= 1
+      candidates = self._candidates.Get(pattern_bits.Slice(pattern, 0, n))
+    if candidates is None:
+      candidates = self.identifier.Candidates(pattern_bits.EMPTY)
+      self._candidates.Put(pattern_bits.EMPTY, candidates)
+    for n in range(n + 1, length + 1):
+      candidates = self.identifier.Candidates(pattern_bits.Slice(pattern, 0, n), candidates)
+      self._candidates.Put(candidates.pattern, candidates)
+    return candidates
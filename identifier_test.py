@@ -3,9 +3,17 @@
 """Data structures that store matching metres for known patterns."""
 
 
+from concurrent import futures
+import random
+import re
 import unittest
 
+from data import metrical_data
+from identify import identifier
 import identifier_pipeline
+import pattern_bits
+from transliteration import brahmic
+from transliteration import detect
 
 
 class BadInput(unittest.TestCase):
@@ -16,14 +24,16 @@ class BadInput(unittest.TestCase):
 
   def testEmpty(self):
     """Identifier should fail with empty input."""
-    self.assertIsNone(self.identifier.IdentifyFromLines([]))
+    result = self.identifier.IdentifyFromLines([])
+    self.assertIsNone(result.identification)
+    self.assertEqual(result.results, [])
 
   def testNoSyllables(self):
     """Identifier should return no result, for input containing no syllabes."""
     # self.assertIsNone(self.identifier.IdentifyFromLines(['t', 't', 't', 't']))
-    (full_match, results) = self.identifier.IdentifyFromLines(['t', 't', 't', 't'])
-    self.assertFalse(full_match)
-    self.assertFalse(results)
+    result = self.identifier.IdentifyFromLines(['t', 't', 't', 't'])
+    self.assertFalse(result.full_match)
+    self.assertFalse(result.results)
 
 
 class KnownValues(unittest.TestCase):
@@ -32,9 +42,9 @@ class KnownValues(unittest.TestCase):
     super(KnownValues, self).__init__(*args, **kwargs)
     self.identifier = identifier_pipeline.IdentifierPipeline()
 
-  def AssertSingleMatchResultEquals(self, identification, metre_name):
+  def AssertSingleMatchResultEquals(self, verse_result, metre_name):
     try:
-      (full_match, results) = identification
+      (full_match, results) = (verse_result.full_match, verse_result.results)
       assert full_match
       assert isinstance(results, list)
       assert len(results) == 1
@@ -100,9 +110,267 @@ class KnownValues(unittest.TestCase):
     """Test a verse that has typos, and see if correct metre can be guessed."""
     verse = ['स्मराहुताशनमुर्मुरचूर्णतां दधुरिवाम्रवनस्य रजःकणाः ।',
              'निपातिताः परितः पथिकव्रजानुपरि ते परितेपुरतो भृशम् ॥']
-    (full_match, results) = self.identifier.IdentifyFromLines(verse)
-    self.assertFalse(full_match)
-    self.assertIsNotNone(results)
+    result = self.identifier.IdentifyFromLines(verse)
+    self.assertFalse(result.full_match)
+    self.assertTrue(result.results)
+
+
+class Batch(unittest.TestCase):
+
+  def __init__(self, *args, **kwargs):
+    super(Batch, self).__init__(*args, **kwargs)
+    self.identifier = identifier_pipeline.IdentifierPipeline()
+
+  def testSameAsOneByOne(self):
+    """IdentifyMany gives the same results and debug output as identifying each verse."""
+    verses = ['karmaṇyevādhikāraste\nmā phaleṣu kadācana |\nmā karmaphalahetur bhūr\nmā te saṅgo stvakarmaṇi ||47||',
+              't\nt',
+              'siṃhaḥ śiśur api nipatati\nmada-malina-kapola-bhittiṣu gajeṣu |\n'
+              'prakṛtir iyaṃ sattvavatāṃ\nna khalu vayas tejaso hetuḥ ||',
+              '',
+              'karmaṇyevādhikāraste\nmā phaleṣu kadācana |\nmā karmaphalahetur bhūr\nmā te saṅgo stvakarmaṇi ||47||']
+    def Summary(result):
+      return (result.full_match, result.results, result.AllDebugOutput(), result.tables)
+    expected = [Summary(self.identifier.IdentifyFromText(verse)) for verse in verses]
+    got = [Summary(result) for result in self.identifier.IdentifyMany(verses)]
+    self.assertEqual(got, expected)
+
+
+class Ranked(unittest.TestCase):
+
+  def __init__(self, *args, **kwargs):
+    super(Ranked, self).__init__(*args, **kwargs)
+    self.identifier = identifier_pipeline.IdentifierPipeline()
+
+  def testExactFirst(self):
+    result = self.identifier.IdentifyFromText('kazcit kAntAvirahaguruNA svAdhikArAt pramattaH\n'
+                                     'zApenAstaMgamitamahimA varSabhogyeNa bhartuH\n'
+                                     'yakSaz cakre janakatanayAsnAnapuNyodakeSu\n'
+                                     'snigdhacchAyAtaruSu vasatiM rAmagiryAzrameSu')
+    ranked = result.Ranked(5)
+    self.assertEqual((ranked[0].metre_name, ranked[0].match_type, ranked[0].parts_fraction),
+                     ('Mandākrāntā', 'exact', 1.0))
+    self.assertTrue(all(other.match_type != 'exact' for other in ranked[1:]))
+
+  def testBadVerse(self):
+    """The alternatives for an imperfect verse are ordered by score, each with its alignment table."""
+    result = self.identifier.IdentifyFromLines(
+        ['स्मराहुताशनमुर्मुरचूर्णतां दधुरिवाम्रवनस्य रजःकणाः ।',
+         'निपातिताः परितः पथिकव्रजानुपरि ते परितेपुरतो भृशम् ॥'])
+    ranked = result.Ranked(3)
+    self.assertEqual(len(ranked), 3)
+    self.assertEqual(ranked[0].metre_name, result.results[0])
+    self.assertEqual([other.score for other in ranked], sorted((other.score for other in ranked), reverse=True))
+    self.assertTrue(all(other.match_type == 'partial' and 0 < other.parts_fraction < 1 for other in ranked))
+    self.assertEqual(ranked[0].Table(), dict(result.tables)[ranked[0].metre_name])
+    table = ''.join(ranked[1].Table())
+    self.assertTrue(re.sub('<[^>]*>|\\s', '', table).startswith('smarāhutāśanamurmura'))
+    self.assertIn('<abbr title="Should be', table)
+
+  def testNearest(self):
+    """Nearest finds the metre of a verse with a few syllables changed."""
+    the_identifier = identifier.SharedIdentifier(metrical_data.Default())
+    pattern = list(''.join(metrical_data.GetPattern('Mandākrāntā')))
+    for i in [5, 40]:
+      pattern[i] = 'L' if pattern[i] == 'G' else 'G'
+    self.assertIn((2, 'Mandākrāntā'), the_identifier.Nearest([pattern_bits.FromString(''.join(pattern))], 2))
+    self.assertNotIn('Mandākrāntā', [name for (_, name) in the_identifier.Nearest([pattern_bits.FromString(''.join(pattern))], 1)])
+
+  def testNearestFreeSyllables(self):
+    """The last syllable of a pāda, which can be either weight, is not counted as an error."""
+    the_identifier = identifier.SharedIdentifier(metrical_data.Default())
+    padas = [list(pada) for pada in metrical_data.GetPattern('Vasantatilakā')]
+    padas[0][-1] = padas[1][-1] = 'L'
+    padas[2][3] = 'L' if padas[2][3] == 'G' else 'G'
+    pattern_lines = [pattern_bits.FromString(''.join(pada)) for pada in padas]
+    self.assertIn((1, 'Vasantatilakā'), the_identifier.Nearest(pattern_lines, 2))
+    ranked = the_identifier.Ranked(the_identifier.Identify(pattern_lines), pattern_lines)
+    self.assertEqual((ranked[0].metre_name, ranked[0].distance), ('Vasantatilakā', 1))
+
+  def testNearestUnidentified(self):
+    """A verse that is not identified is not at distance 0 from any metre, nor near one with no pattern of weights."""
+    the_identifier = identifier.SharedIdentifier(metrical_data.Default())
+    rng = random.Random(0)
+    for length in range(54, 59):
+      pattern_lines = [pattern_bits.FromString(''.join(rng.choice('LG') for _ in range(length // 4 + (i < length % 4))))
+                       for i in range(4)]
+      self.assertFalse(the_identifier.Identify(pattern_lines).matches.get('exact'))
+      nearest = the_identifier.Nearest(pattern_lines, 2)
+      self.assertNotIn('padacaturūrdhva', [name for (_, name) in nearest])
+      self.assertTrue(all(distance > 0 for (distance, _) in nearest), nearest)
+
+
+class Segmentation(unittest.TestCase):
+
+  def __init__(self, *args, **kwargs):
+    super(Segmentation, self).__init__(*args, **kwargs)
+    self.identifier = identifier_pipeline.IdentifierPipeline()
+    self.verses = ['karmaṇyevādhikāraste\nmā phaleṣu kadācana |\nmā karmaphalahetur bhūr\nmā te saṅgo stvakarmaṇi ||47||',
+                   'siṃhaḥ śiśur api nipatati\nmada-malina-kapola-bhittiṣu gajeṣu |\n'
+                   'prakṛtir iyaṃ sattvavatāṃ\nna khalu vayas tejaso hetuḥ ||']
+    self.slp1_verses = ['kazcit kAntAvirahaguruNA svAdhikArAt pramattaH\nzApenAstaMgamitamahimA varSabhogyeNa bhartuH\n'
+                        'yakSaz cakre janakatanayAsnAnapuNyodakeSu\nsnigdhacchAyAtaruSu vasatiM rAmagiryAzrameSu',
+                        'tvayy AdAtuM jalam avanate zArGgiNo varNacaure\ntasyAH sindhoH pRthum api tanuM dUrabhAvAt pravAham\n'
+                        'prekSiSyante gaganagatayo nUnam Avarjya dRSTir\nekaM bhuktAguNam iva bhuvaH sthUlamadhyendranIlam']
+
+  def testShortInputIsOneVerse(self):
+    expected = self.identifier.IdentifyFromText(self.verses[0])
+    got = list(self.identifier.IdentifyVerses(self.verses[0]))
+    self.assertEqual([(result.full_match, result.results) for result in got], [(expected.full_match, expected.results)])
+    self.assertEqual(got[0].verse_range, ('lines', 0, 4))
+
+  def testLines(self):
+    """Consecutive verses are split apart, and each is identified as when alone."""
+    verses = self.verses * 2
+    expected = [(result.full_match, result.results)
+                for result in (self.identifier.IdentifyFromText(verse) for verse in verses)]
+    got = []
+    ranges = []
+    for result in self.identifier.IdentifyVerses('\n\n'.join(verses)):
+      got.append((result.full_match, result.results))
+      ranges.append(result.verse_range)
+    self.assertEqual(got, expected)
+    # Lines as read: each verse is followed by a line for its '||', and an empty one.
+    self.assertEqual(ranges, [('lines', 0, 4), ('lines', 6, 10), ('lines', 12, 16), ('lines', 18, 22)])
+
+  def testStream(self):
+    """A single line of several verses is split at the verse boundaries."""
+    stream = ' '.join(self.slp1_verses * 2).replace('\n', ' ')
+    got = []
+    for result in self.identifier.IdentifyVerses(stream):
+      got.append(((result.full_match, result.results), result.verse_range))
+    self.assertEqual(got, [((True, ['Mandākrāntā']), ('syllables', start, start + 68))
+                           for start in range(0, 4 * 68, 68)])
+
+
+class InputScheme(unittest.TestCase):
+
+  def __init__(self, *args, **kwargs):
+    super(InputScheme, self).__init__(*args, **kwargs)
+    self.identifier = identifier_pipeline.IdentifierPipeline()
+    self.slp1_verse = ('kaScit kAntAvirahaguruRA svADikArAt pramattaH\nSApenAstaMgamitamahimA varzaBogyeRa BartuH\n'
+                       'yakzaS cakre janakatanayAsnAnapuRyodakezu\nsnigDacCAyAtaruzu vasatiM rAmagiryASramezu')
+
+  def testSLP1(self):
+    """SLP1 is read as it is when given, while detection would take it to be Harvard-Kyoto."""
+    result = self.identifier.IdentifyFromText(self.slp1_verse, detect.TRANSLITERATION_SCHEME.SLP1)
+    self.assertEqual((result.full_match, result.results), (True, ['Mandākrāntā']))
+    self.assertEqual(result.DebugRead().splitlines()[1], 'Line 1: kaścit kāntāvirahaguruṇā svādhikārāt pramattaḥ '
+                     '(कश्चित् कान्ताविरहगुरुणा स्वाधिकारात् प्रमत्तः)')
+    self.assertFalse(self.identifier.IdentifyFromText(self.slp1_verse).full_match)
+
+  def testGivenSchemeIsUsed(self):
+    """A given scheme is used even where another would be detected."""
+    verse = 'karmaṇyevādhikāraste\nmā phaleṣu kadācana |\nmā karmaphalahetur bhūr\nmā te saṅgo stvakarmaṇi ||47||'
+    self.assertTrue(self.identifier.IdentifyFromText(verse, detect.TRANSLITERATION_SCHEME.IAST).full_match)
+    self.assertFalse(self.identifier.IdentifyFromText(verse, detect.TRANSLITERATION_SCHEME.HK).full_match)
+
+  def testOtherScripts(self):
+    """Verses in other Brahmic scripts are detected as such, and read."""
+    for script in ['Telugu', 'Tamil', 'Malayalam']:
+      verse = brahmic.Encoder(script).Encode(self.slp1_verse, ' \n')[0]
+      result = self.identifier.IdentifyFromText(verse)
+      self.assertEqual((result.full_match, result.results), (True, ['Mandākrāntā']), script)
+
+  def testSchemeFromName(self):
+    self.assertIsNone(detect.scheme_from_name('auto'))
+    self.assertEqual(detect.scheme_from_name('SLP1'), detect.TRANSLITERATION_SCHEME.SLP1)
+    self.assertRaises(ValueError, detect.scheme_from_name, 'Velthuis')
+
+
+class Concurrency(unittest.TestCase):
+
+  def __init__(self, *args, **kwargs):
+    super(Concurrency, self).__init__(*args, **kwargs)
+    self.identifier = identifier_pipeline.IdentifierPipeline()
+
+  def testSharedPipeline(self):
+    """Threads sharing a pipeline each get the results (and debug output) for their own verse."""
+    verses = ['kazcit kAntAvirahaguruNA svAdhikArAt pramattaH\nzApenAstaMgamitamahimA varSabhogyeNa bhartuH\n'
+              'yakSaz cakre janakatanayAsnAnapuNyodakeSu\nsnigdhacchAyAtaruSu vasatiM rAmagiryAzrameSu',
+              'karmaṇyevādhikāraste\nmā phaleṣu kadācana |\nmā karmaphalahetur bhūr\nmā te saṅgo stvakarmaṇi ||47||',
+              'siṃhaḥ śiśur api nipatati\nmada-malina-kapola-bhittiṣu gajeṣu |\n'
+              'prakṛtir iyaṃ sattvavatāṃ\nna khalu vayas tejaso hetuḥ ||',
+              'स्मराहुताशनमुर्मुरचूर्णतां दधुरिवाम्रवनस्य रजःकणाः ।\n'
+              'निपातिताः परितः पथिकव्रजानुपरि ते परितेपुरतो भृशम् ॥'] * 8
+    def Summary(verse):
+      result = self.identifier.IdentifyFromText(verse)
+      return (result.full_match, result.results, result.tables, result.AllDebugOutput(), result.DebugScan(),
+              [ranked.metre_name for ranked in result.Ranked(3)])
+    expected = [Summary(verse) for verse in verses]
+    with futures.ThreadPoolExecutor(max_workers=8) as executor:
+      got = list(executor.map(Summary, verses))
+    self.assertEqual(got, expected)
+
+
+class Incremental(unittest.TestCase):
+
+  def __init__(self, *args, **kwargs):
+    super(Incremental, self).__init__(*args, **kwargs)
+    self.verse = ('kazcit kAntAvirahaguruNA svAdhikArAt pramattaH\nzApenAstaMgamitamahimA varSabhogyeNa bhartuH\n'
+                  'yakSaz cakre janakatanayAsnAnapuNyodakeSu\nsnigdhacchAyAtaruSu vasatiM rAmagiryAzrameSu')
+
+  def testTyping(self):
+    """As the verse is typed, the candidates are as if found from scratch, and the verse is identified at the end."""
+    incremental = identifier_pipeline.IncrementalPipeline()
+    the_identifier = identifier.SharedIdentifier(incremental.database)
+    for i in range(1, len(self.verse) + 1):
+      typed = incremental.Identify(self.verse[:i])
+      pattern = pattern_bits.Join(typed.pattern_lines)
+      either = set()
+      for weight in [pattern_bits.LAGHU, pattern_bits.GURU]:
+        if pattern != pattern_bits.EMPTY:
+          pattern = pattern_bits.WithLast(pattern, weight)
+        either.update(the_identifier.Candidates(pattern).metre_names)
+      self.assertEqual(set(typed.candidates), either, self.verse[:i])
+      self.assertIn('Mandākrāntā', typed.candidates)
+    self.assertEqual(typed.exact, ['Mandākrāntā'])
+    # Each line was transliterated and scanned once for each character typed in
+    # it (typing a line break adds no line, as the new line is empty).
+    self.assertEqual(incremental.CacheStats()['lines']['misses'], len(self.verse) - self.verse.count('\n'))
+
+  def testNextWeights(self):
+    the_identifier = identifier.SharedIdentifier(metrical_data.Default())
+    pattern = ''.join(metrical_data.GetPattern('Mandākrāntā'))
+    for (n, kind) in [(20, 'full'), (10, 'pada')]:
+      candidates = the_identifier.Candidates(pattern_bits.FromString(pattern[:n]), kind=kind)
+      self.assertIn('Mandākrāntā', candidates.metre_names)
+      self.assertEqual(candidates.NextWeights()['Mandākrāntā'], {pattern_bits.FromString(pattern[n]) & 1})
+    # Anuṣṭup, from its regex: any syllable can come next.
+    candidates = the_identifier.Candidates(pattern_bits.FromString('GGLGLGGL'))
+    self.assertEqual(candidates.NextWeights()['Anuṣṭup (Śloka)'], {pattern_bits.LAGHU, pattern_bits.GURU})
+
+  def testEditing(self):
+    """Changing an earlier line gives what typing the changed text from scratch does."""
+    incremental = identifier_pipeline.IncrementalPipeline()
+    self.assertEqual(incremental.Identify(self.verse).exact, ['Mandākrāntā'])
+    edited = self.verse.replace('kAntA', 'kanta', 1)
+    typed = incremental.Identify(edited)
+    self.assertEqual(typed.exact, [])
+    self.assertNotIn('Mandākrāntā', typed.candidates)
+    self.assertEqual(typed, identifier_pipeline.IncrementalPipeline().Identify(edited))
+    self.assertEqual(incremental.Identify(self.verse).exact, ['Mandākrāntā'])
+
+
+class Cache(unittest.TestCase):
+
+  def testHitsMissesAndEvictions(self):
+    the_identifier = identifier.Identifier(metrical_data.Default(), cache_size=2)
+    verses = [[pattern_bits.FromString(line)] for line in ['GGLLGG', 'LGLGLG', 'GGGGGG']]
+    first = the_identifier.Identify(verses[0])
+    self.assertIs(the_identifier.Identify(verses[0]), first)
+    the_identifier.Identify(verses[1])
+    the_identifier.Identify(verses[2])  # Evicts verses[0]
+    self.assertIsNot(the_identifier.Identify(verses[0]), first)
+    self.assertEqual(the_identifier.Identify(verses[0], 'pada').matches,
+                     the_identifier.IdentifyFromPatternLines(verses[0], 'pada'))
+    self.assertEqual(the_identifier.CacheStats(),
+                     {'size': 2, 'max_size': 2, 'hits': 2, 'misses': 5, 'evictions': 3})
+
+  def testShared(self):
+    database = metrical_data.Default()
+    self.assertIs(identifier.SharedIdentifier(database), identifier.SharedIdentifier(database))
+
 
 if __name__ == '__main__':
   unittest.main()
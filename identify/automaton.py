@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+"""A single automaton that matches a pattern against all known regexes at once.
+
+The regexes in data.metrical_data are over the alphabet {'L', 'G'}, and use only
+'.', grouping and alternation (plus the '^' and '$' anchors around each). Each
+is compiled into a nondeterministic automaton (an alternation of plain strings,
+like the Āryā "loose schema", is compiled into a trie), and all of them are
+joined into one. This is made deterministic lazily: each deterministic state (a
+set of nondeterministic states) is created the first time a pattern reaches it,
+and its transitions are remembered, so a walk over a (packed, see pattern_bits)
+pattern is mostly one list lookup per syllable.
+
+Each deterministic state is labelled with, for each kind of regex ('full',
+'half', 'pada'), the first regex of that kind that accepts there. So one walk
+gives the same answer as trying each list of regexes in order.
+
+Matchers that are not regexes (like data.matra.MatraMetre, which has only a
+.match method) are not compiled in: after the walk, those that come before the
+regex found are tried in order.
+
+Each regex and matcher has bounds on the number of syllables and of mātrās of
+the patterns it can match (from the parsed regex, or the matcher's Bounds()).
+A pattern outside the bounds of all regexes is not walked, and of the other
+matchers only those whose bounds allow the pattern's length and mātrās are
+tried; these are found once for each (length, mātrās) and remembered.
+
+States are created under a lock, so an automaton can be shared by threads.
+"""
+
+import threading
+
+import pattern_bits
+
+
+class _Nfa(object):
+  """A nondeterministic automaton, with states numbered from 0."""
+
+  def __init__(self):
+    self.edges = []      # For each state, a list of (character, next state)
+    self.epsilons = []   # For each state, a list of next states
+    self.accepts = {}    # state -> (kind, index of the regex in its list)
+
+  def NewState(self):
+    self.edges.append([])
+    self.epsilons.append([])
+    return len(self.edges) - 1
+
+  def AddString(self, start, string):
+    """Add a path spelling out string from start, and return its end."""
+    current = start
+    for c in string:
+      following = self.NewState()
+      self.edges[current].append((c, following))
+      current = following
+    return current
+
+  def AddTrie(self, start, strings):
+    """Add paths for all strings from start, sharing prefixes, and return their common end."""
+    end = self.NewState()
+    children = {start: {}}
+    for string in strings:
+      current = start
+      for c in string:
+        following = children[current].get(c)
+        if following is None:
+          following = self.NewState()
+          self.edges[current].append((c, following))
+          children[current][c] = following
+          children[following] = {}
+        current = following
+      if end not in self.epsilons[current]:
+        self.epsilons[current].append(end)
+    return end
+
+  def Add(self, start, node):
+    """Add the parsed regex node starting at start, and return its end state."""
+    (node_type, value) = node
+    if node_type == 'string':
+      return self.AddString(start, value)
+    if node_type == 'sequence':
+      for child in value:
+        start = self.Add(start, child)
+      return start
+    assert node_type == 'alternation'
+    if all(child[0] == 'string' for child in value):
+      return self.AddTrie(start, [child[1] for child in value])
+    end = self.NewState()
+    for child in value:
+      child_start = self.NewState()
+      self.epsilons[start].append(child_start)
+      self.epsilons[self.Add(child_start, child)].append(end)
+    return end
+
+  def Closure(self, states):
+    """All states reachable from the given ones by epsilon moves."""
+    seen = set(states)
+    stack = list(states)
+    while stack:
+      for following in self.epsilons[stack.pop()]:
+        if following not in seen:
+          seen.add(following)
+          stack.append(following)
+    return frozenset(seen)
+
+
+def _Sum(all_bounds):
+  """Bounds for a sequence of parts with the given bounds."""
+  return tuple((sum(bounds[i][0] for bounds in all_bounds), sum(bounds[i][1] for bounds in all_bounds))
+               for i in range(2))
+
+
+def _Union(all_bounds):
+  """Bounds for an alternation of parts with the given (nonempty list of) bounds."""
+  return tuple((min(bounds[i][0] for bounds in all_bounds), max(bounds[i][1] for bounds in all_bounds))
+               for i in range(2))
+
+
+def _Bounds(node):
+  """((min, max) number of syllables, (min, max) number of mātrās) of strings matching node."""
+  (node_type, value) = node
+  if node_type == 'string':
+    return ((len(value), len(value)),
+            (len(value) + value.count('G'), 2 * len(value) - value.count('L')))
+  children = [_Bounds(child) for child in value]
+  if node_type == 'sequence':
+    return _Sum(children)
+  assert node_type == 'alternation'
+  return _Union(children)
+
+
+def _Within(bounds, length, matras):
+  ((min_length, max_length), (min_matras, max_matras)) = bounds
+  return min_length <= length <= max_length and min_matras <= matras <= max_matras
+
+
+_NO_BOUNDS = ((0, float('inf')), (0, float('inf')))
+
+
+def _Parse(regex):
+  """Parse a regex like '^(LG.|GG)(L|G)$' into nested nodes.
+
+  The nodes are ('string', s), ('sequence', [nodes]) and ('alternation', [nodes]).
+  """
+  if not (regex.startswith('^') and regex.endswith('$')):
+    raise ValueError('Regex is not anchored: %s' % regex)
+  text = regex[1:-1]
+  position = 0
+
+  def Alternation():
+    nonlocal position
+    branches = [Sequence()]
+    while position < len(text) and text[position] == '|':
+      position += 1
+      branches.append(Sequence())
+    return branches[0] if len(branches) == 1 else ('alternation', branches)
+
+  def Sequence():
+    nonlocal position
+    children = []
+    while position < len(text) and text[position] not in '|)':
+      c = text[position]
+      position += 1
+      if c in 'LG.':
+        children.append(('string', c))
+      elif c == '(':
+        child = Alternation()
+        if position == len(text) or text[position] != ')':
+          raise ValueError('Unbalanced parentheses in regex: %s' % regex)
+        position += 1
+        if child[0] == 'sequence':
+          children.extend(child[1])
+        else:
+          children.append(child)
+      else:
+        raise ValueError('Unsupported character %r in regex: %s' % (c, regex))
+    # Merge adjacent strings, e.g. 'LG(LL)' -> 'LGLL'
+    merged = []
+    for child in children:
+      if merged and merged[-1][0] == 'string' and child[0] == 'string':
+        merged[-1] = ('string', merged[-1][1] + child[1])
+      else:
+        merged.append(child)
+    if not merged:
+      return ('string', '')
+    return merged[0] if len(merged) == 1 else ('sequence', merged)
+
+  node = Alternation()
+  if position != len(text):
+    raise ValueError('Unbalanced parentheses in regex: %s' % regex)
+  if node[0] == 'alternation':
+    # In '^A|B$', the anchors apply only to A and B respectively.
+    raise ValueError('Unparenthesized alternation in regex: %s' % regex)
+  return node
+
+
+class Automaton(object):
+  """Matches a pattern against several ordered lists of regexes, in one walk."""
+
+  def __init__(self, regexes_by_kind):
+    """regexes_by_kind: a list of (kind, [(regex, matches), ...]).
+
+    Each regex is either anything with a .pattern string, like a compiled regex,
+    or some other matcher with a .match method.
+    """
+    self._nfa = _Nfa()
+    start = self._nfa.NewState()
+    self._matches = {}
+    self._other_matchers = []  # (bounds, kind, index, matcher), in order
+    self._other_matchers_for = {}  # (length, matras) -> [(kind, index, matcher)] within bounds
+    regex_bounds = []
+    self._bounds = {}  # kind -> [bounds of each regex or matcher of that kind]
+    self._owners = [None]  # NFA state -> (kind, index) of the regex it is part of
+    for (kind, known_regexes) in regexes_by_kind:
+      self._matches[kind] = []
+      kind_bounds = self._bounds[kind] = []
+      for (index, (regex, matches)) in enumerate(known_regexes):
+        self._matches[kind].append(matches)
+        if not hasattr(regex, 'pattern'):
+          bounds = regex.Bounds() if hasattr(regex, 'Bounds') else _NO_BOUNDS
+          self._other_matchers.append((bounds, kind, index, regex))
+          kind_bounds.append(bounds)
+          continue
+        node = _Parse(regex.pattern)
+        regex_bounds.append(_Bounds(node))
+        kind_bounds.append(regex_bounds[-1])
+        regex_start = self._nfa.NewState()
+        self._nfa.epsilons[start].append(regex_start)
+        regex_end = self._nfa.Add(regex_start, node)
+        self._nfa.accepts[regex_end] = (kind, index)
+        # Every state of a regex's automaton is on some path to its end.
+        self._owners.extend([(kind, index)] * (len(self._nfa.edges) - len(self._owners)))
+    self._regex_bounds = _Union(regex_bounds) if regex_bounds else ((1, 0), (1, 0))
+    self._ids = {}           # Set of NFA states -> id of deterministic state
+    self._states = []        # id -> set of NFA states
+    self._transitions = []   # id -> [id on laghu, id on guru]
+    self._firsts = []        # id -> {kind: index of first accepting regex}
+    self._labels = []        # id -> {kind: matches}
+    self._live = {}          # id -> {kind: indices of the regexes whose automata it is in}, made when needed
+    self._lock = threading.Lock()
+    self._dead = self._StateId(frozenset())
+    self._start = self._StateId(self._nfa.Closure([start]))
+
+  def _StateId(self, nfa_states):
+    state_id = self._ids.get(nfa_states)
+    if state_id is not None:
+      return state_id
+    state_id = len(self._states)
+    self._ids[nfa_states] = state_id
+    self._states.append(nfa_states)
+    self._transitions.append([None, None])
+    first = {}
+    for nfa_state in nfa_states:
+      if nfa_state in self._nfa.accepts:
+        (kind, index) = self._nfa.accepts[nfa_state]
+        if index < first.get(kind, index + 1):
+          first[kind] = index
+    self._firsts.append(first)
+    self._labels.append({kind: self._matches[kind][index] for (kind, index) in first.items()})
+    return state_id
+
+  def _Step(self, state_id, weight):
+    """The state reached from state_id on reading weight, computed and remembered."""
+    c = 'LG'[weight]
+    following = [nfa_following
+                 for nfa_state in self._states[state_id]
+                 for (edge, nfa_following) in self._nfa.edges[nfa_state]
+                 if edge == c or edge == '.']
+    closure = self._nfa.Closure(following)
+    with self._lock:
+      # The new state is complete before any transition leads to it.
+      following_id = self._StateId(closure)
+      self._transitions[state_id][weight] = following_id
+    return following_id
+
+  def _OtherMatchersFor(self, length, matras):
+    """The other matchers whose bounds allow this many syllables and mātrās, in order."""
+    key = (length, matras)
+    other_matchers = self._other_matchers_for.get(key)
+    if other_matchers is None:
+      other_matchers = [(kind, index, matcher)
+                        for (bounds, kind, index, matcher) in self._other_matchers
+                        if _Within(bounds, length, matras)]
+      self._other_matchers_for[key] = other_matchers
+    return other_matchers
+
+  def Matches(self, pattern):
+    """{kind: matches of the first regex of that kind matching all of pattern}."""
+    length = pattern_bits.Length(pattern)
+    matras = pattern_bits.Matras(pattern)
+    state_id = self._start if _Within(self._regex_bounds, length, matras) else self._dead
+    for i in range(length - 1, -1, -1):
+      if state_id == self._dead:
+        break
+      weight = (pattern >> i) & 1
+      following_id = self._transitions[state_id][weight]
+      if following_id is None:
+        following_id = self._Step(state_id, weight)
+      state_id = following_id
+    other_matchers = self._OtherMatchersFor(length, matras)
+    if not other_matchers:
+      return self._labels[state_id]
+    first = self._firsts[state_id]
+    ret = None
+    for (kind, index, matcher) in other_matchers:
+      if index < first.get(kind, index + 1) and matcher.match(pattern):
+        if ret is None:
+          ret = dict(self._labels[state_id])
+          first = dict(first)
+        ret[kind] = self._matches[kind][index]
+        first[kind] = index
+    return self._labels[state_id] if ret is None else ret
+
+  def PrefixLengths(self, pattern, kind):
+    """The lengths n such that the first n syllables of the (packed) pattern match some regex (or other matcher) of the kind.
+
+    This is one walk, instead of one for each prefix. Other matchers with a
+    PrefixLengths method (like the mātrā metres) are asked once too.
+    """
+    length = pattern_bits.Length(pattern)
+    lengths = set()
+    state_id = self._start
+    for i in range(length + 1):
+      if kind in self._labels[state_id]:
+        lengths.add(i)
+      if i == length or state_id == self._dead:
+        break
+      weight = (pattern >> (length - 1 - i)) & 1
+      following_id = self._transitions[state_id][weight]
+      if following_id is None:
+        following_id = self._Step(state_id, weight)
+      state_id = following_id
+    for (bounds, other_kind, _, matcher) in self._other_matchers:
+      if other_kind != kind:
+        continue
+      if hasattr(matcher, 'PrefixLengths'):
+        lengths.update(matcher.PrefixLengths(pattern))
+        continue
+      matras = 0
+      for n in range(1, length + 1):
+        matras += 1 + ((pattern >> (length - n)) & 1)
+        if _Within(bounds, n, matras) and matcher.match(pattern >> (length - n)):
+          lengths.add(n)
+    return sorted(lengths)
+
+  def PrefixState(self, pattern, state_id=None, start=0):
+    """The state reached by walking syllables start, start + 1, ... of the (packed) pattern from state_id.
+
+    By default the walk is of the whole pattern, from the start. As the state
+    reached for a prefix of a pattern is where the walk for the pattern passes,
+    a walk for a pattern that grows can be continued instead of redone.
+    """
+    length = pattern_bits.Length(pattern)
+    if state_id is None:
+      state_id = self._start
+    for i in range(length - 1 - start, -1, -1):
+      if state_id == self._dead:
+        break
+      weight = (pattern >> i) & 1
+      following_id = self._transitions[state_id][weight]
+      if following_id is None:
+        following_id = self._Step(state_id, weight)
+      state_id = following_id
+    return state_id
+
+  def CouldBegin(self, state_id, pattern, kind):
+    """The matches of each regex (or other matcher) of the kind that some pattern beginning with pattern could match, in order.
+
+    state_id is PrefixState(pattern). A regex can still match if the walk is in
+    some state of its automaton; other matchers are asked, if they have a
+    CouldBegin method, and are otherwise taken to match any pattern within their
+    upper bounds.
+    """
+    indices = set(self._Live(state_id).get(kind, ()))
+    indices.update(self._OtherMatchersBeginning(pattern, kind))
+    return [self._matches[kind][index] for index in sorted(indices)]
+
+  def NextWeights(self, state_id, pattern, kind):
+    """[(matches, weights)] for the regexes (and other matchers) in CouldBegin, where weights are those (LAGHU, GURU, or None for the end) that can come next."""
+    expected = {}  # index -> set of weights
+    for weight in (pattern_bits.LAGHU, pattern_bits.GURU):
+      following_id = self._transitions[state_id][weight]
+      if following_id is None:
+        following_id = self._Step(state_id, weight)
+      for index in self._Live(following_id).get(kind, ()):
+        expected.setdefault(index, set()).add(weight)
+      for index in self._OtherMatchersBeginning(pattern_bits.Append(pattern, weight), kind):
+        expected.setdefault(index, set()).add(weight)
+    for nfa_state in self._states[state_id]:
+      if self._nfa.accepts.get(nfa_state, (None, None))[0] == kind:
+        expected.setdefault(self._nfa.accepts[nfa_state][1], set()).add(None)
+    for (_, other_kind, index, matcher) in self._other_matchers:
+      if other_kind == kind and matcher.match(pattern):
+        expected.setdefault(index, set()).add(None)
+    return [(self._matches[kind][index], expected[index]) for index in sorted(expected)]
+
+  def _Live(self, state_id):
+    """{kind: indices of the regexes of the kind in whose automata some state of state_id is}."""
+    live = self._live.get(state_id)
+    if live is None:
+      live = {}
+      for nfa_state in self._states[state_id]:
+        if self._owners[nfa_state] is not None:
+          (owner_kind, index) = self._owners[nfa_state]
+          live.setdefault(owner_kind, set()).add(index)
+      self._live[state_id] = live
+    return live
+
+  def _OtherMatchersBeginning(self, pattern, kind):
+    """The indices of the other matchers of the kind that some pattern beginning with pattern could match."""
+    length = pattern_bits.Length(pattern)
+    matras = pattern_bits.Matras(pattern)
+    for (((_, max_length), (_, max_matras)), other_kind, index, matcher) in self._other_matchers:
+      if other_kind != kind or length > max_length or matras > max_matras:
+        continue
+      if not hasattr(matcher, 'CouldBegin') or matcher.CouldBegin(pattern):
+        yield index
+
+  def Bounds(self, kind):
+    """For each regex or matcher of the kind, ((min, max) syllables, (min, max) mātrās) it can match."""
+    return self._bounds.get(kind, [])
+
+  def NumStates(self):
+    """Number of deterministic states created so far."""
+    return len(self._states)
@@ -2,71 +2,316 @@
 """Module to identify metre(s) from scanned verse.
 
 The input is a list of "pattern" lines, where a "pattern" is a sequence over the
-alphabet {'L', 'G'}. The output is a list of metre names (strings).
+alphabet {'L', 'G'}, packed into an int (see pattern_bits). The output is a list
+of metre names (strings).
 """
 
 
 import collections
 import logging
-import re
+import threading
+
+from data import pattern_trie
+from identify import automaton
+from identify import nearest
+import pattern_bits
+from utils import utils
 
 class OrderedSet(collections.OrderedDict):
   def add(self, x):
     self[x] = None
 
 
+_shared_identifiers = {}  # database -> Identifier
+_shared_identifiers_lock = threading.Lock()
+
+
+def SharedIdentifier(database):
+  """The Identifier for the database, created once and then shared (with its cache)."""
+  with _shared_identifiers_lock:
+    if database not in _shared_identifiers:
+      _shared_identifiers[database] = Identifier(database)
+    return _shared_identifiers[database]
+
+
+class Identification(object):
+  """The result of an identification: the matches, and how they were found.
+
+  How they were found is kept as a trace of the parts tried and their matches,
+  and rendered into debug lines only if PartsDebug() is called.
+  """
+
+  def __init__(self, matches, input_type, trace, global_debug=()):
+    self.matches = matches  # { 'exact': {..}, 'partial': {...}, 'accidental': {..} }
+    self.global_debug = list(global_debug)
+    self._input_type = input_type
+    self._trace = trace  # [(part_type, pattern, matches for the pattern)]
+
+  def PartsMatched(self):
+    """{metre name: set of the part types in which it matched, other than accidentally}."""
+    parts_matched = {}
+    for (part_type, _, matches_for_part) in self._trace:
+      for (match_type, metre_name, _) in _MatchTypes(self._input_type, part_type, matches_for_part):
+        if match_type != 'accidental':
+          parts_matched.setdefault(metre_name, set()).add(part_type)
+    return parts_matched
+
+  def PartsDebug(self):
+    """Lines describing each part tried, and its matches."""
+    parts_debug = []
+    for (part_type, pattern, matches_for_part) in self._trace:
+      parts_debug.append('  %s pattern %s (%d syllables, %d mātras)' % (
+          part_type, pattern_bits.ToString(pattern), pattern_bits.Length(pattern), pattern_bits.Matras(pattern)))
+      indentation = ' ' * len(parts_debug[-1])
+      for (match_type, metre_name, value) in _MatchTypes(self._input_type, part_type, matches_for_part):
+        parts_debug.append(' %s %s match for: %s %s' % (indentation, match_type, metre_name, value))
+    return parts_debug
+
+
+class Candidates(object):
+  """The metres that a verse (or part) beginning with a (packed) pattern could be in (see Identifier.Candidates)."""
+
+  def __init__(self, pattern, kind, trie, trie_nodes, automaton, state_id):
+    self.pattern = pattern
+    self.kind = kind
+    self._trie = trie
+    self._automaton = automaton
+    # Where the walks for the pattern got to, to continue from for a longer one.
+    self._trie_nodes = trie_nodes
+    self._state_id = state_id
+    self.metre_names = self._trie.MetreNames(trie_nodes)
+    known = set(self.metre_names)
+    for matches in automaton.CouldBegin(state_id, pattern, kind):
+      for metre_name in matches:
+        if metre_name not in known:
+          known.add(metre_name)
+          self.metre_names.append(metre_name)
+
+  def NextWeights(self):
+    """{metre name: the weights (LAGHU, GURU, or None if the pattern can end there) it can have next}, for the metre_names."""
+    next_weights = self._trie.NextWeights(self._trie_nodes)
+    for (matches, weights) in self._automaton.NextWeights(self._state_id, self.pattern, self.kind):
+      for metre_name in matches:
+        next_weights.setdefault(metre_name, set()).update(weights)
+    return next_weights
+
+  def Continued(self, pattern):
+    """The Candidates for the (packed) pattern, which begins with this one's, continuing its walks from where they got to."""
+    start = pattern_bits.Length(self.pattern)
+    return Candidates(pattern, self.kind, self._trie, self._trie.Walk(pattern, self._trie_nodes, start),
+                      self._automaton, self._automaton.PrefixState(pattern, self._state_id, start))
+
+
+# A metre ranked among those matching a verse (see Identifier.Ranked).
+RankedMatch = collections.namedtuple(
+    'RankedMatch', ['metre_name', 'match_type', 'parts_fraction', 'distance', 'score'])
+
+_MATCH_TYPE_SCORES = {'exact': 2, 'partial': 1, 'accidental': 0}
+
+# The parts (other than 'full') that a partial match can be found in.
+_SCORED_PARTS = ('half_1', 'half_2', 'pada_1', 'pada_2', 'pada_3', 'pada_4')
+
+
 class Identifier(object):
-  """An object used to make a single metre-identification call."""
+  """Identifies metres, with a metrical_data.MetreDatabase.
+
+  It keeps no state between calls other than a cache of results, so one
+  identifier can be shared by any number of threads (see SharedIdentifier).
+  """
 
-  def __init__(self, metrical_data):
-    self._Reset()
-    self.metrical_data = metrical_data
+  def __init__(self, database, cache_size=4096):
+    """cache_size: the number of results (of Identify) to remember; 0 for none."""
+    self.database = database
+    self.automaton = automaton.Automaton([
+      ('full', database.known_full_regexes),
+      ('half', database.known_half_regexes),
+      ('pada', database.known_pada_regexes)])
+    # As the database can't change, neither can the results for a verse.
+    self._cache = utils.LruCache(cache_size)
+    self._verse_lengths = self._ComputeVerseLengths()
+    # Made when first needed, as only verses shown alone need it (see Nearest and Ranked).
+    self._nearest_index = None
+    self._nearest_index_lock = threading.Lock()
+    # Also made when first needed: kind -> PatternTrie (see Candidates).
+    self._tries = {}
+    self._tries_lock = threading.Lock()
     logging.info('Identifier is initialized. It knows %d full regexes, %d full patterns, %d half regexes, %d half patterns, %d pada regexes, %d pada patterns',
-                  len(self.metrical_data.known_full_regexes), len(self.metrical_data.known_full_patterns),
-                  len(self.metrical_data.known_half_regexes), len(self.metrical_data.known_half_patterns),
-                  len(self.metrical_data.known_pada_regexes), len(self.metrical_data.known_pada_patterns))
+                  len(database.known_full_regexes), len(database.known_full_patterns),
+                  len(database.known_half_regexes), len(database.known_half_patterns),
+                  len(database.known_pada_regexes), len(database.known_pada_patterns))
+
+  def _ComputeVerseLengths(self):
+    lengths = set(self.database.known_full_patterns.Lengths())
+    all_bounds = self.automaton.Bounds('full')
+    longest = max([high for ((_, high), _) in all_bounds if high != float('inf')] + list(lengths) + [0])
+    for ((low, high), _) in all_bounds:
+      # Matchers without bounds are taken to match no longer verses than the rest.
+      lengths.update(range(low, min(high, longest) + 1))
+    return sorted(lengths)
+
+  def VerseLengths(self):
+    """The numbers of syllables a verse of some known metre can have, in increasing order."""
+    return self._verse_lengths
 
-  def _Reset(self):
-    """Clear all parameters, for use again."""
-    self.global_debug = []
-    self.parts_debug = []
+  def FullVersePrefixLengths(self, pattern):
+    """The lengths n such that the first n syllables of the (packed) pattern are a verse of a known metre."""
+    return sorted(set(self.automaton.PrefixLengths(pattern, 'full')) |
+                  set(self.database.known_full_patterns.PrefixLengths(pattern)))
+
+  def Candidates(self, pattern, previous=None, kind='full'):
+    """The Candidates: metres that a part of the kind (by default a whole verse) beginning with the (packed) pattern could be in.
+
+    Those with known patterns come first, in the order of the database, found
+    with a data.pattern_trie.PatternTrie of them, then those with regexes.
+
+    previous: the Candidates (of the kind) for a prefix of the pattern, whose
+    walks are then continued instead of starting over. As a verse is typed, its
+    pattern mostly grows, so each syllable needs only a little work.
+    """
+    if previous is not None and previous.kind == kind and pattern_bits.StartsWith(pattern, previous.pattern):
+      return previous.Continued(pattern)
+    trie = self._Trie(kind)
+    return Candidates(pattern, kind, trie, trie.Walk(pattern), self.automaton, self.automaton.PrefixState(pattern))
+
+  def CacheStats(self):
+    """Size, hits, misses and evictions of the cache of results."""
+    return self._cache.Stats()
 
   def IdentifyFromPatternLines(self, pattern_lines, input_type='full'):
-    self._Reset()
-    # Too many lines => probably multiple verses.
-    if len(pattern_lines) > 12:
-      self.global_debug.append('Error: too many lines in verse. Perhaps these are multiple verses?')
-      return {}
+    """The matches of Identify(), without the debug output."""
+    return self.Identify(pattern_lines, input_type).matches
 
-    ret = {}  # { 'exact': {..}, 'partial': {...}, 'accidental': {..} }
+  def Identify(self, pattern_lines, input_type='full'):
+    """An Identification of the metres that the pattern lines match.
+
+    Results are cached and shared between calls, so should not be modified.
+    """
+    return self.IdentifyMany([pattern_lines], input_type)[0]
+
+  def IdentifyMany(self, pattern_lines_list, input_type='full'):
+    """Identify() for each of the pattern lines, matching each distinct part pattern only once.
+
+    Verses in a text share many parts (Anuṣṭup pādas, for instance), so this is
+    much quicker for a whole text than identifying one verse at a time.
+    """
+    keys = [(tuple(pattern_lines), input_type) for pattern_lines in pattern_lines_list]
+    identifications = {}
+    parts_for_key = {}
+    for key in keys:
+      if key in identifications or key in parts_for_key:
+        continue
+      identification = self._cache.Get(key)
+      if identification is not None:
+        identifications[key] = identification
+        continue
+      # Too many lines => probably multiple verses.
+      pattern_lines = key[0]
+      parts_for_key[key] = _Parts(pattern_lines) if len(pattern_lines) <= 12 else None
+    matches_for_pattern = {}
+    for parts in parts_for_key.values():
+      for (_, part_patterns) in parts or []:
+        for pattern in part_patterns:
+          if pattern not in matches_for_pattern:
+            matches_for_pattern[pattern] = self._MatchesFor(pattern)
+    for (key, parts) in parts_for_key.items():
+      identifications[key] = self._Identification(parts, input_type, matches_for_pattern)
+      self._cache.Put(key, identifications[key])
+    return [identifications[key] for key in keys]
+
+  def Ranked(self, identification, pattern_lines, k=5):
+    """The (at most) k metres of the Identification of the pattern lines most likely to be right, as RankedMatches, best first.
+
+    They are ranked by match type (exact, then partial, then accidental), then
+    by the fraction of the halves and pādas that match the metre, then by the
+    edit distance from the verse to the metre's pattern, with its free syllables
+    (None if it has no pattern; see Nearest).
+    The score is a number that orders them the same way.
+    """
+    best_type = {}
+    for match_type in ['exact', 'partial', 'accidental']:
+      for metre_name in identification.matches.get(match_type, []):
+        best_type.setdefault(metre_name, match_type)
+    parts_matched = identification.PartsMatched()
+    groups = {}  # (match type score, parts fraction) -> [metre name], in order
+    for (metre_name, match_type) in best_type.items():
+      if match_type == 'exact':
+        parts_fraction = 1.0
+      else:
+        parts_fraction = len(parts_matched.get(metre_name, set()).intersection(_SCORED_PARTS)) / len(_SCORED_PARTS)
+      groups.setdefault((_MATCH_TYPE_SCORES[match_type], parts_fraction), []).append(metre_name)
+    verse = pattern_bits.Join(pattern_lines)
+    ranked = []
+    # Distances only reorder metres within a group, so are computed only for
+    # the groups that can make it into the top k.
+    for ((type_score, parts_fraction), metre_names) in sorted(groups.items(), reverse=True):
+      if len(ranked) >= k:
+        break
+      group = []
+      for metre_name in metre_names:
+        distance_and_length = self._NearestIndex().MetreDistance(verse, metre_name)
+        (distance, closeness) = (None, 0)
+        if distance_and_length is not None:
+          (distance, length) = distance_and_length
+          closeness = 1 - distance / max(pattern_bits.Length(verse), length, 1)
+        score = type_score + 0.9 * parts_fraction + 0.09 * closeness
+        group.append(RankedMatch(metre_name, best_type[metre_name], parts_fraction, distance, score))
+      group.sort(key=lambda ranked_match: -ranked_match.score)
+      ranked.extend(group)
+    return ranked[:k]
+
+  def Nearest(self, pattern_lines, max_distance=2):
+    """[(distance, metre name)] for the metres whose pattern is within max_distance edits of the verse's, nearest first.
+
+    This finds metres for verses with a few wrong syllables, which may not
+    otherwise match at all. Only metres with known patterns are found, and their
+    free syllables (as when identifying) match either weight.
+    """
+    (found, _) = self._NearestIndex().Search(pattern_bits.Join(pattern_lines), max_distance)
+    return found
 
-    for (part_type, part_patterns) in _Parts(pattern_lines):
+  def _NearestIndex(self):
+    with self._nearest_index_lock:
+      if self._nearest_index is None:
+        self._nearest_index = nearest.NearestMetreIndex(
+            (pattern, free, metre_name) for (pattern, free, metre_name, _) in self.database.known_full_patterns.Entries())
+      return self._nearest_index
+
+  def _Trie(self, kind):
+    trie = self._tries.get(kind)
+    if trie is not None:
+      return trie
+    with self._tries_lock:
+      if kind not in self._tries:
+        known_patterns = {'full': self.database.known_full_patterns,
+                          'half': self.database.known_half_patterns,
+                          'pada': self.database.known_pada_patterns}[kind]
+        self._tries[kind] = pattern_trie.PatternTrie(known_patterns.Entries())
+      return self._tries[kind]
+
+  def _Identification(self, parts, input_type, matches_for_pattern):
+    if parts is None:
+      return Identification({}, input_type, [], global_debug=[
+          'Error: too many lines in verse. Perhaps these are multiple verses?'])
+
+    ret = {}  # { 'exact': {..}, 'partial': {...}, 'accidental': {..} }
+    trace = []
+    for (part_type, part_patterns) in parts:
       for pattern in part_patterns:
-        self.parts_debug.append('  %s pattern %s (%d syllables, %d mātras)' % (part_type, pattern, len(pattern), _MatraCount(pattern)))
-        last_debug_line_length = len(self.parts_debug[-1])
-        matches_for_part = self._MatchesFor(pattern, input_type, part_type, last_debug_line_length)
-        # Loop over full, half, pada
-        for (metre_name, value) in matches_for_part.get('full', {}).items():
-          assert value == True
-          match_type = _MatchTypeFull(input_type, part_type)
-          self.parts_debug.append(' %s %s match for: %s %s' % (' ' * last_debug_line_length, match_type, metre_name, value))
-          ret.setdefault(match_type, OrderedSet()).add(metre_name)
-        for (metre_name, value) in matches_for_part.get('half', {}).items():
-          match_type = _MatchTypeHalf(input_type, part_type, value)
-          self.parts_debug.append(' %s %s match for: %s %s' % (' ' * last_debug_line_length, match_type, metre_name, value))
-          ret.setdefault(match_type, OrderedSet()).add(metre_name)
-        for (metre_name, value) in matches_for_part.get('pada', {}).items():
-          match_type = _MatchTypePada(input_type, part_type, value)
-          self.parts_debug.append(' %s %s match for: %s %s' % (' ' * last_debug_line_length, match_type, metre_name, value))
+        matches_for_part = matches_for_pattern[pattern]
+        trace.append((part_type, pattern, matches_for_part))
+        for (match_type, metre_name, _) in _MatchTypes(input_type, part_type, matches_for_part):
           ret.setdefault(match_type, OrderedSet()).add(metre_name)
     # Done looping over all part types.
-    return ret
+    return Identification(ret, input_type, trace)
 
-  def _MatchesFor(self, pattern, input_type, part_type, debug_indentation_depth):
+  def _MatchesFor(self, pattern):
+    """{'full': ..., 'half': ..., 'pada': ...}: the matches of the pattern as each kind of part."""
+    # One walk of the automaton tries all the full, half and pada regexes.
+    regex_matches = self.automaton.Matches(pattern)
     ret = {
-      'full': _MatchesIn(pattern, self.metrical_data.known_full_patterns, self.metrical_data.known_full_regexes),
-      'half': _MatchesIn(pattern, self.metrical_data.known_half_patterns, self.metrical_data.known_half_regexes),
-      'pada': _MatchesIn(pattern, self.metrical_data.known_pada_patterns, self.metrical_data.known_pada_regexes)
+      'full': _MatchesIn(pattern, self.database.known_full_patterns, regex_matches.get('full', {})),
+      'half': _MatchesIn(pattern, self.database.known_half_patterns, regex_matches.get('half', {})),
+      'pada': _MatchesIn(pattern, self.database.known_pada_patterns, regex_matches.get('pada', {}))
     }
     assert type(ret.get('full', {})) == dict
     assert type(ret.get('half', {})) == dict
@@ -74,15 +319,25 @@ class Identifier(object):
     return ret
 
 
-def _MatchesIn(pattern, known_patterns, known_regexes):
-  if pattern in known_patterns:
-    assert type(known_patterns[pattern]) == dict
-    return known_patterns[pattern]
-  for (regex, matches) in known_regexes:
-    if regex.match(pattern):
-      assert type(matches) == dict
-      return matches
-  return {}
+def _MatchesIn(pattern, known_patterns, regex_matches):
+  """Known patterns take precedence over regexes."""
+  matches = known_patterns.Get(pattern)
+  if matches is not None:
+    assert type(matches) == dict
+    return matches
+  assert type(regex_matches) == dict
+  return regex_matches
+
+
+def _MatchTypes(input_type, part_type, matches_for_part):
+  """(match type, metre name, value) for each match of a part: full, then half, then pada."""
+  for (metre_name, value) in matches_for_part.get('full', {}).items():
+    assert value == True
+    yield (_MatchTypeFull(input_type, part_type), metre_name, value)
+  for (metre_name, value) in matches_for_part.get('half', {}).items():
+    yield (_MatchTypeHalf(input_type, part_type, value), metre_name, value)
+  for (metre_name, value) in matches_for_part.get('pada', {}).items():
+    yield (_MatchTypePada(input_type, part_type, value), metre_name, value)
 
 
 def _MatchTypeFull(input_type, part_type):
@@ -117,13 +372,13 @@ def _MatchTypePada(input_type, part_type, value):
 def _SplitHalves(full_pattern):
   """Attempt splits at halves."""
   splits = []
-  n = len(full_pattern)
+  n = pattern_bits.Length(full_pattern)
   if n % 2 == 0:
     m = n // 2
-    splits.append([full_pattern[:m], full_pattern[m:]])
+    splits.append([pattern_bits.Slice(full_pattern, 0, m), pattern_bits.Slice(full_pattern, m, n)])
   else:
     for m in [(n-1)//2, (n+1)//2]:
-      splits.append([full_pattern[:m], full_pattern[m:]])
+      splits.append([pattern_bits.Slice(full_pattern, 0, m), pattern_bits.Slice(full_pattern, m, n)])
   return splits
 
 
@@ -141,7 +396,7 @@ def _SplitQuarters(full_pattern):
 
   splits = []
   mss = []
-  n = len(full_pattern)
+  n = pattern_bits.Length(full_pattern)
   if n % 4 == 0:
     m = n // 4
     mss.append(Cumulative([m, m, m]))
@@ -178,17 +433,13 @@ def _SplitQuarters(full_pattern):
     mss.append(Cumulative([m, m, m - 1]))
     mss.append(Cumulative([m, m, m]))
   for ms in mss:
-    splits.append([full_pattern[:ms[0]],
-                   full_pattern[ms[0]:ms[1]],
-                   full_pattern[ms[1]:ms[2]],
-                   full_pattern[ms[2]:]])
+    splits.append([pattern_bits.Slice(full_pattern, 0, ms[0]),
+                   pattern_bits.Slice(full_pattern, ms[0], ms[1]),
+                   pattern_bits.Slice(full_pattern, ms[1], ms[2]),
+                   pattern_bits.Slice(full_pattern, ms[2], n)])
   return splits
 
 
-def _IsPattern(pattern):
-  return re.match('^[LG]+$', pattern)
-
-
 # TODO(shreevatsa): Distinguish between exact (unique) and approximate halves/padas.
 def _Parts(pattern_lines):
   """ {
@@ -202,8 +453,8 @@ def _Parts(pattern_lines):
     'lines': [...] (can overlap with pada_n / half_n)
   }.items() (ordered)
   """
-  pattern_lines = [line for line in pattern_lines if _IsPattern(line)]
-  full_pattern = ''.join(pattern_lines)
+  pattern_lines = [line for line in pattern_lines if line != pattern_bits.EMPTY]
+  full_pattern = pattern_bits.Join(pattern_lines)
   ret = {}
   def add(x, e): ret.setdefault(x, set()).add(e)
   ret['full'] = [full_pattern]
@@ -218,21 +469,21 @@ def _Parts(pattern_lines):
   # Add groups of lines to 'half_*' and 'pada_*'
   n = len(pattern_lines)
   if n % 2 == 0:
-    half_1 = ''.join(pattern_lines[ : n//2])
+    half_1 = pattern_bits.Join(pattern_lines[ : n//2])
     add('half_1', half_1)
     for (a, b) in _SplitHalves(half_1):
       add('pada_1', a)
       add('pada_2', b)
-    half_2 = ''.join(pattern_lines[n//2 : ])
+    half_2 = pattern_bits.Join(pattern_lines[n//2 : ])
     add('half_2', half_2)
     for (c, d) in _SplitHalves(half_2):
       add('pada_3', c)
       add('pada_4', d)
   if n % 4 == 0:
-    add('pada_1', ''.join(pattern_lines[: n//4]))
-    add('pada_2', ''.join(pattern_lines[n//4 : n//2]))
-    add('pada_3', ''.join(pattern_lines[n//2 : 3*n//4]))
-    add('pada_4', ''.join(pattern_lines[3*n//4 : ]))
+    add('pada_1', pattern_bits.Join(pattern_lines[: n//4]))
+    add('pada_2', pattern_bits.Join(pattern_lines[n//4 : n//2]))
+    add('pada_3', pattern_bits.Join(pattern_lines[n//2 : 3*n//4]))
+    add('pada_4', pattern_bits.Join(pattern_lines[3*n//4 : ]))
   if n not in [1, 2, 4]:
     # When n is 1, 2, or 4, each line already accounted for as full/half/pada.
     ret['lines'] = pattern_lines
@@ -246,6 +497,3 @@ def _Parts(pattern_lines):
            ('pada_4', ret.get('pada_4', set())),
            ('lines', ret.get('lines', set()))
          ]
-
-def _MatraCount(pattern):
-  return sum(2 if c == 'G' else 1 for c in pattern)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""An index of the metres' patterns, to find those nearest a verse with a few wrong syllables.
+
+The index is a BK-tree (Burkhard and Keller): each node is a pattern, and its
+children are keyed by their edit distance from it. As edit distance satisfies
+the triangle inequality, a search for the patterns within distance k of a verse
+only needs to go into the children whose key is within k of the verse's distance
+from the node, which for small k is a small part of the tree.
+
+Edit distances are computed bit-parallel (Myers' algorithm, in the form given by
+Hyyrö), on the packed patterns (see pattern_bits): each syllable of the verse
+takes a few operations on ints as long as the metre's pattern, instead of a row
+of the dynamic program.
+
+The patterns are those of a data.pattern_index.PatternIndex, whose free
+syllables (usually the last of each pāda) match either weight, as when
+identifying. That breaks the triangle inequality, so the tree is of the patterns
+with their free syllables laghu: the distance to a pattern is at most its number
+of free syllables less than to that, and the search allows for it. Metres known
+only by regexes, or by patterns that can't be packed, are not in the index.
+"""
+
+import pattern_bits
+
+
+class _Pattern(object):
+  """A metre's pattern (a string over L, G and '.'), ready for computing edit distances from it."""
+
+  def __init__(self, pattern):
+    self.pattern = pattern
+    self.length = len(pattern)
+    # Bit i is set where syllable i can be laghu (or guru).
+    self.laghu_mask = sum(1 << i for (i, c) in enumerate(pattern) if c in 'L.')
+    self.guru_mask = sum(1 << i for (i, c) in enumerate(pattern) if c in 'G.')
+
+  def Distance(self, bits):
+    """The edit distance between the (packed) pattern bits and this pattern."""
+    m = self.length
+    n = pattern_bits.Length(bits)
+    if m == 0:
+      return n
+    all_ones = (1 << m) - 1
+    last = 1 << (m - 1)
+    # Vertical deltas (+1 or -1) of the current column of the dynamic program.
+    positive = all_ones
+    negative = 0
+    score = m
+    for i in range(n - 1, -1, -1):
+      equal = self.guru_mask if (bits >> i) & 1 else self.laghu_mask
+      x = equal | negative
+      diagonal = (((x & positive) + positive) ^ positive) | x
+      horizontal_positive = negative | (~(diagonal | positive) & all_ones)
+      horizontal_negative = positive & diagonal
+      if horizontal_positive & last:
+        score += 1
+      elif horizontal_negative & last:
+        score -= 1
+      # The first row of the dynamic program increases by 1 at each step.
+      x = ((horizontal_positive << 1) | 1) & all_ones
+      negative = x & diagonal
+      positive = ((horizontal_negative << 1) | ~(x | diagonal)) & all_ones
+    return score
+
+
+def _WithFreeSyllables(pattern, free):
+  """The (packed) pattern as a string, with '.' for its free syllables."""
+  return ''.join('.' if f == 'G' else c for (c, f) in zip(pattern_bits.ToString(pattern), pattern_bits.ToString(free)))
+
+
+class _Node(object):
+
+  def __init__(self, pattern, free, metre_names):
+    self.pattern = _Pattern(_WithFreeSyllables(pattern, free))
+    self.num_free = bin(free).count('1') - 1
+    # The pattern with its free syllables laghu, by which the node is placed in the tree.
+    self.fixed_bits = pattern & ~(free ^ (1 << pattern_bits.Length(free)))
+    self.fixed = _Pattern(pattern_bits.ToString(self.fixed_bits))
+    self.metre_names = metre_names
+    self.children = {}  # distance -> _Node
+    self.max_free = self.num_free  # of any node in the subtree
+
+
+class NearestMetreIndex(object):
+  """Finds the metres whose pattern is within a given edit distance of a verse's."""
+
+  def __init__(self, entries):
+    """entries: [(pattern, free, metre name)], as in a data.pattern_index.PatternIndex of full patterns."""
+    names_for_pattern = {}
+    for (pattern, free, metre_name) in entries:
+      names = names_for_pattern.setdefault((pattern, free), [])
+      if metre_name not in names:
+        names.append(metre_name)
+    self._root = None
+    self._nodes_for_metre = {}  # metre name -> [_Node]
+    self.num_patterns = len(names_for_pattern)
+    for ((pattern, free), metre_names) in names_for_pattern.items():
+      node = _Node(pattern, free, metre_names)
+      self._Insert(node)
+      for metre_name in metre_names:
+        self._nodes_for_metre.setdefault(metre_name, []).append(node)
+
+  def _Insert(self, node):
+    if self._root is None:
+      self._root = node
+      return
+    parent = self._root
+    while True:
+      parent.max_free = max(parent.max_free, node.num_free)
+      distance = parent.fixed.Distance(node.fixed_bits)
+      child = parent.children.get(distance)
+      if child is None:
+        parent.children[distance] = node
+        return
+      parent = child
+
+  def Search(self, bits, max_distance):
+    """(found, number of patterns tried) for the metres within max_distance of the (packed) pattern.
+
+    found is [(distance, metre name)], nearest first, with each metre's nearest pattern.
+    """
+    distance_for_metre = {}
+    num_tried = 0
+    nodes = [self._root] if self._root is not None else []
+    while nodes:
+      node = nodes.pop()
+      fixed_distance = node.fixed.Distance(bits)
+      num_tried += 1
+      if fixed_distance - node.num_free <= max_distance:
+        distance = node.pattern.Distance(bits) if node.num_free else fixed_distance
+        if distance <= max_distance:
+          for metre_name in node.metre_names:
+            distance_for_metre[metre_name] = min(distance, distance_for_metre.get(metre_name, distance))
+      nodes.extend(child for (key, child) in node.children.items()
+                   if abs(fixed_distance - key) <= max_distance + child.max_free)
+    found = sorted((distance, metre_name) for (metre_name, distance) in distance_for_metre.items())
+    return (found, num_tried)
+
+  def MetreDistance(self, bits, metre_name):
+    """(distance, length) of the metre's pattern nearest the (packed) pattern, or None if the metre is not in the index."""
+    nodes = self._nodes_for_metre.get(metre_name)
+    if not nodes:
+      return None
+    return min((node.pattern.Distance(bits), node.pattern.length) for node in nodes)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Splitting a long input (several verses) into consecutive verses.
+
+The lines are split into groups of consecutive lines, one group per verse, by
+dynamic programming: best[j] is the best split of the first j lines, and is
+found from best[i] for the (at most MAX_LINES) i < j such that lines i to j
+could be a verse. The best split is the one covering the most lines by exact
+matches (and then by partial matches), and among those, the one with fewest
+verses.
+
+Only groups with about as many syllables as a verse of some known metre can
+have (see Identifier.VerseLengths) are identified, so the work is at most
+MAX_LINES identifications per line, and usually far fewer.
+
+A single long line (or stream) of syllables is split the same way, syllable by
+syllable, into verses that exactly match a known metre (see _STREAM_VERSE_COST).
+"""
+
+import pattern_bits
+
+
+# As many lines as the identifier accepts for one verse.
+MAX_LINES = 12
+
+# A verse with this many syllables more or fewer than a known length can still
+# match partially (see identifier._SplitQuarters).
+_SLACK = 2
+
+# Without line breaks, a long stream can often be covered entirely by verses of
+# metres with very short pādas. So in a stream, each verse costs this many
+# syllables: only longer verses are found, and fewer, longer ones are preferred.
+_STREAM_VERSE_COST = 16
+
+
+def _Score(identification, num_lines):
+  if 'exact' in identification.matches:
+    return 2 * num_lines
+  if 'partial' in identification.matches:
+    return num_lines
+  return 0
+
+
+def SegmentLines(identifier, pattern_lines):
+  """Split the (packed) pattern lines into verses.
+
+  Returns a list of (start, end) ranges of lines, which cover all the lines, in
+  order.
+  """
+  n = len(pattern_lines)
+  lengths = [pattern_bits.Length(line) for line in pattern_lines]
+  verse_lengths = set(length + slack
+                      for length in identifier.VerseLengths()
+                      for slack in range(-_SLACK, _SLACK + 1))
+  max_verse_length = max(verse_lengths, default=0)
+
+  candidates = []  # (start, end) of groups of lines that could be a verse
+  for start in range(n):
+    num_syllables = 0
+    for end in range(start + 1, min(start + MAX_LINES, n) + 1):
+      num_syllables += lengths[end - 1]
+      if num_syllables > max_verse_length:
+        break
+      if num_syllables in verse_lengths and lengths[start] and lengths[end - 1]:
+        candidates.append((start, end))
+  identifications = identifier.IdentifyMany([pattern_lines[start:end] for (start, end) in candidates])
+  scores = {}
+  for ((start, end), identification) in zip(candidates, identifications):
+    scores.setdefault(end, []).append((start, _Score(identification, end - start)))
+
+  # best[j] = (score, -number of verses) of the best split of the first j lines
+  best = [(0, 0)] + [None] * n
+  back = [None] * (n + 1)
+  for end in range(1, n + 1):
+    # A line by itself, even if it is not a verse.
+    (score, negative_count) = best[end - 1]
+    best[end] = (score, negative_count - 1)
+    back[end] = end - 1
+    for (start, group_score) in scores.get(end, []):
+      (score, negative_count) = best[start]
+      option = (score + group_score, negative_count - 1)
+      if option > best[end]:
+        best[end] = option
+        back[end] = start
+  segments = []
+  end = n
+  while end > 0:
+    segments.append((back[end], end))
+    end = back[end]
+  return segments[::-1]
+
+
+def SegmentStream(identifier, pattern):
+  """Split one long (packed) pattern into verses of known metres.
+
+  Returns a list of (start, end) ranges of syllables, which cover the whole
+  pattern, in order: the verses found, and the runs of syllables between them.
+  """
+  n = pattern_bits.Length(pattern)
+  longest = max(identifier.VerseLengths(), default=0)
+  # best[j] = score of the best split of the first j syllables: the number of
+  # syllables in verses found, less _STREAM_VERSE_COST for each verse.
+  best = [0] * (n + 1)
+  back = [None] * (n + 1)
+  for start in range(n):
+    if best[start] > best[start + 1]:
+      best[start + 1] = best[start]
+      back[start + 1] = None
+    window = pattern_bits.Slice(pattern, start, min(start + longest, n))
+    for length in identifier.FullVersePrefixLengths(window):
+      score = best[start] + length - _STREAM_VERSE_COST
+      if score > best[start + length]:
+        best[start + length] = score
+        back[start + length] = start
+  segments = []
+  end = n
+  while end > 0:
+    if back[end] is not None:
+      segments.append((back[end], end))
+      end = back[end]
+      continue
+    # Syllables not in any verse, up to the previous verse.
+    start = end - 1
+    while start > 0 and back[start] is None:
+      start -= 1
+    segments.append((start, end))
+    end = start
+  return segments[::-1]
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for mātrā metres."""
+
+
+import contextlib
+import io
+import random
+import re
+import unittest
+
+from data import matra
+from data import metrical_data
+import pattern_bits
+
+
+def _AryaFamily():
+  with contextlib.redirect_stdout(io.StringIO()):
+    database = metrical_data.Default()
+  return [metre for (metre, _) in database.known_full_regexes
+          if isinstance(metre, matra.MatraMetre)]
+
+
+class KnownValues(unittest.TestCase):
+
+  def testKnown(self):
+    metre = matra.MatraMetre('Test', [[('GG', 'LLLL')], [3]])
+    self.assertTrue(metre.match(pattern_bits.FromString('GGGL')))
+    self.assertTrue(metre.match(pattern_bits.FromString('LLLLLLL')))
+    self.assertTrue(metre.match(pattern_bits.FromString('GGLL')))    # 3 - 1 mātrās, ending in laghu
+    self.assertFalse(metre.match(pattern_bits.FromString('GGG')))     # 3 - 1 mātrās, ending in guru
+    self.assertFalse(metre.match(pattern_bits.FromString('GLLGL')))
+    self.assertFalse(metre.match(pattern_bits.FromString('')))
+
+  def testSameAsRegex(self):
+    """The dynamic program accepts exactly what the (huge) regex does."""
+    rng = random.Random(0)
+    for metre in _AryaFamily():
+      regex = re.compile(metre.Regex())
+      for _ in range(300):
+        pattern = ''
+        for pada in metre.padas:
+          for slot in pada:
+            if isinstance(slot, int):
+              pattern += ''.join(rng.choice('LG') for _ in range(slot // 2 + rng.randint(0, slot // 2)))
+            else:
+              pattern += rng.choice(slot)
+        if rng.random() < 0.5:
+          i = rng.randrange(len(pattern))
+          pattern = pattern[:i] + rng.choice(['', 'L', 'G', 'LL']) + pattern[i + 1:]
+        self.assertEqual(bool(metre.match(pattern_bits.FromString(pattern))), bool(regex.match(pattern)), (metre.name, pattern))
+        if regex.match(pattern):
+          ((min_length, max_length), (min_matras, max_matras)) = metre.Bounds()
+          self.assertTrue(min_length <= len(pattern) <= max_length, (metre.name, pattern))
+          self.assertTrue(min_matras <= len(pattern) + pattern.count('G') <= max_matras, (metre.name, pattern))
+
+
+if __name__ == '__main__':
+  unittest.main()
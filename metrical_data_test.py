@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for metrical_data."""
+
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from data import metrical_data
+from identify import identifier
+import pattern_bits
+
+
+def _Database():
+  with contextlib.redirect_stdout(io.StringIO()):
+    return metrical_data.Default()
+
+
+class Snapshot(unittest.TestCase):
+
+  def setUp(self):
+    self.database = _Database()
+    self.directory = tempfile.mkdtemp()
+    self.snapshot_file = os.path.join(self.directory, 'metrical_data.snapshot')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testRoundTrip(self):
+    metrical_data._WriteSnapshot(self.snapshot_file, 'some-hash', self.database)
+    self.assertEqual(metrical_data._ReadSnapshot(self.snapshot_file, 'some-hash'),
+                     metrical_data._SnapshotData(self.database))
+
+  def testStale(self):
+    metrical_data._WriteSnapshot(self.snapshot_file, 'some-hash', self.database)
+    self.assertIsNone(metrical_data._ReadSnapshot(self.snapshot_file, 'other-hash'))
+
+  def testMissing(self):
+    self.assertIsNone(metrical_data._ReadSnapshot(self.snapshot_file, 'some-hash'))
+
+
+class Database(unittest.TestCase):
+
+  def testReadOnly(self):
+    database = _Database()
+    self.assertRaises(AttributeError, setattr, database, 'all_data', {})
+    with self.assertRaises(TypeError):
+      database.all_data['Some metre'] = None
+    self.assertRaises(AssertionError, database.known_pada_patterns.Add,
+                      pattern_bits.FromString('GG'), pattern_bits.FromString('LL'), 'Some metre')
+
+  def testSourceSubset(self):
+    with contextlib.redirect_stdout(io.StringIO()):
+      database = metrical_data.LoadDatabase(source_files=['data/curated.json'])
+    self.assertLess(len(database.all_data), len(_Database().all_data))
+    self.assertIn('Rucirā', database.all_data)
+    self.assertIsNone(database.GetPattern('Rathoddhatā'))
+    self.assertIsNotNone(_Database().GetPattern('Rathoddhatā'))
+
+  def testArdhasamavrttaWithFreeLastSyllable(self):
+    """A '.' as the last syllable of a pāda is taken as free; elsewhere, the metre gets no patterns."""
+    builder = metrical_data._Builder()
+    metrical_data._AddArdhasamavrttaPattern(builder, 'Some metre', ['LGLGG', 'GLGL.'])
+    metrical_data._AddArdhasamavrttaPattern(builder, 'Other metre', ['LGLGG', 'G.GLG'])
+    self.assertEqual(list(builder.known_full_patterns.Get(pattern_bits.FromString('LGLGL GLGLG LGLGG GLGLL'.replace(' ', '')))),
+                     ['Some metre'])
+    self.assertEqual(list(builder.known_pada_patterns.Get(pattern_bits.FromString('GLGLL'))), ['Some metre'])
+    self.assertIsNone(builder.known_pada_patterns.Get(pattern_bits.FromString('GGGLG')))
+    self.assertIn('Other metre', builder.pattern_for_metre)
+
+  def testSharedBetweenThreads(self):
+    the_identifier = identifier.Identifier(_Database())
+    pattern_lines = [pattern_bits.FromString(line) for line in
+                     ['GGGGLLLLLGGLGGLGG', 'GGGGLLLLLGGLGGLGL', 'GGGGLLLLLGGLGGLGG', 'GGGGLLLLLGGLGGLGG']]
+    results = []
+    def Identify():
+      for _ in range(20):
+        results.append(the_identifier.Identify(pattern_lines))
+    threads = [threading.Thread(target=Identify) for _ in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(len(results), 80)
+    for identification in results:
+      self.assertEqual(list(identification.matches['exact']), ['Mandākrāntā'])
+      self.assertEqual(identification.PartsDebug(), results[0].PartsDebug())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for identify.nearest."""
+
+
+import random
+import unittest
+
+from identify import nearest
+import pattern_bits
+
+
+def _EditDistance(s, t):
+  """The edit distance by the textbook dynamic program ('.' in t matches either)."""
+  previous = list(range(len(t) + 1))
+  for (i, c) in enumerate(s):
+    current = [i + 1]
+    for (j, d) in enumerate(t):
+      current.append(min(previous[j + 1] + 1, current[j] + 1, previous[j] + (c != d and d != '.')))
+    previous = current
+  return previous[-1]
+
+
+def _RandomPattern(rng, max_length, alphabet='LG'):
+  return ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length)))
+
+
+class NearestMetreIndex(unittest.TestCase):
+
+  def testDistance(self):
+    rng = random.Random(0)
+    for _ in range(2000):
+      metre = _RandomPattern(rng, 30, rng.choice(['LG', 'LG.']))
+      verse = _RandomPattern(rng, 30)
+      self.assertEqual(nearest._Pattern(metre).Distance(pattern_bits.FromString(verse)),
+                       _EditDistance(verse, metre), (verse, metre))
+
+  def testSameAsScanning(self):
+    """Free syllables match either weight, as when identifying."""
+    rng = random.Random(0)
+    entries = []
+    for i in range(100):
+      pattern = _RandomPattern(rng, 12)
+      # Some with no syllable free, the rest with the last of each half free.
+      free_at = [] if i % 3 == 0 else [j for j in [len(pattern) // 2 - 1, len(pattern) - 1] if j >= 0]
+      free = pattern_bits.FromString(''.join('G' if j in free_at else 'L' for j in range(len(pattern))))
+      # Some metres have two patterns.
+      entries.append((pattern_bits.FromString(pattern), free, 'Metre %d' % (i % 80)))
+    index = nearest.NearestMetreIndex(entries)
+    for _ in range(100):
+      verse = _RandomPattern(rng, 12)
+      max_distance = rng.randint(0, 3)
+      (found, _) = index.Search(pattern_bits.FromString(verse), max_distance)
+      distance_for_metre = {}
+      for (pattern, free, metre_name) in entries:
+        distance = _EditDistance(verse, nearest._WithFreeSyllables(pattern, free))
+        distance_for_metre[metre_name] = min(distance, distance_for_metre.get(metre_name, distance))
+      self.assertEqual(found, sorted((distance, metre_name) for (metre_name, distance) in distance_for_metre.items()
+                                     if distance <= max_distance))
+      self.assertEqual(index.MetreDistance(pattern_bits.FromString(verse), 'Metre 1')[0], distance_for_metre['Metre 1'])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Patterns of laghus and gurus, packed into ints.
+
+A pattern like 'LGG' is stored as the int whose binary digits are a 1, then a 0
+for each laghu and a 1 for each guru: 0b1011 = 11. (This is the encoding of the
+short urls in data.metrical_data.) The leading 1 records the length, so
+patterns of different lengths never collide, and the empty pattern is 1.
+
+Splitting and joining patterns are shifts and masks, and these ints are smaller
+and quicker to hash than strings. Patterns are converted to strings only for
+display and debug output.
+"""
+
+
+EMPTY = 1
+LAGHU = 0
+GURU = 1
+
+
+def FromString(pattern):
+  """'LGG' -> 0b1011"""
+  if pattern.strip('LG'):
+    raise ValueError('Not a pattern of laghus and gurus: %s' % pattern)
+  return int('1' + pattern.replace('L', '0').replace('G', '1'), 2)
+
+
+def ToString(bits):
+  """0b1011 -> 'LGG'"""
+  assert bits >= EMPTY, bits
+  return bin(bits)[3:].replace('0', 'L').replace('1', 'G')
+
+
+def Length(bits):
+  """Number of syllables."""
+  return bits.bit_length() - 1
+
+
+def Matras(bits):
+  """Number of mātrās: 1 for each laghu and 2 for each guru."""
+  return Length(bits) + bin(bits).count('1') - 1
+
+
+def Syllable(bits, i):
+  """LAGHU or GURU, for the i-th syllable (from 0)."""
+  return (bits >> (Length(bits) - 1 - i)) & 1
+
+
+def Weights(bits):
+  """[LAGHU or GURU for each syllable], in order."""
+  return [(bits >> i) & 1 for i in range(Length(bits) - 1, -1, -1)]
+
+
+def StartsWith(bits, prefix):
+  """Whether the pattern begins with the pattern prefix."""
+  n = Length(bits) - Length(prefix)
+  return n >= 0 and bits >> n == prefix
+
+
+def Append(bits, weight):
+  """The pattern with one more syllable (LAGHU or GURU) at the end."""
+  return (bits << 1) | weight
+
+
+def WithLast(bits, weight):
+  """The (nonempty) pattern with its last syllable replaced by weight."""
+  return (bits & ~1) | weight
+
+
+def Concat(first, second):
+  n = Length(second)
+  return (first << n) | (second ^ (1 << n))
+
+
+def Join(patterns):
+  joined = EMPTY
+  for bits in patterns:
+    joined = Concat(joined, bits)
+  return joined
+
+
+def Slice(bits, start, end):
+  """Syllables start to end (not including end), like string[start:end]."""
+  n = end - start
+  return ((bits >> (Length(bits) - end)) & ((1 << n) - 1)) | (1 << n)
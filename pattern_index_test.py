@@ -0,0 +1,55 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for data.pattern_index."""
+
+
+import unittest
+
+from data import pattern_index
+import pattern_bits
+
+
+def _Bits(pattern):
+  return pattern_bits.FromString(pattern)
+
+
+class PatternIndex(unittest.TestCase):
+
+  def testFreeSyllables(self):
+    index = pattern_index.PatternIndex()
+    index.Add(_Bits('GGL'), _Bits('LLG'), 'Some metre', {1, 2})
+    self.assertEqual(index.Get(_Bits('GGL')), {'Some metre': {1, 2}})
+    self.assertEqual(index.Get(_Bits('GGG')), {'Some metre': {1, 2}})
+    self.assertIsNone(index.Get(_Bits('GLG')))
+    self.assertIsNone(index.Get(_Bits('GG')))
+    self.assertIsNone(index.Get(_Bits('GGLL')))
+
+  def testUnionAcrossMasks(self):
+    index = pattern_index.PatternIndex()
+    index.Add(_Bits('LGL'), _Bits('LLG'), 'A', {1})
+    index.Add(_Bits('LGG'), _Bits('LLL'), 'A', {2})
+    index.Add(_Bits('LLG'), _Bits('LGL'), 'B', {3})
+    self.assertEqual(index.Get(_Bits('LGG')), {'A': {1, 2}, 'B': {3}})
+    self.assertEqual(list(index.Get(_Bits('LGG'))), ['A', 'B'])
+    self.assertEqual(index.Get(_Bits('LGL')), {'A': {1}})
+
+  def testFirstOnly(self):
+    index = pattern_index.PatternIndex(first_only=True)
+    index.Add(_Bits('GGG'), _Bits('LLL'), 'Later')
+    index.Add(_Bits('GGL'), _Bits('LLG'), 'Earlier')
+    index.Add(_Bits('GGL'), _Bits('LLG'), 'Earlier')
+    self.assertEqual(index.Get(_Bits('GGG')), {'Later': True})
+    self.assertEqual(index.Get(_Bits('GGL')), {'Earlier': True})
+    self.assertEqual(len(index), 3)
+
+  def testEntries(self):
+    index = pattern_index.PatternIndex()
+    entries = [(_Bits('GGL'), _Bits('LLG'), 'A', {1}),
+               (_Bits('GLGG'), _Bits('LLLL'), 'B', {2}),
+               (_Bits('L'), _Bits('G'), 'A', {3})]
+    for entry in entries:
+      index.Add(*entry)
+    self.assertEqual(index.Entries(), entries)
+
+if __name__ == '__main__':
+  unittest.main()
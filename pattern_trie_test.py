@@ -0,0 +1,75 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for data.pattern_trie."""
+
+
+import random
+import unittest
+
+from data import pattern_trie
+import pattern_bits
+
+
+def _Bits(pattern):
+  return pattern_bits.FromString(pattern)
+
+
+def _Matches(pattern, entry_pattern, free):
+  """Whether the pattern string matches the entry's pattern string, free syllables matching either."""
+  return len(pattern) == len(entry_pattern) and all(
+      c == d or f == 'G' for (c, d, f) in zip(pattern, entry_pattern, free))
+
+
+class PatternTrie(unittest.TestCase):
+
+  def testKnown(self):
+    trie = pattern_trie.PatternTrie([(_Bits('GGL'), _Bits('LLG'), 'A', True),
+                                     (_Bits('GLGG'), _Bits('LLLL'), 'B', True),
+                                     (_Bits('G'), _Bits('L'), 'A', True)])
+    L = pattern_bits.LAGHU
+    G = pattern_bits.GURU
+    END = pattern_trie.END
+    self.assertEqual(trie.MetreNames(trie.Walk(_Bits(''))), ['A', 'B'])
+    self.assertEqual(trie.NextWeights(trie.Walk(_Bits('G'))), {'A': {G, END}, 'B': {L}})
+    self.assertEqual(trie.NextWeights(trie.Walk(_Bits('GG'))), {'A': {L, G}})
+    self.assertEqual(trie.NextWeights(trie.Walk(_Bits('GGG'))), {'A': {END}})
+    self.assertEqual(trie.MetreNames(trie.Walk(_Bits('GGGL'))), [])
+    nodes = trie.Walk(_Bits('GL'))
+    self.assertEqual(trie.MetreNames(nodes), ['B'])
+    self.assertEqual(trie.MetreNames(trie.Walk(_Bits('GLG'), nodes, 2)), ['B'])
+    self.assertEqual(trie.MetreNames(trie.Walk(_Bits('GLL'), nodes, 2)), [])
+
+  def testSameAsTryingEach(self):
+    rng = random.Random(0)
+    entries = []
+    for i in range(200):
+      length = rng.randint(0, 10)
+      pattern = ''.join(rng.choice('LG') for _ in range(length))
+      free = ''.join(rng.choice('LLLG') for _ in range(length))
+      pattern = ''.join('L' if f == 'G' else c for (c, f) in zip(pattern, free))
+      entries.append((pattern, free, 'Metre %d' % rng.randint(0, 150)))
+    trie = pattern_trie.PatternTrie([(_Bits(pattern), _Bits(free), metre_name, True)
+                                     for (pattern, free, metre_name) in entries])
+    for _ in range(300):
+      prefix = ''.join(rng.choice('LG') for _ in range(rng.randint(0, 8)))
+      expected = {}
+      for (pattern, free, metre_name) in entries:
+        if _Matches(prefix, pattern[:len(prefix)], free[:len(prefix)]):
+          weights = expected.setdefault(metre_name, set())
+          if len(pattern) == len(prefix):
+            weights.add(pattern_trie.END)
+          elif free[len(prefix)] == 'G':
+            weights.update([pattern_bits.LAGHU, pattern_bits.GURU])
+          else:
+            weights.add(pattern_bits.FromString(pattern[len(prefix)]) & 1)
+      nodes = trie.Walk(_Bits(prefix))
+      self.assertEqual(trie.NextWeights(nodes), expected, prefix)
+      self.assertEqual(list(trie.NextWeights(nodes)), trie.MetreNames(nodes))
+      # In the order added.
+      self.assertEqual(trie.MetreNames(nodes), sorted(expected, key=lambda metre_name: min(
+          number for (number, (pattern, free, name)) in enumerate(entries)
+          if name == metre_name and _Matches(prefix, pattern[:len(prefix)], free[:len(prefix)]))))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -8,6 +8,8 @@ import logging
 import re
 import unicodedata
 
+from utils.utils import diagnose
+
 def _match(regex, text):
   return re.match('^' + regex + '$', text)
 
@@ -69,16 +71,16 @@ def debug_rejected_characters(orig_line, rejects):
   line_read_as = ''.join(_unicode_notation(c) if c in rejects else c for c in orig_line)
   rejects = [(c, _unicode_notation(c), unicodedata.name(c, 'Unknown')) for c in rejects]
   rejects = ', '.join('%s (%s %s)' % reject for reject in rejects)
-  logging.debug('Unknown characters are ignored: %s\nin line:\n%s', rejects, line_read_as)
+  diagnose(logging.DEBUG, 'Unknown characters are ignored: %s\nin line:\n%s', rejects, line_read_as)
 
 
 def normalize_nfkc(text):
   """Normalize text to NFKC."""
   nfkc = unicodedata.normalize('NFKC', text)
   if text != nfkc:
-    logging.debug('%s normalized to %s', text, nfkc)
+    diagnose(logging.DEBUG, '%s normalized to %s', text, nfkc)
   if nfkc != unicodedata.normalize('NFC', text):
-    logging.warning('NFC and NFKC normalizations differ for %s', text)
+    diagnose(logging.WARNING, 'NFC and NFKC normalizations differ for %s', text)
   return nfkc
 
 
@@ -88,7 +90,7 @@ def remove_control_characters(text):
   control = Counter(c for c in text if unicodedata.category(c).startswith('C') and c != '\n')
   without_control = ''.join(c for c in text if c not in control)
   if text != without_control:
-    logging.info('Removed control characters: %s', control)
+    diagnose(logging.INFO, 'Removed control characters: %s', control)
   return without_control
 
 
@@ -115,7 +117,7 @@ def after_second_comment_line(text):
   parts = text.split(split)
   if len(parts) == 3:
     return parts[2]
-  logging.debug('Splitting at comment line gave %d parts.', len(parts))
+  diagnose(logging.DEBUG, 'Splitting at comment line gave %d parts.', len(parts))
   return text
 
 
@@ -10,6 +10,7 @@ import read.split_gretil
 import slp1
 import transliteration.detect
 from transliteration import transliterate
+from utils.utils import diagnose
 
 
 def _preprocess_for_transliteration(text):
@@ -24,23 +25,29 @@ def _preprocess_for_transliteration(text):
   return text
 
 
+def transliterate_line(orig_line, input_scheme):
+  """(cleaned line, display line) of one line of preprocessed text (see preprocess_and_detect)."""
+  pass_through = ' -?'
+  leading_verse_id = None
+  match = read.split_gretil.MSS_LINE_INITIAL_REGEX.match(orig_line)
+  if match:
+    leading_verse_id = match.group(0)
+    orig_line = orig_line[len(leading_verse_id):]
+  (display_line, rejects) = transliterate.TransliterateFrom(orig_line, input_scheme, pass_through)
+
+  ignore = r"""0123456789'".\/$&%{}|!’‘(),""" + 'ऽ।॥०१२३४५६७८९'
+  read.filters.debug_rejected_characters(orig_line, rejects - set(ignore))
+  cleaned_line = ''.join(c for c in display_line if c not in pass_through)
+  assert all(c in slp1.ALPHABET for c in cleaned_line), cleaned_line
+  return (cleaned_line, display_line)
+
+
 def _transliterate_into_lines(orig_text, input_scheme):
   """Transliterates text to SLP1, removing all other characters."""
-  pass_through = ' -?'
   cleaned_lines = []
   display_lines = []
   for orig_line in orig_text.splitlines():
-    leading_verse_id = None
-    match = read.split_gretil.MSS_LINE_INITIAL_REGEX.match(orig_line)
-    if match:
-      leading_verse_id = match.group(0)
-      orig_line = orig_line[len(leading_verse_id):]
-    (display_line, rejects) = transliterate.TransliterateFrom(orig_line, input_scheme, pass_through)
-
-    ignore = r"""0123456789'".\/$&%{}|!’‘(),""" + 'ऽ।॥०१२३४५६७८९'
-    read.filters.debug_rejected_characters(orig_line, rejects - set(ignore))
-    cleaned_line = ''.join(c for c in display_line if c not in pass_through)
-    assert all(c in slp1.ALPHABET for c in cleaned_line), cleaned_line
+    (cleaned_line, display_line) = transliterate_line(orig_line, input_scheme)
     cleaned_lines.append(cleaned_line)
     display_lines.append(display_line)
   # while cleaned_lines and not cleaned_lines[-1]:
@@ -49,17 +56,40 @@ def _transliterate_into_lines(orig_text, input_scheme):
   return (cleaned_lines, display_lines)
 
 
-def read_text(text):
-  """The transliterated text from arbitrary input."""
+def preprocess_and_detect(text, input_scheme=None):
+  """(the text cleaned up for transliterating, its transliteration scheme).
+
+  The scheme is detected from the text unless given (as a
+  transliteration.detect.TRANSLITERATION_SCHEME).
+  """
   text = _preprocess_for_transliteration(text)
-  input_scheme = transliteration.detect.detect_transliteration_scheme(text)
-  (cleaned_lines, display_lines) = _transliterate_into_lines(text, input_scheme)
+  if input_scheme is None:
+    (input_scheme, confidence) = transliteration.detect.detect_scheme_and_confidence(text)
+    if confidence < 1:
+      diagnose(logging.INFO, 'Input taken to be in %s: %.0f%% of the characters that tell schemes apart are of it.',
+               transliteration.detect.scheme_name(input_scheme), confidence * 100)
+  return (text, input_scheme)
 
-  debug_output = ['Input read as:']
-  for (number, display_line) in enumerate(display_lines):
-    transliterated = transliterate.TransliterateForOutput(display_line)
-    debug_output.append('Line %d: %s' % (number + 1, transliterated))
-  debug_output.append('')
-  logging.debug('\n'.join(debug_output))
 
+class _InputReadAs(object):
+  """Debug output of the lines as read, transliterated for output only when formatted."""
+
+  def __init__(self, display_lines):
+    self._display_lines = display_lines
+
+  def __str__(self):
+    debug_output = ['Input read as:']
+    for (number, display_line) in enumerate(self._display_lines):
+      transliterated = transliterate.TransliterateForOutput(display_line)
+      debug_output.append('Line %d: %s' % (number + 1, transliterated))
+    debug_output.append('')
+    return '\n'.join(debug_output)
+
+
+def read_text(text, input_scheme=None):
+  """The transliterated text from arbitrary input, in input_scheme if given (else detected)."""
+  (text, input_scheme) = preprocess_and_detect(text, input_scheme)
+  (cleaned_lines, display_lines) = _transliterate_into_lines(text, input_scheme)
+
+  diagnose(logging.DEBUG, '%s', _InputReadAs(display_lines))
   return (cleaned_lines, display_lines)
@@ -12,6 +12,7 @@ def pre_fixed(content):
     return content
 
 common_identifier = identifier_pipeline.IdentifierPipeline()
+common_incremental = identifier_pipeline.IncrementalPipeline(common_identifier.database)
 
 # Import and register route blueprints/views
 import views.main
@@ -20,6 +21,7 @@ import views.show_split
 
 app.add_url_rule('/', view_func=views.main.main_page)
 app.add_url_rule('/identify', view_func=views.identify.identify_page, methods=['GET', 'POST'], defaults={'identifier': common_identifier})
+app.add_url_rule('/identifyAsYouTypeAPI', view_func=views.identify.identify_as_you_type_api, methods=['POST'], defaults={'incremental': common_incremental})
 app.add_url_rule('/split', view_func=views.show_split.show_blocks, methods=['GET', 'POST'])
 app.add_url_rule('/statistics', view_func=views.main.stats_page)
 app.add_url_rule('/fulltextAPI', view_func=views.main.fulltext_data, methods=['GET', 'POST'])
@@ -1,45 +1,129 @@
-"""Given lines in SLP1, converts them to patterns of laghus and gurus."""
+"""Given lines in SLP1, converts them to patterns of laghus and gurus.
 
-import re
+The patterns are packed into ints; see pattern_bits.
+
+A syllable is a vowel and the consonants after it, up to the next vowel. The
+consonants at the start of a line go with the last syllable of the previous line
+(if it has one). A syllable is guru if its vowel is long, or it has two or more
+consonants, or it is the last syllable of the verse and has a consonant; else it
+is laghu.
+
+Each line is scanned in one pass over its characters, which are classified by a
+table (_CLASS), keeping only the count of consonants after the current vowel.
+
+The lines can have other characters too (like the spaces and hyphens of display
+lines), which are skipped. For display, ScanVerseWithSpans also gives where each
+syllable is in the text, as shown: a syllable there runs from the end of the
+previous one, through its vowel, to just after the last other character (a word
+break) before the next vowel, if there is one. So consonants go with the vowel
+they are written with, unless a word ends after them.
+"""
+
+import pattern_bits
 import slp1
 
-_SYLLABLE_RE = slp1.VOWEL_RE + slp1.CONSONANT_RE + '*'
+_SHORT_VOWEL = 0
+_LONG_VOWEL = 1
+_CONSONANT = 2
+_OTHER = 3
+
+_CLASS = {}
+for c in slp1.ALPHABET:
+  _CLASS[c] = (_CONSONANT if c not in slp1.VOWELS else
+               _LONG_VOWEL if c in slp1.LONG_VOWELS else
+               _SHORT_VOWEL)
 
 
 def ScanVerse(lines):
-  cleaned_lines = _MoveInitialConsonants(lines)
-  return [_ScanVowelInitialLine(cleaned_lines[i], i == len(cleaned_lines) - 1)
-          for i in range(len(cleaned_lines))]
-
-
-def _MoveInitialConsonants(verse_lines):
-  """Move initial consonants of each line to the end of the previous line."""
-  for i in range(len(verse_lines)):
-    (consonants, verse_lines[i]) = _StripInitialConsonants(verse_lines[i])
-    if i > 0 and verse_lines[i - 1]:
-      verse_lines[i - 1] += consonants
-  return verse_lines
-
-
-def _StripInitialConsonants(text):
-  m = re.match(slp1.CONSONANT_RE + '+', text)
-  initial = m.group() if m else ''
-  return (initial, text[len(initial):])
-
-
-def _Weight(syllable, is_final_syllable_of_line=False):
-  """Whether a syllable (vowel + sequence of consonants) is laghu or guru."""
-  assert re.match('^%s$' % _SYLLABLE_RE, syllable), syllable
-  if re.search(slp1.LONG_VOWEL_RE, syllable): return 'G'
-  if re.search(slp1.CONSONANT_RE + '{2,}', syllable): return 'G'
-  if is_final_syllable_of_line and re.search(slp1.CONSONANT_RE, syllable):
-    return 'G'
-  return 'L'
-
-
-def _ScanVowelInitialLine(text, is_last_line=False):
-  syllables = re.findall(_SYLLABLE_RE, text)
-  assert text == ''.join(syllables), text
-  if len(syllables) == 0: return ''
-  return (''.join(_Weight(s) for s in syllables[:-1]) +
-          _Weight(syllables[-1], is_final_syllable_of_line=is_last_line))
+  """The pattern of each of the lines (of SLP1 letters, and other characters which are skipped)."""
+  return _Patterns([_ScanLine(line) for line in lines])
+
+
+def ScanLine(line):
+  """The scan of one line, which PatternsOfLines turns into patterns with the lines around it.
+
+  So a line can be scanned once, and its scan kept and reused while the lines
+  around it change.
+  """
+  return _ScanLine(line)
+
+
+def PatternsOfLines(scanned_lines):
+  """The pattern of each line, from the ScanLine of each: ScanVerse(lines) is PatternsOfLines([ScanLine(line) for line in lines])."""
+  return _Patterns(scanned_lines)
+
+
+def ScanVerseWithSpans(display_lines):
+  """(ScanVerse(display_lines), [(start, end, weight)] for each syllable in ' '.join(display_lines))."""
+  scanned = []
+  vowels = []  # (offset of each vowel, offset just after the last other character before it, or None)
+  offset = 0
+  for (i, line) in enumerate(display_lines):
+    # The space joining the lines is a word break.
+    scanned.append(_ScanLine(line, offset, offset if i > 0 else None, vowels))
+    offset += len(line) + 1
+  patterns = _Patterns(scanned)
+  weights = [weight for pattern in patterns for weight in pattern_bits.Weights(pattern)]
+  spans = []
+  start = 0
+  for (j, (vowel_offset, _)) in enumerate(vowels):
+    if j + 1 == len(vowels):
+      end = offset - 1 if display_lines else 0
+    else:
+      next_break = vowels[j + 1][1]
+      end = next_break if next_break is not None else vowel_offset + 1
+    spans.append((start, end, weights[j]))
+    start = end
+  return (patterns, spans)
+
+
+def _Patterns(scanned):
+  """The patterns of the lines, from the _ScanLine of each."""
+  patterns = []
+  for (i, (_, pattern, last_vowel, consonants)) in enumerate(scanned):
+    if last_vowel is None:
+      patterns.append(pattern)
+      continue
+    if i + 1 < len(scanned):
+      consonants += scanned[i + 1][0]
+    is_final_syllable_of_verse = i == len(scanned) - 1
+    if last_vowel == _LONG_VOWEL or consonants >= 2 or (is_final_syllable_of_verse and consonants):
+      patterns.append(pattern_bits.Append(pattern, pattern_bits.GURU))
+    else:
+      patterns.append(pattern_bits.Append(pattern, pattern_bits.LAGHU))
+  return patterns
+
+
+def _ScanLine(line, offset=0, last_break=None, vowels=None):
+  """(number of initial consonants, pattern of all syllables but the last, its vowel class or None, consonants after it).
+
+  If vowels is a list, appends (offset of the vowel, offset just after the
+  previous other character since the previous vowel, or None) for each vowel,
+  where the line starts at offset (and last_break is that for the line's start).
+  """
+  initial_consonants = 0
+  pattern = pattern_bits.EMPTY
+  last_vowel = None
+  consonants = 0
+  for (i, c) in enumerate(line):
+    char_class = _CLASS.get(c, _OTHER)
+    if char_class == _CONSONANT:
+      if last_vowel is None:
+        initial_consonants += 1
+      else:
+        consonants += 1
+      continue
+    if char_class == _OTHER:
+      last_break = offset + i + 1
+      continue
+    if vowels is not None:
+      vowels.append((offset + i, last_break))
+      last_break = None
+    if last_vowel is not None:
+      if last_vowel == _LONG_VOWEL or consonants >= 2:
+        pattern = pattern_bits.Append(pattern, pattern_bits.GURU)
+      else:
+        pattern = pattern_bits.Append(pattern, pattern_bits.LAGHU)
+    last_vowel = char_class
+    consonants = 0
+  return (initial_consonants, pattern, last_vowel, consonants)
@@ -0,0 +1,104 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for scan."""
+
+
+import contextlib
+import io
+import random
+import re
+import unittest
+
+import pattern_bits
+import read.read
+import read.split_gretil
+import scan
+import slp1
+
+
+# The regex scanner that scan replaced, to check against (and for benchmarks.scan_benchmark).
+
+_SYLLABLE_RE = slp1.VOWEL_RE + slp1.CONSONANT_RE + '*'
+
+
+def RegexScanVerse(lines):
+  cleaned_lines = _MoveInitialConsonants(list(lines))
+  return [_ScanVowelInitialLine(cleaned_lines[i], i == len(cleaned_lines) - 1)
+          for i in range(len(cleaned_lines))]
+
+
+def _MoveInitialConsonants(verse_lines):
+  """Move initial consonants of each line to the end of the previous line."""
+  for i in range(len(verse_lines)):
+    (consonants, verse_lines[i]) = _StripInitialConsonants(verse_lines[i])
+    if i > 0 and verse_lines[i - 1]:
+      verse_lines[i - 1] += consonants
+  return verse_lines
+
+
+def _StripInitialConsonants(text):
+  m = re.match(slp1.CONSONANT_RE + '+', text)
+  initial = m.group() if m else ''
+  return (initial, text[len(initial):])
+
+
+def _Weight(syllable, is_final_syllable_of_line=False):
+  """Whether a syllable (vowel + sequence of consonants) is laghu or guru."""
+  assert re.match('^%s$' % _SYLLABLE_RE, syllable), syllable
+  if re.search(slp1.LONG_VOWEL_RE, syllable): return pattern_bits.GURU
+  if re.search(slp1.CONSONANT_RE + '{2,}', syllable): return pattern_bits.GURU
+  if is_final_syllable_of_line and re.search(slp1.CONSONANT_RE, syllable):
+    return pattern_bits.GURU
+  return pattern_bits.LAGHU
+
+
+def _ScanVowelInitialLine(text, is_last_line=False):
+  syllables = re.findall(_SYLLABLE_RE, text)
+  assert text == ''.join(syllables), text
+  pattern = pattern_bits.EMPTY
+  if len(syllables) == 0: return pattern
+  for s in syllables[:-1]:
+    pattern = pattern_bits.Append(pattern, _Weight(s))
+  return pattern_bits.Append(pattern, _Weight(syllables[-1], is_final_syllable_of_line=is_last_line))
+
+
+class ScanVerse(unittest.TestCase):
+
+  def testKnown(self):
+    self.assertEqual([pattern_bits.ToString(p) for p in scan.ScanVerse(['karmaRyevADikAraste', 'mAPalezukadAcana'])],
+                     ['GGGGLGGG', 'GLGLLGLL'])
+    # The initial consonants of a line go with the previous one, if it has a syllable.
+    self.assertEqual([pattern_bits.ToString(p) for p in scan.ScanVerse(['ka', 'ra', 'tka', 'kt', 'ka', ''])],
+                     ['L', 'G', 'G', '', 'L', ''])
+    self.assertEqual([pattern_bits.ToString(p) for p in scan.ScanVerse(['kat'])], ['G'])
+    self.assertEqual(scan.ScanVerse([]), [])
+
+  def testSpans(self):
+    display_lines = ['karmaRy evADi', 'mA Pale']
+    (patterns, spans) = scan.ScanVerseWithSpans(display_lines)
+    self.assertEqual(patterns, scan.ScanVerse(display_lines))
+    text = ' '.join(display_lines)
+    # Consonants go with the next syllable, except at the end of a word.
+    self.assertEqual([(text[start:end], 'LG'[weight]) for (start, end, weight) in spans],
+                     [('ka', 'G'), ('rmaRy ', 'G'), ('e', 'G'), ('vA', 'G'), ('Di ', 'L'),
+                      ('mA ', 'G'), ('Pa', 'L'), ('le', 'G')])
+    self.assertEqual(scan.ScanVerseWithSpans(['', 'kt -']), ([pattern_bits.EMPTY] * 2, []))
+
+  def testSameAsRegexScanner(self):
+    rng = random.Random(0)
+    consonants = slp1.ALPHABET.replace(slp1.VOWELS, '')
+    for _ in range(2000):
+      lines = [''.join(rng.choice(rng.choice([slp1.VOWELS, consonants])) for _ in range(rng.randint(0, 8)))
+               for _ in range(rng.randint(0, 5))]
+      self.assertEqual(scan.ScanVerse(lines), RegexScanVerse(lines), lines)
+
+  def testGretilTexts(self):
+    for filename in ['texts/gretil_stats/bharst_u.htm', 'texts/gretil_stats/kmeghdpu.htm']:
+      with contextlib.redirect_stdout(io.StringIO()):
+        (verses, _) = read.split_gretil.split(open(filename, encoding='utf-8').read())
+      for lines in (read.read.read_text(verse)[0] for verse in verses):
+        self.assertEqual(scan.ScanVerse(lines), RegexScanVerse(lines))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -3,6 +3,7 @@
 
 ALPHABET = 'aAiIuUfFxXeEoOMHkKgGNcCjJYwWqQRtTdDnpPbBmyrlvSzsh'
 CONSONANT_RE = '[MHkKgGNcCjJYwWqQRtTdDnpPbBmyrlvSzsh]'
-LONG_VOWEL_RE = '[AIUFXeEoO]'
+LONG_VOWELS = 'AIUFXeEoO'
+LONG_VOWEL_RE = '[%s]' % LONG_VOWELS
 VOWELS = 'aAiIuUfFxXeEoO'
 VOWEL_RE = '[%s]' % VOWELS
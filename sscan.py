@@ -11,6 +11,11 @@ Usage from commandline:
 
      python sscan.py < input_file
 
+     or, to read the input as in a given scheme (like SLP1) instead of
+     detecting it:
+
+     python sscan.py SLP1 < input_file
+
 Known issues:
      See https://github.com/shreevatsa/sanskrit/issues?state=open
 """
@@ -21,11 +26,13 @@ import sys
 
 import print_utils
 import identifier_pipeline
+from transliteration import detect
 
 
 if __name__ == '__main__':
   logging.getLogger().setLevel(logging.WARNING)
+  input_scheme = detect.scheme_from_name(sys.argv[1] if len(sys.argv) > 1 else 'auto')
   from_stdin = sys.stdin.read().decode('utf8')
   identifier = identifier_pipeline.IdentifierPipeline()
-  identifier.IdentifyFromText(from_stdin)
-  print_utils.Print(identifier.AllDebugOutput())
+  result = identifier.IdentifyFromText(from_stdin, input_scheme)
+  print_utils.Print(result.AllDebugOutput())
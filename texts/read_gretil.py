@@ -20,6 +20,7 @@ import scan
 import identifier_pipeline
 from data import metrical_data
 import display
+from transliteration import detect
 
 
 def get_args():
@@ -41,6 +42,10 @@ def get_args():
                                help='What to print when a verse is not in any'
                                ' known metre: nothing, just a message,'
                                ' or the whole verse')
+  argument_parser.add_argument('--input_scheme', choices=['auto'] + detect.SCHEME_NAMES,
+                               default='auto',
+                               help='The transliteration scheme of the file'
+                               ' (by default, detected from the whole file)')
   argument_parser.add_argument('--break_at_error', action='store_true',
                                help='Whether to break as soon as one imperfect'
                                ' verse is found.')
@@ -87,15 +92,20 @@ def metres_for_text(text, args, custom_splitter):
 
   identifier = identifier_pipeline.IdentifierPipeline()
   table = {}
-  for (verse_number, verse) in enumerate(verses):
+  input_scheme = detect.scheme_from_name(args.get('input_scheme'))
+  if input_scheme is None:
+    # Detected once for the whole text, not for each verse (which may be too short to tell).
+    (_, input_scheme) = read.read.preprocess_and_detect('\n'.join(verses))
+  # Verses share many parts, which IdentifyMany matches only once.
+  verse_results = identifier.IdentifyMany(verses, input_scheme)
+  for (verse_number, (verse, verse_result)) in enumerate(zip(verses, verse_results)):
     verse_number += 1
     # Print('\nVerse %d is:' % verse_number)
     # Print('\n    '.join(('    ' + verse).splitlines()))
     # Print('End Verse %d' % verse_number)
-    ok_and_results = identifier.IdentifyFromText(verse)
-    if not ok_and_results:      # None for lines that contain no syllables
+    if verse_result.identification is None:      # None for lines that contain no syllables
       continue
-    (perfect, results) = ok_and_results
+    (perfect, results) = (verse_result.full_match, verse_result.results)
     ret['verses'][verse_number] = {}
     cur = ret['verses'][verse_number]
     cur['verse'] = verse
@@ -107,9 +117,15 @@ def metres_for_text(text, args, custom_splitter):
       table['unknown'] = table.get('unknown', 0) + 1
       if args['print_unidentified_verses'] != 'none':
         cur['messages'].append('Verse %4d:' % verse_number)
+        # A metre within a couple of wrong syllables, if there is one.
+        nearest = verse_result.Nearest(max_distance=2)
+        if nearest:
+          (distance, metre_name) = nearest[0]
+          cur['result']['nearest'] = {'metre_name': metre_name, 'distance': distance}
+          cur['messages'].append('    probably %s, with %d errors' % (metre_name, distance))
         if args['print_unidentified_verses'] == 'full':
           cur['messages'].append(verse)
-          cur['messages'].append(identifier.AllDebugOutput())
+          cur['messages'].append(verse_result.AllDebugOutput())
           cur['messages'].append('')
       continue
 
@@ -122,12 +138,15 @@ def metres_for_text(text, args, custom_splitter):
         'metre_name': metre_name,
         'is_perfect': perfect,
       }
+      if not perfect:
+        cur['result']['alternatives'] = [(result.metre_name, round(result.score, 2))
+                                         for result in verse_result.Ranked(3)]
       if args['print_identified_verses'] == 'full':
         cur['messages2'].append(verse)
     table[metre_name] = table.get(metre_name, 0) + 1
     if not perfect and args['break_at_error']:
       cur['messages2'].append(verse)
-      cur['messages2'].append(identifier.AllDebugOutput())
+      cur['messages2'].append(verse_result.AllDebugOutput())
       cur['messages2'].append('')
       break
 
@@ -142,8 +161,8 @@ def find_alignment(verse_text, metre_name):
     print(type(verse_text))
     print(type(metre_name))
     Print(['Asked to find alignment for: ', verse_text, ' and ', metre_name])
-    (cleaned_lines, display_lines) = read.read.read_text(verse_text)
-    pattern_lines = scan.ScanVerse(cleaned_lines)
+    (_, display_lines) = read.read.read_text(verse_text)
+    (pattern_lines, spans) = scan.ScanVerseWithSpans(display_lines)
     if not pattern_lines:
       return None
     # TODO: This is very slow, should reuse.
@@ -151,7 +170,7 @@ def find_alignment(verse_text, metre_name):
     # results = identifier.IdentifyFromPatternLines(pattern_lines)
     known_pattern = metrical_data.GetPattern(metre_name)
     if known_pattern:
-        alignment = display.AlignVerseToMetre(display_lines, ''.join(pattern_lines), known_pattern)
+        alignment = display.AlignVerseToMetre(' '.join(display_lines), spans, known_pattern)
         table = display.HtmlTableFromAlignment(alignment)
         return (alignment, table)
     else:
@@ -168,6 +187,7 @@ if __name__ == '__main__':
     'print_identified_verses': args.print_identified_verses,
     'print_unidentified_verses': args.print_unidentified_verses,
     'break_at_error': args.break_at_error,
+    'input_scheme': args.input_scheme,
   }
   # Split into verses, and return data for each verse. (And global metadata.)
   ret = metres_for_text(text, args2, custom_splitter)
@@ -184,6 +204,8 @@ if __name__ == '__main__':
           verse_number,
           ' ' if perfect else ' probably ',
           metre_name))
+      for (alternative, score) in cur['result'].get('alternatives', []):
+        Print('    or perhaps %s (score %.2f)' % (alternative, score))
     for message in cur['messages2']:
       Print(message)
 
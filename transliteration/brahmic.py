@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""Decoding Brahmic scripts straight to SLP1, and encoding SLP1 in them, in one pass.
+
+In these scripts a consonant letter carries an implicit 'a', which is replaced
+by a following vowel sign, or dropped before a virāma. So the decoder looks at
+each consonant together with the character after it: consonant + vowel sign
+gives the consonant and that vowel, consonant + virāma the consonant alone, and
+consonant + anything else the consonant and 'a'. Other letters (independent
+vowels, anusvāra, visarga) each give their SLP1 letters. The encoder does the
+reverse.
+
+The Unicode blocks of these scripts are laid out in parallel (following ISCII):
+the same letter is at the same offset in each block, if the script has it. So
+the tables for each script are made from those for Devanāgarī, by moving each
+character to the script's block, along with a few letters particular to the
+script (see _SCRIPT_CONSONANTS and _SCRIPT_OTHERS). They are made on first use
+(see Decoder and Encoder), so scripts that are never read cost nothing.
+
+Some characters are read as others that are more usual in Sanskrit: short e and
+o as e and o, ḷa (and ṟa, ḻa, ṉa) as la (ra, la, na), oṃ as o + anusvāra, and
+the Vedic signs for visarga as visarga. A nukta after a consonant is ignored.
+
+Tamil lacks letters for most aspirated and voiced stops, which Sanskrit in Tamil
+script writes with a superscript 2, 3 or 4 after the unvoiced unaspirated one
+(or after its vowel sign), and letters it lacks entirely with Grantha letters.
+So the Tamil decoder also reads those, and the Grantha block.
+"""
+
+import logging
+import threading
+import unicodedata
+
+import slp1
+from utils.utils import diagnose
+
+# The first codepoint of each script's Unicode block.
+BLOCK_STARTS = {
+    'Devanagari': 0x0900,
+    'Bengali': 0x0980,
+    'Gujarati': 0x0A80,
+    'Oriya': 0x0B00,
+    'Tamil': 0x0B80,
+    'Telugu': 0x0C00,
+    'Kannada': 0x0C80,
+    'Malayalam': 0x0D00,
+    'Grantha': 0x11300,
+}
+BLOCK_SIZE = 0x80
+SCRIPTS = list(BLOCK_STARTS)
+# How scripts are named in diagnostics, where not as in SCRIPTS.
+_DISPLAY_NAMES = {'Devanagari': 'Devanāgari'}
+
+# Devanāgarī, in the order of the SLP1 alphabet.
+_VOWELS = 'अआइईउऊऋॠऌॡएऐओऔ'
+_VOWEL_SIGNS = 'ािीुूृॄॢॣेैोौ'  # for each vowel but 'a'
+_ANUSVARA_VISARGA = 'ंः'
+_CONSONANTS = 'कखगघङचछजझञटठडढणतथदधनपफबभमयरलवशषसह'
+_VIRAMA = '्'
+_NUKTA = '़'
+
+# Devanāgarī characters read as more usual ones (see above).
+_UNUSUAL_VOWELS = {'ऎ': 'e', 'ऒ': 'o'}
+_UNUSUAL_VOWEL_SIGNS = {'ॆ': 'e', 'ॊ': 'o'}
+_UNUSUAL_CONSONANTS = {'ळ': 'l', 'ऱ': 'r', 'ऴ': 'l', 'ऩ': 'n'}
+_UNUSUAL_OTHERS = {'ॐ': 'oM'}
+# ARDHAVISARGA, ROTATED ARDHAVISARGA, JIHVAMULIYA, UPADHMANIYA, from the Vedic
+# Extensions block, which all the scripts share.
+_VEDIC_VISARGAS = {'ᳲ': 'H', 'ᳳ': 'H', 'ᳵ': 'H', 'ᳶ': 'H'}
+
+# Letters of a script that are not at the place of a Devanāgarī letter.
+_SCRIPT_CONSONANTS = {
+    'Bengali': {'ৰ': 'r', 'ৱ': 'v'},  # Assamese ra and wa
+    'Oriya': {'ୟ': 'y', 'ୱ': 'v'},
+    'Kannada': {'ೞ': 'l'},
+}
+_SCRIPT_OTHERS = {
+    'Bengali': {'ৎ': 't'},  # khaṇḍa ta
+    # The chillus (consonants without a vowel), and the dot reph.
+    'Malayalam': {'ൺ': 'R', 'ൻ': 'n', 'ർ': 'r', 'ൽ': 'l', 'ൾ': 'l', 'ൿ': 'k', 'ൎ': 'r'},
+}
+# For encoding: letters to use for those that the script does not have.
+_SCRIPT_STANDINS = {
+    'Bengali': {'v': 'ব'},
+}
+
+# Tamil's superscripts (and the digits that NFKC normalization makes of them),
+# for the n-th letter after an unvoiced unaspirated stop.
+_TAMIL_SUPERSCRIPTS = {'²': 1, '³': 2, '⁴': 3, '2': 1, '3': 2, '4': 3}
+_TAMIL_SUPERSCRIPT_FOR = {1: '²', 2: '³', 3: '⁴'}
+
+
+class BrahmicDecoder(object):
+  """Decodes text of one script to SLP1 (see Decode)."""
+
+  def __init__(self, name, vowels, vowel_signs, consonants, others, viramas, nuktas=(), modified=None):
+    """Each of vowels, vowel_signs, consonants and others is {character: SLP1}.
+
+    modified: {consonant character: {character after it: SLP1}}, for Tamil's superscripts.
+    """
+    self.name = name
+    self.vowel_signs = vowel_signs
+    self.consonants = consonants
+    self._letters = dict(vowels)
+    self._letters.update(others)
+    # What a consonant gives with the character after it, if not followed by 'a'.
+    self._endings = dict(vowel_signs)
+    self._endings.update((virama, '') for virama in viramas)
+    self._nuktas = frozenset(nuktas)
+    self._modified = modified
+
+  def Decode(self, text, pass_through=''):
+    """(the text in SLP1, the set of characters that could not be decoded and were dropped).
+
+    Characters in pass_through are kept as they are.
+    """
+    consonants = self.consonants
+    endings = self._endings
+    letters = self._letters
+    nuktas = self._nuktas
+    modified = self._modified
+    pieces = []
+    rejected = set()
+    n = len(text)
+    i = 0
+    while i < n:
+      c = text[i]
+      i += 1
+      consonant = consonants.get(c)
+      if consonant is None:
+        letter = letters.get(c)
+        if letter is not None:
+          pieces.append(letter)
+        elif c in pass_through:
+          pieces.append(c)
+        else:
+          rejected.add(c)
+        continue
+      following = text[i] if i < n else ''
+      if following in nuktas:
+        i += 1
+        following = text[i] if i < n else ''
+      modifiers = modified.get(c) if modified else None
+      if modifiers and following in modifiers:
+        consonant = modifiers[following]
+        modifiers = None
+        i += 1
+        following = text[i] if i < n else ''
+      ending = endings.get(following)
+      if ending is None:
+        pieces.append(consonant + 'a')
+        continue
+      i += 1
+      if modifiers and i < n and text[i] in modifiers:
+        consonant = modifiers[text[i]]
+        i += 1
+      pieces.append(consonant + ending)
+    if not rejected.isdisjoint(self.vowel_signs):
+      diagnose(logging.ERROR, 'Error in %s text %s: Stray vowel signs.', self.name, text)
+    return (''.join(pieces), rejected)
+
+
+class BrahmicEncoder(object):
+  """Encodes SLP1 text in one script (see Encode)."""
+
+  def __init__(self, vowels, vowel_signs, consonants, others, virama):
+    """vowels, vowel_signs and others are {SLP1: characters}; consonants is {SLP1: (letter, mark after its vowel sign)}."""
+    self._letters = dict(vowels)
+    self._letters.update(others)
+    self._vowel_signs = dict(vowel_signs)
+    self._vowel_signs['a'] = ''
+    self._consonants = consonants
+    self._virama = virama
+
+  def Encode(self, text, pass_through=''):
+    """(the SLP1 text in the script, the set of characters that are not SLP1 and were dropped).
+
+    Characters in pass_through are kept as they are.
+    """
+    consonants = self._consonants
+    vowel_signs = self._vowel_signs
+    letters = self._letters
+    pieces = []
+    rejected = set()
+    n = len(text)
+    i = 0
+    while i < n:
+      c = text[i]
+      i += 1
+      consonant = consonants.get(c)
+      if consonant is not None:
+        (letter, mark) = consonant
+        sign = vowel_signs.get(text[i]) if i < n else None
+        if sign is None:
+          pieces.append(letter + self._virama + mark)
+        else:
+          pieces.append(letter + sign + mark)
+          i += 1
+        continue
+      letter = letters.get(c)
+      if letter is not None:
+        pieces.append(letter)
+      elif c in pass_through:
+        pieces.append(c)
+      else:
+        rejected.add(c)
+    return (''.join(pieces), rejected)
+
+
+def _InBlock(script, devanagari):
+  """The character of the script at the place of the Devanāgarī character in its block, or None if it has none."""
+  c = chr(ord(devanagari) - BLOCK_STARTS['Devanagari'] + BLOCK_STARTS[script])
+  return c if unicodedata.name(c, None) else None
+
+
+def _Moved(script, table):
+  """The {Devanāgarī character: value} table, keyed by the script's characters instead."""
+  moved = {}
+  for (devanagari, value) in table.items():
+    c = _InBlock(script, devanagari)
+    if c is not None:
+      moved[c] = value
+  return moved
+
+
+def _DecoderTables(script):
+  """(vowels, vowel signs, consonants, others, virāma, nukta) of the script, for BrahmicDecoder."""
+  vowels = dict(zip(_VOWELS, slp1.VOWELS))
+  vowels.update(_UNUSUAL_VOWELS)
+  vowel_signs = dict(zip(_VOWEL_SIGNS, slp1.VOWELS[1:]))
+  vowel_signs.update(_UNUSUAL_VOWEL_SIGNS)
+  consonants = dict(zip(_CONSONANTS, slp1.ALPHABET[slp1.ALPHABET.index('k'):]))
+  consonants.update(_UNUSUAL_CONSONANTS)
+  others = dict(zip(_ANUSVARA_VISARGA, 'MH'))
+  others.update(_UNUSUAL_OTHERS)
+  (vowels, vowel_signs, consonants, others) = [_Moved(script, table)
+                                               for table in (vowels, vowel_signs, consonants, others)]
+  consonants.update(_SCRIPT_CONSONANTS.get(script, {}))
+  others.update(_SCRIPT_OTHERS.get(script, {}))
+  others.update(_VEDIC_VISARGAS)
+  return (vowels, vowel_signs, consonants, others, _InBlock(script, _VIRAMA), _InBlock(script, _NUKTA))
+
+
+def _MakeDecoder(script):
+  (vowels, vowel_signs, consonants, others, virama, nukta) = _DecoderTables(script)
+  viramas = [virama]
+  nuktas = [nukta] if nukta else []
+  modified = None
+  if script == 'Tamil':
+    # Also Grantha letters, and stops with superscripts.
+    grantha = _DecoderTables('Grantha')
+    for (table, grantha_table) in zip([vowels, vowel_signs, consonants, others], grantha):
+      for (c, value) in grantha_table.items():
+        table.setdefault(c, value)
+    viramas.append(grantha[4])
+    nuktas.append(grantha[5])
+    modified = {}
+    for (c, consonant) in consonants.items():
+      if consonant in 'kcwtp':
+        modified[c] = {superscript: slp1.ALPHABET[slp1.ALPHABET.index(consonant) + n]
+                       for (superscript, n) in _TAMIL_SUPERSCRIPTS.items()}
+  return BrahmicDecoder(_DISPLAY_NAMES.get(script, script), vowels, vowel_signs, consonants, others,
+                        viramas, nuktas, modified)
+
+
+def _MakeEncoder(script):
+  # Tamil writes the letters it lacks (other than stops) in Grantha.
+  fallback = 'Grantha' if script == 'Tamil' else None
+  def Encoded(devanagari_letters, slp1_letters, fallback=None):
+    table = {}
+    for (devanagari, letter) in zip(devanagari_letters, slp1_letters):
+      c = _InBlock(script, devanagari) or (fallback and _InBlock(fallback, devanagari))
+      if c:
+        table[letter] = c
+    return table
+  vowels = Encoded(_VOWELS, slp1.VOWELS, fallback)
+  vowel_signs = Encoded(_VOWEL_SIGNS, slp1.VOWELS[1:], fallback)
+  others = Encoded(_ANUSVARA_VISARGA, 'MH', fallback)
+  consonant_letters = slp1.ALPHABET[slp1.ALPHABET.index('k'):]
+  consonants = {letter: (c, '') for (letter, c) in Encoded(_CONSONANTS, consonant_letters).items()}
+  for (letter, c) in _SCRIPT_STANDINS.get(script, {}).items():
+    consonants.setdefault(letter, (c, ''))
+  if script == 'Tamil':
+    # Its anusvāra sign is rare; ma with virāma is what is written.
+    others['M'] = consonants['m'][0] + _InBlock(script, _VIRAMA)
+    for (i, letter) in enumerate(consonant_letters):
+      for (n, superscript) in _TAMIL_SUPERSCRIPT_FOR.items():
+        if letter not in consonants and i >= n and consonant_letters[i - n] in 'kcwtp':
+          consonants[letter] = (consonants[consonant_letters[i - n]][0], superscript)
+  return BrahmicEncoder(vowels, vowel_signs, consonants, others, _InBlock(script, _VIRAMA))
+
+
+_decoders = {}
+_encoders = {}
+_lock = threading.Lock()
+
+
+def _Made(made, make, script):
+  coder = made.get(script)
+  if coder is not None:
+    return coder
+  if script not in BLOCK_STARTS:
+    raise ValueError('Unknown Brahmic script %r; expected one of %s' % (script, ', '.join(SCRIPTS)))
+  with _lock:
+    if script not in made:
+      made[script] = make(script)
+    return made[script]
+
+
+def Decoder(script):
+  """The BrahmicDecoder for the script (one of SCRIPTS), made on first use."""
+  return _Made(_decoders, _MakeDecoder, script)
+
+
+def Encoder(script):
+  """The BrahmicEncoder for the script (one of SCRIPTS), made on first use."""
+  return _Made(_encoders, _MakeEncoder, script)
@@ -3,10 +3,10 @@
 """Detecting the input scheme."""
 
 
+import collections
 import re
 
-from transliteration import devanagari
-from transliteration.transliteration_data import KANNADA_CONSONANTS
+from transliteration import brahmic
 
 def Enum(**enums):
   return type(str('Enum'), (), enums)
@@ -18,23 +18,169 @@ TRANSLITERATION_SCHEME = type(str('Enum'),
                                 'IAST': 1,
                                 'ITRANS': 2,
                                 'Devanagari': 3,
-                                'Kannada': 4
+                                'Kannada': 4,
+                                # Never detected (it looks like HK), only given.
+                                'SLP1': 5,
+                                'Bengali': 6,
+                                'Gujarati': 7,
+                                'Oriya': 8,
+                                'Tamil': 9,
+                                'Telugu': 10,
+                                'Malayalam': 11,
+                                'Grantha': 12,
                               })
 
+# The schemes that can be given by name (as in scheme_from_name), in order.
+SCHEME_NAMES = ['HK', 'IAST', 'ITRANS', 'SLP1', 'Devanagari', 'Kannada',
+                'Bengali', 'Gujarati', 'Oriya', 'Tamil', 'Telugu', 'Malayalam', 'Grantha']
+
+
+# Characters (and for ITRANS, pairs of them) that only text in one scheme has.
+_IAST_CHARACTERS = 'āīūṛṝḷḹṃḥṅñṭḍṇśṣ'
+_ITRANS_PAIR = re.compile(r'aa|ii|uu|[RrLl]\^[Ii]|RR[Ii]|LL[Ii]|~N|Ch|~n|N\^|Sh|sh')
+# Text with any of _ITRANS_PAIR has one of these (which are quicker to look for).
+_ITRANS_HINTS = ['aa', 'ii', 'uu', '^', 'RR', 'LL', '~', 'Ch', 'Sh', 'sh']
+
+
+def _CharacterClasses():
+  """{scheme: the characters that only text in it has, as a regex character class without brackets}.
+
+  For the Brahmic scripts, these are the letters of their Unicode blocks: this
+  leaves out the dandas and digits (at the same places in each block), which
+  texts in other schemes use too.
+  """
+  classes = {}
+  for (script, start) in brahmic.BLOCK_STARTS.items():
+    end = start + brahmic.BLOCK_SIZE - 1
+    classes[getattr(TRANSLITERATION_SCHEME, script)] = '%s-%s%s-%s' % (
+        chr(start), chr(start + 0x63), chr(start + 0x70), chr(end))
+  classes[TRANSLITERATION_SCHEME.IAST] = _IAST_CHARACTERS
+  return classes
+_CHARACTER_CLASSES = _CharacterClasses()
+_CHARACTERISTIC_CHARACTER = re.compile('[%s]' % ''.join(_CHARACTER_CLASSES.values()))
+
+# The scheme of each Brahmic block, by codepoint >> 7 (the blocks are 0x80 long, and aligned).
+_SCHEME_OF_BLOCK = {start >> 7: getattr(TRANSLITERATION_SCHEME, script)
+                    for (script, start) in brahmic.BLOCK_STARTS.items()}
+_SCHEME_OF_CHARACTER = dict.fromkeys(_IAST_CHARACTERS, TRANSLITERATION_SCHEME.IAST)
+
+# {scheme: regex for the characteristic characters of the other schemes}, each compiled on first use.
+_OTHER_CHARACTERS = {}
+
+# When as many characteristic characters of two schemes are seen, the one earlier here is taken.
+_PREFERENCE = [getattr(TRANSLITERATION_SCHEME, name)
+               for name in ['Tamil', 'Grantha', 'Kannada', 'Telugu', 'Malayalam', 'Bengali', 'Gujarati', 'Oriya',
+                            'Devanagari', 'IAST', 'ITRANS']]
+
+# Long text is looked at in chunks of this many characters, until the scheme is settled (see _Settled).
+_CHUNK_SIZE = 4096
+_MIN_SETTLED_COUNT = 50
+_SETTLED_DEVIATIONS = 3
+
+
+def scheme_name(scheme):
+  """The name of the scheme, as in SCHEME_NAMES."""
+  return SCHEME_NAMES[[getattr(TRANSLITERATION_SCHEME, name) for name in SCHEME_NAMES].index(scheme)]
+
+
+def scheme_from_name(name):
+  """The scheme with this name (one of SCHEME_NAMES), or None (meaning: detect it) for '' or 'auto'."""
+  if name in ('', 'auto', None):
+    return None
+  if name not in SCHEME_NAMES:
+    raise ValueError('Unknown transliteration scheme %r; expected one of %s' % (name, ', '.join(SCHEME_NAMES)))
+  return getattr(TRANSLITERATION_SCHEME, name)
+
+
+def _SchemeOf(character):
+  scheme = _SCHEME_OF_CHARACTER.get(character)
+  return _SCHEME_OF_BLOCK[ord(character) >> 7] if scheme is None else scheme
+
+
+def _OtherCharacters(scheme):
+  regex = _OTHER_CHARACTERS.get(scheme)
+  if regex is None:
+    same = {scheme}
+    if scheme == TRANSLITERATION_SCHEME.Tamil:
+      same.add(TRANSLITERATION_SCHEME.Grantha)
+    regex = re.compile('[%s]' % ''.join(characters for (other, characters) in _CHARACTER_CLASSES.items()
+                                        if other not in same))
+    _OTHER_CHARACTERS[scheme] = regex  # By more than one thread at once only compiles it twice.
+  return regex
+
+
+def _Unmixed(text):
+  """The scheme of the text, if all its characteristic characters are of that scheme; else None.
+
+  This only searches (where counting them would take much longer), so is tried
+  first for short text, which is mostly all in one scheme.
+  """
+  first = _CHARACTERISTIC_CHARACTER.search(text)
+  if first is None:
+    return TRANSLITERATION_SCHEME.ITRANS if _ITRANS_PAIR.search(text) else TRANSLITERATION_SCHEME.HK
+  if any(hint in text for hint in _ITRANS_HINTS):
+    return None
+  scheme = _SchemeOf(first.group())
+  if _OtherCharacters(scheme).search(text, first.end()):
+    return None
+  return scheme
+
+
+def _Leader(counts):
+  """(scheme, its count, the total count) for {scheme: count of its characteristic characters}."""
+  counts = dict(counts)
+  if counts.get(TRANSLITERATION_SCHEME.Tamil):
+    # Sanskrit in Tamil script writes the letters that Tamil lacks in Grantha.
+    counts[TRANSLITERATION_SCHEME.Tamil] += counts.pop(TRANSLITERATION_SCHEME.Grantha, 0)
+  if not counts:
+    return (TRANSLITERATION_SCHEME.HK, 0, 0)
+  leader = max(counts, key=lambda scheme: (counts[scheme], -_PREFERENCE.index(scheme)))
+  return (leader, counts[leader], sum(counts.values()))
+
+
+def _Settled(count, total):
+  """Whether the rest of the text is unlikely to change the leader, having count of total so far.
+
+  That is, if the share of the leader (as if the characters seen were a sample
+  of all of them) is more than half by _SETTLED_DEVIATIONS standard deviations.
+  """
+  if total < _MIN_SETTLED_COUNT:
+    return False
+  share = count / total
+  return share - _SETTLED_DEVIATIONS * (share * (1 - share) / total) ** 0.5 > 0.5
+
+
+def detect_scheme_and_confidence(text):
+  """(the transliteration scheme the text is in, the confidence in it, from 0 to 1).
+
+  Each scheme gets a count of the characters seen that only it has, and the one
+  with most is taken: so a few characters of another scheme in a text (like a
+  Devanāgarī word in IAST) do not decide it. The confidence is the fraction of
+  those characters that are of that scheme; 1 if there are none (and then the
+  text is taken to be in Harvard-Kyoto, the usual ASCII scheme).
+
+  Long text is counted a chunk at a time, and only until the leader is settled.
+  """
+  if len(text) <= _CHUNK_SIZE:
+    scheme = _Unmixed(text)
+    if scheme is not None:
+      return (scheme, 1.0)
+  counts = {}
+  for start in range(0, len(text), _CHUNK_SIZE):
+    end = start + _CHUNK_SIZE
+    for (character, count) in collections.Counter(_CHARACTERISTIC_CHARACTER.findall(text, start, end)).items():
+      scheme = _SchemeOf(character)
+      counts[scheme] = counts.get(scheme, 0) + count
+    num_itrans = len(_ITRANS_PAIR.findall(text, start, end))
+    if num_itrans:
+      counts[TRANSLITERATION_SCHEME.ITRANS] = counts.get(TRANSLITERATION_SCHEME.ITRANS, 0) + num_itrans
+    (leader, count, total) = _Leader(counts)
+    if _Settled(count, total):
+      break
+  (leader, count, total) = _Leader(counts)
+  return (leader, count / total if total else 1.0)
+
 
 def detect_transliteration_scheme(text):
-  """Returns which transliteration scheme the given text is in."""
-  characteristic_kannada = '[%s]' % KANNADA_CONSONANTS
-  if re.search(characteristic_kannada, text):
-    return TRANSLITERATION_SCHEME.Kannada
-  characteristic_devanagari = '[%s]' % ''.join(devanagari.Alphabet())
-  if re.search(characteristic_devanagari, text):
-    return TRANSLITERATION_SCHEME.Devanagari
-  characteristic_iast = '[āīūṛṝḷḹṃḥṅñṭḍṇśṣ]'
-  if re.search(characteristic_iast, text):
-    return TRANSLITERATION_SCHEME.IAST
-  characteristic_itrans = (r'aa|ii|uu|[RrLl]\^[Ii]|RR[Ii]|LL[Ii]|~N|Ch|~n|N\^'
-                           + r'|Sh|sh')
-  if re.search(characteristic_itrans, text):
-    return TRANSLITERATION_SCHEME.ITRANS
-  return TRANSLITERATION_SCHEME.HK
+  """Returns which transliteration scheme the given text is in (see detect_scheme_and_confidence)."""
+  return detect_scheme_and_confidence(text)[0]
@@ -4,8 +4,7 @@
 
 import slp1
 from transliteration.detect import TRANSLITERATION_SCHEME
-from transliteration import devanagari
-from transliteration.transliteration_data import KANNADA_CONSONANTS
+from transliteration import brahmic
 from transliteration import transliterator
 
 _DEFAULT_PASS_THROUGH = ' -?'
@@ -28,8 +27,8 @@ _HK_ALPHABET = (list('aAiIuUR') + ['RR', 'lR', 'lRR', 'e', 'ai', 'o', 'au'] +
                  't', 'th', 'd', 'dh', 'n',
                  'p', 'ph', 'b', 'bh', 'm'] +
                 list('yrlvzSsh'))
-_HK_TO_SLP1_STATE_MACHINE = transliterator.MakeStateMachine(
-    _AlphabetToSLP1(_HK_ALPHABET))
+_HK_TO_SLP1_STATE_MACHINE = transliterator.LazyStateMachine(
+    lambda: _AlphabetToSLP1(_HK_ALPHABET))
 
 
 _IAST_ALPHABET_LOWER = (list('aāiīuūṛṝḷḹe') + ['ai', 'o', 'au', 'ṃ', 'ḥ'] +
@@ -48,17 +47,17 @@ _IAST_ALPHABET_UPPER = (list('AĀIĪUŪṚṜḶḸE') + ['AI', 'O', 'AU', 'Ṃ'
                          'Y', 'R', 'L', 'V', 'Ś', 'Ṣ', 'S', 'H'])
 
 
-def _IASTToSLP1StateMachine():
+def _IASTToSLP1Table():
   """Transliteration table from IAST to SLP1."""
   lower = _AlphabetToSLP1(_IAST_ALPHABET_LOWER)
   upper = _AlphabetToSLP1(_IAST_ALPHABET_UPPER)
   lower.update(upper)
-  return transliterator.MakeStateMachine(lower)
-_IAST_TO_SLP1_STATE_MACHINE = _IASTToSLP1StateMachine()
+  return lower
+_IAST_TO_SLP1_STATE_MACHINE = transliterator.LazyStateMachine(_IASTToSLP1Table)
 
 
-_SLP1_TO_IAST_STATE_MACHINE = transliterator.MakeStateMachine(
-    _SLP1ToAlphabet(_IAST_ALPHABET_LOWER))
+_SLP1_TO_IAST_STATE_MACHINE = transliterator.LazyStateMachine(
+    lambda: _SLP1ToAlphabet(_IAST_ALPHABET_LOWER))
 
 
 _ITRANS_ALPHABET = (['a', 'aa', 'i', 'ii', 'u', 'uu', 'RRi', 'RRI',
@@ -71,25 +70,23 @@ _ITRANS_ALPHABET = (['a', 'aa', 'i', 'ii', 'u', 'uu', 'RRi', 'RRI',
                      'y', 'r', 'l', 'v', 'sh', 'Sh', 's', 'h'])
 
 
-def _ITRANSToSLP1StateMachine():
+def _ITRANSToSLP1Table():
   table = _AlphabetToSLP1(_ITRANS_ALPHABET)
   alternatives = [('aa', 'A'), ('ii', 'I'), ('uu', 'U'), ('RRi', 'R^i'),
                   ('RRI', 'R^I'), ('LLi', 'L^i'), ('LLI', 'L^I'),
                   ('~N', 'N^'), ('~n', 'JN'), ('v', 'w')]
   for (letter, alternative) in alternatives:
     table[alternative] = table[letter]
-  return transliterator.MakeStateMachine(table)
-_ITRANS_TO_SLP1_STATE_MACHINE = _ITRANSToSLP1StateMachine()
+  return table
+_ITRANS_TO_SLP1_STATE_MACHINE = transliterator.LazyStateMachine(_ITRANSToSLP1Table)
 
 
-_MANGLED_DEVANAGARI_TO_SLP1_STATE_MACHINE = transliterator.MakeStateMachine(
-    _AlphabetToSLP1(devanagari.Alphabet()))
-
-
-def _TransliterateDevanagari(text):
-  return transliterator.Transliterate(_MANGLED_DEVANAGARI_TO_SLP1_STATE_MACHINE,
-                                      devanagari.Mangle(text),
-                                      _DEFAULT_PASS_THROUGH)
+# The state machine for each scheme that is not read with transliteration.brahmic.
+_TO_SLP1_STATE_MACHINES = {
+    TRANSLITERATION_SCHEME.HK: _HK_TO_SLP1_STATE_MACHINE,
+    TRANSLITERATION_SCHEME.IAST: _IAST_TO_SLP1_STATE_MACHINE,
+    TRANSLITERATION_SCHEME.ITRANS: _ITRANS_TO_SLP1_STATE_MACHINE,
+}
 
 
 def _IsoToIast(text):
@@ -103,86 +100,44 @@ def _IsoToIast(text):
   return text
 
 
-def _FixBadDevanagari(text):
-  # TODO(shreevatsa): Warn about these "wrong" characters.
-  text = text.replace('ऎ', 'ए')
-  text = text.replace('ऒ', 'ओ')
-  text = text.replace('ॆ', 'े')
-  text = text.replace('ॊ', 'ो')
-  text = text.replace('ळ', 'ल')
-  text = text.replace('ॐ', 'ओं')
-  text = text.replace(u'\u1CF2', 'ः')  # VEDIC SIGN ARDHAVISARGA
-  text = text.replace(u'\u1CF3', 'ः')  # VEDIC SIGN ROTATED ARDHAVISARGA
-  text = text.replace(u'\u1CF5', 'ः')  # VEDIC SIGN JIHVAMULIYA
-  text = text.replace(u'\u1CF6', 'ः')  # VEDIC SIGN UPADHMANIYA
-  return text
+_SLP1_CHARACTERS = frozenset(slp1.ALPHABET)
 
 
-_KANNADA_VOWEL_SIGNS = 'ಕಾ ಕಿ ಕೀ ಕು ಕೂ ಕೃ ಕೄ ಕೆ ಕೇ ಕೈ ಕೊ ಕೋ ಕೌ ಕಂ ಕಃ ಕ್'
-_KANNADA_VOWEL_SIGNS = ''.join(_KANNADA_VOWEL_SIGNS[i]
-                               for i in range(len(_KANNADA_VOWEL_SIGNS))
-                               if i % 3 == 1)
-_DEVANAGARI_VOWEL_SIGNS = 'का कि की कु कू कृ कॄ कॆ के कै कॊ को कौ कं कः क्'
-_DEVANAGARI_VOWEL_SIGNS = ''.join(_DEVANAGARI_VOWEL_SIGNS[i]
-                                  for i in range(len(_DEVANAGARI_VOWEL_SIGNS))
-                                  if i % 3 == 1)
-_DEVANAGARI_CONSONANTS = 'कखगघङचछजझञटठडढणतथदधनपफबभमयरलवशषसहळरळ'
-_KANNADA_VOWELS = 'ಅಆಇಈಉಊಋೠಎಏಐಒಓಔ'
-_DEVANAGARI_VOWELS = 'अआइईउऊऋॠऎएऐऒओऔ'
-_KANNADA_AV = 'ಅಂ ಅಃ'
-_KANNADA_AV = ''.join(_KANNADA_AV[i]
-                      for i in range(len(_KANNADA_AV)) if i % 3 == 1)
-_DEVANAGARI_AV = 'अं अः'
-_DEVANAGARI_AV = ''.join(_DEVANAGARI_AV[i]
-                         for i in range(len(_DEVANAGARI_AV)) if i % 3 == 1)
-_KANNADA_TO_DEVANAGARI = transliterator.MakeStateMachine(dict(zip(
-    _KANNADA_VOWELS + _KANNADA_AV + KANNADA_CONSONANTS + _KANNADA_VOWEL_SIGNS,
-    _DEVANAGARI_VOWELS + _DEVANAGARI_AV + _DEVANAGARI_CONSONANTS +
-    _DEVANAGARI_VOWEL_SIGNS)))
-
-
-def KannadaToDevanagari(text):
-  return transliterator.Transliterate(_KANNADA_TO_DEVANAGARI, text,
-                                      pass_through=_DEFAULT_PASS_THROUGH)[0]
+# The schemes read with transliteration.brahmic, and the names of their scripts there.
+_BRAHMIC_SCRIPTS = {getattr(TRANSLITERATION_SCHEME, script): script for script in brahmic.SCRIPTS}
+
+
+def _KeepSLP1(text, pass_through):
+  """Text already in SLP1 as it is, but without other characters (as if they could not be transliterated)."""
+  kept = _SLP1_CHARACTERS.union(pass_through or '')
+  transliterated = ''.join(c for c in text if c in kept)
+  if len(transliterated) == len(text):
+    return (text, set())
+  return (transliterated, set(text) - kept)
 
 
 def TransliterateFrom(input_text, input_scheme, pass_through=None):
   """Transliterates text to SLP1, after being told what script it is."""
+  if input_scheme == TRANSLITERATION_SCHEME.SLP1:
+    return _KeepSLP1(input_text, pass_through)
+  if pass_through is None:
+    pass_through = _DEFAULT_PASS_THROUGH
+  if input_scheme in _BRAHMIC_SCRIPTS:
+    return brahmic.Decoder(_BRAHMIC_SCRIPTS[input_scheme]).Decode(input_text, pass_through)
   input_text = _IsoToIast(input_text)
 
-  def ForKannada(text):
-    text = KannadaToDevanagari(text)
-    text = _FixBadDevanagari(text)
-    text = text.replace('s', 'ऽ')
-    return _TransliterateDevanagari(text)
-
-  actions = {
-      TRANSLITERATION_SCHEME.Kannada: ForKannada,
-      TRANSLITERATION_SCHEME.Devanagari:
-      lambda text: _TransliterateDevanagari(text),
-      TRANSLITERATION_SCHEME.IAST:
-      lambda text: transliterator.Transliterate(_IAST_TO_SLP1_STATE_MACHINE, text, pass_through),
-      TRANSLITERATION_SCHEME.ITRANS:
-      lambda text: transliterator.Transliterate(_ITRANS_TO_SLP1_STATE_MACHINE, text, pass_through),
-      TRANSLITERATION_SCHEME.HK:
-      lambda text: transliterator.Transliterate(_HK_TO_SLP1_STATE_MACHINE, text, pass_through)}
-  return actions[input_scheme](input_text)
-
-
-_SLP1_TO_MANGLED_DEVANAGARI_STATE_MACHINE = transliterator.MakeStateMachine(
-    _SLP1ToAlphabet(devanagari.Alphabet()))
+  return transliterator.Transliterate(_TO_SLP1_STATE_MACHINES[input_scheme].Get(), input_text, pass_through)
 
 
 def _CleanSLP1ToDevanagari(text):
-  (text, unparsed) = transliterator.Transliterate(_SLP1_TO_MANGLED_DEVANAGARI_STATE_MACHINE, text,
-                                                  pass_through=_DEFAULT_PASS_THROUGH)
+  (text, unparsed) = brahmic.Encoder('Devanagari').Encode(text, pass_through=_DEFAULT_PASS_THROUGH)
   assert not unparsed, (text, unparsed)
   assert isinstance(text, str), text
-  return devanagari.UnMangle(text)
+  return text
 
 
 def TransliterateForOutput(text):
-  iast = transliterator.Transliterate(_SLP1_TO_IAST_STATE_MACHINE, text,
+  iast = transliterator.Transliterate(_SLP1_TO_IAST_STATE_MACHINE.Get(), text,
                                       pass_through=_DEFAULT_PASS_THROUGH)[0]
   deva = _CleanSLP1ToDevanagari(text)
   return '%s (%s)' % (iast, deva)
@@ -191,15 +146,13 @@ def TransliterateForOutput(text):
 def AddDevanagariToIast(iast):
   """Given IAST text, include the Devanagari transliteration in brackets."""
   stray = ' ()/'      # Non-IAST characters that appear in metre names
-  slp_text = transliterator.Transliterate(_IAST_TO_SLP1_STATE_MACHINE, iast, pass_through=stray)[0]
-  (deva, unparsed) = transliterator.Transliterate(_SLP1_TO_MANGLED_DEVANAGARI_STATE_MACHINE,
-                                                  slp_text, pass_through=stray)
+  slp_text = transliterator.Transliterate(_IAST_TO_SLP1_STATE_MACHINE.Get(), iast, pass_through=stray)[0]
+  (deva, unparsed) = brahmic.Encoder('Devanagari').Encode(slp_text, pass_through=stray)
   assert not unparsed, (deva, unparsed)
   assert isinstance(deva, str), deva
-  deva = devanagari.UnMangle(deva)
   return '%s (%s)' % (iast, deva)
 
 
 def TransliterateForTable(text):
-  return transliterator.Transliterate(_SLP1_TO_IAST_STATE_MACHINE, text,
+  return transliterator.Transliterate(_SLP1_TO_IAST_STATE_MACHINE.Get(), text,
                                       pass_through=_DEFAULT_PASS_THROUGH)[0]
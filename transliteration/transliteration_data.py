@@ -1,6 +0,0 @@
-# -*- coding: utf-8 -*-
-
-"""Detecting the input scheme."""
-
-
-KANNADA_CONSONANTS = 'ಕಖಗಘಙಚಛಜಝಞಟಠಡಢಣತಥದಧನಪಫಬಭಮಯರಲವಶಷಸಹಳಱೞ'
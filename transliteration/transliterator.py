@@ -29,56 +29,112 @@ but when you see 'k', go into a state where
 
 So each "state" is a dict containing two values for every "key" (character): on
 seeing that character, which state to go to, and how many characters to consume.
+
+The machine is walked by index into the text, and the output is collected in a
+list and joined once, so transliterating takes time linear in the length of the
+text. When every key is a single character (as for SLP1 to IAST), there is no
+need to wait for the next character at all, and str.translate does it instead.
+
+A process usually reads only one or two schemes, so a LazyStateMachine makes
+its state machine on first use, rather than when the module defining it is
+imported.
 """
 
+import threading
+
+
+class StateMachine(object):
+  """The state machine for a table (see MakeStateMachine)."""
+
+  def __init__(self, table):
+    self.root = {}
+    for (key, value) in table.items():
+      # Follow characters of 'key' down the table
+      where = self.root
+      for c in key:
+        where = where.setdefault(c, {})
+      where[''] = value
+    # For str.translate, if all keys are single characters.
+    self.keys = None
+    self.translation = None
+    if all(len(key) == 1 for key in table):
+      self.keys = frozenset(table)
+      self.translation = {ord(key): value for (key, value) in table.items()}
 
 
 def MakeStateMachine(table):
   """Makes SM from a dict like {'a':'अ', 'A':'आ', 'ai':'ऐ', 'au':'औ'}."""
-  root = {}
-  for (key, value) in table.items():
-    # Follow characters of 'key' down the table
-    where = root
-    for c in key:
-      where = where.setdefault(c, {})
-    where[''] = value
-  return root
-
-
-def _LongestRead(state_machine, text):
-  """Finds longest match from state machine at start of the text."""
-  where = state_machine
-  num_seen = 0
-  num_matched = 0
+  return StateMachine(table)
+
+
+class LazyStateMachine(object):
+  """The state machine for the table that make_table returns, made on first use (see Get)."""
+
+  def __init__(self, make_table):
+    self._make_table = make_table
+    self._state_machine = None
+    self._lock = threading.Lock()
+
+  def Get(self):
+    """The StateMachine."""
+    state_machine = self._state_machine
+    if state_machine is None:
+      with self._lock:
+        if self._state_machine is None:
+          self._state_machine = MakeStateMachine(self._make_table())
+        state_machine = self._state_machine
+    return state_machine
+
+  def IsMade(self):
+    return self._state_machine is not None
+
+
+def _LongestRead(root, text, start):
+  """(end, replacement) for the longest key of the state machine at text[start:], or (start, None) if none."""
+  where = root
+  end = start
   replacement = None
-  for c in text:
-    num_seen += 1
-    where = where.get(c)
+  for i in range(start, len(text)):
+    where = where.get(text[i])
     if not where:
-      return (num_matched, replacement)
+      break
     if '' in where:  # If there's a key that terminates here
-      num_matched = num_seen
+      end = i + 1
       replacement = where['']
-  return (num_matched, replacement)
+  return (end, replacement)
+
+
+def _Translate(state_machine, text, pass_through):
+  """Transliterate, for a state machine whose keys are all single characters."""
+  unparsed_characters = set(text).difference(state_machine.keys)
+  if pass_through:
+    unparsed_characters.difference_update(pass_through)
+  translation = state_machine.translation
+  if unparsed_characters:
+    translation = dict(translation)
+    translation.update(dict.fromkeys(map(ord, unparsed_characters)))
+  return (text.translate(translation), unparsed_characters)
 
 
 def Transliterate(state_machine, text, pass_through=None):
   """Transliterates text using the state machine."""
-  transliterated = ''
+  if state_machine.translation is not None:
+    return _Translate(state_machine, text, pass_through)
+  root = state_machine.root
+  pieces = []
   unparsed_characters = set()
   num_parsed = 0
   while num_parsed < len(text):
-    # TODO(shreevatsa): Is text[num_parsed:] doing many copies for long text?
-    (num_matched, replacement) = _LongestRead(state_machine, text[num_parsed:])
-    if num_matched > 0:
-      transliterated += replacement
-      num_parsed += num_matched
+    (end, replacement) = _LongestRead(root, text, num_parsed)
+    if end > num_parsed:
+      pieces.append(replacement)
+      num_parsed = end
     else:
       # Couldn't match anything; strip one char and retry.
       char = text[num_parsed]
       if pass_through and char in pass_through:
-        transliterated += char
+        pieces.append(char)
       else:
         unparsed_characters.add(char)
       num_parsed += 1
-  return (transliterated, unparsed_characters)
+  return (''.join(pieces), unparsed_characters)
@@ -0,0 +1,127 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Tests for the transliteration state machine, the Brahmic script decoders and encoders, and detection."""
+
+
+import unittest
+
+from transliteration import brahmic
+from transliteration import detect
+from transliteration import transliterator
+
+
+class Transliterate(unittest.TestCase):
+
+  def testLongestMatch(self):
+    state_machine = transliterator.MakeStateMachine({'a': 'A', 'ai': 'E', 'k': 'k', 'kh': 'K'})
+    self.assertIsNone(state_machine.translation)
+    self.assertEqual(transliterator.Transliterate(state_machine, 'khaika', ' '), ('KEkA', set()))
+    self.assertEqual(transliterator.Transliterate(state_machine, 'ka x-kh', ' '), ('kA K', {'x', '-'}))
+
+  def testSingleCharacterKeys(self):
+    """A table with only single-character keys is done with str.translate, to the same effect."""
+    state_machine = transliterator.MakeStateMachine({'E': 'ai', 'k': 'k', 'K': 'kh'})
+    self.assertIsNotNone(state_machine.translation)
+    self.assertEqual(transliterator.Transliterate(state_machine, 'KEk', ' '), ('khaik', set()))
+    self.assertEqual(transliterator.Transliterate(state_machine, 'kE x-K', ' '), ('kai kh', {'x', '-'}))
+    self.assertEqual(transliterator.Transliterate(state_machine, 'k k'), ('kk', {' '}))
+
+  def testLongText(self):
+    state_machine = transliterator.MakeStateMachine({'a': 'A', 'ai': 'E'})
+    self.assertEqual(transliterator.Transliterate(state_machine, 'aai' * 100000)[0], 'AE' * 100000)
+
+  def testLazyStateMachine(self):
+    made = []
+    lazy = transliterator.LazyStateMachine(lambda: made.append(1) or {'a': 'A'})
+    self.assertFalse(lazy.IsMade())
+    self.assertEqual(transliterator.Transliterate(lazy.Get(), 'aa'), ('AA', set()))
+    self.assertIs(lazy.Get(), lazy.Get())
+    self.assertEqual(made, [1])
+
+
+class BrahmicDecoder(unittest.TestCase):
+
+  def testDevanagari(self):
+    self.assertEqual(brahmic.Decoder('Devanagari').Decode('कर्मण्येवाधिकारस्ते मा फलेषु', ' '),
+                     ('karmaRyevADikAraste mA Palezu', set()))
+    self.assertEqual(brahmic.Decoder('Devanagari').Decode('ॐ नमः।', ' '), ('oM namaH', {'।'}))
+
+  def testUnusualCharacters(self):
+    """Short e and o, ḷa, a nukta and the Vedic visarga signs are read as usual characters."""
+    self.assertEqual(brahmic.Decoder('Devanagari').Decode('ऎकॊळᳲ'), ('ekolaH', set()))
+    self.assertEqual(brahmic.Decoder('Devanagari').Decode('ऱ़ि'), ('ri', set()))
+
+  def testStrayVowelSign(self):
+    self.assertEqual(brahmic.Decoder('Devanagari').Decode('कािं'), ('kAM', {'ि'}))
+
+  def testOtherScripts(self):
+    for (script, text) in [('Kannada', 'ಕರ್ಮಣ್ಯೇವಾಧಿಕಾರಸ್ತೇ ಮಾ ಫಲೇಷು'),
+                           ('Telugu', 'కర్మణ్యేవాధికారస్తే మా ఫలేషు'),
+                           ('Malayalam', 'കര്മണ്യേവാധികാരസ്തേ മാ ഫലേഷു'),
+                           ('Gujarati', 'કર્મણ્યેવાધિકારસ્તે મા ફલેષુ')]:
+      self.assertEqual(brahmic.Decoder(script).Decode(text, ' '), ('karmaRyevADikAraste mA Palezu', set()))
+    # Bengali has no letter for va, but writes it with that for ba.
+    self.assertEqual(brahmic.Decoder('Bengali').Decode('কর্মণ্যেবাধিকারস্তে', ' '), ('karmaRyebADikAraste', set()))
+
+  def testKannadaVocalicL(self):
+    """ḷ and ḹ, as letters and as vowel signs (which the old table for Kannada left out)."""
+    self.assertEqual(brahmic.Decoder('Kannada').Decode('ಕೢಪ್ತ ಌ ೡ ಕೣ', ' '), ('kxpta x X kX', set()))
+
+  def testMalayalamChillu(self):
+    self.assertEqual(brahmic.Decoder('Malayalam').Decode('അവൻ'), ('avan', set()))
+
+  def testTamil(self):
+    """Superscripts (before or after the vowel sign) for stops that Tamil lacks, and Grantha letters."""
+    self.assertEqual(brahmic.Decoder('Tamil').Decode('க⁴ோ தா⁴ ப²லம் ஶ்ரீ', ' '), ('Go DA Palam SrI', set()))
+    self.assertEqual(brahmic.Decoder('Tamil').Decode('\U00011318', ' '), ('Ga', set()))
+
+  def testUnknownScript(self):
+    self.assertRaises(ValueError, brahmic.Decoder, 'Tengwar')
+
+
+class BrahmicEncoder(unittest.TestCase):
+
+  def testDevanagari(self):
+    self.assertEqual(brahmic.Encoder('Devanagari').Encode('karmaRy evADikAraste', ' '),
+                     ('कर्मण्य् एवाधिकारस्ते', set()))
+    self.assertEqual(brahmic.Encoder('Devanagari').Encode('rAma|'), ('राम', {'|'}))
+
+  def testRoundTrip(self):
+    text = 'kaScit kAntAvirahaguruRA svADikArAt pramattaH'
+    for script in brahmic.SCRIPTS:
+      if script != 'Bengali':
+        self.assertEqual(brahmic.Decoder(script).Decode(brahmic.Encoder(script).Encode(text, ' ')[0], ' '),
+                         (text, set()), script)
+
+  def testTamil(self):
+    self.assertEqual(brahmic.Encoder('Tamil').Encode('DarmakzetraM', ' '), ('த⁴ர்மக்ஷேத்ரம்', set()))
+
+
+class Detect(unittest.TestCase):
+
+  def testScripts(self):
+    for (text, scheme) in [('कर्म', 'Devanagari'), ('ಕರ್ಮ', 'Kannada'), ('కర్మ', 'Telugu'), ('കര്മ', 'Malayalam'),
+                           ('কর্ম', 'Bengali'), ('કર્મ', 'Gujarati'), ('କର୍ମ', 'Oriya'), ('\U00011315', 'Grantha'),
+                           ('க⁴ர்ம', 'Tamil'), ('த⁴ர்ம \U00011313', 'Tamil'), ('karma ।', 'HK')]:
+      self.assertEqual(detect.detect_transliteration_scheme(text), getattr(detect.TRANSLITERATION_SCHEME, scheme), text)
+
+  def testMajority(self):
+    """A few characters of another scheme do not decide it, but lower the confidence."""
+    self.assertEqual(detect.detect_scheme_and_confidence('karmaṇyevādhikāraste mā phaleṣu (कर्म)'),
+                     (detect.TRANSLITERATION_SCHEME.IAST, 5 / 9))
+    self.assertEqual(detect.detect_scheme_and_confidence('कर्मण्येवाधिकारस्ते'),
+                     (detect.TRANSLITERATION_SCHEME.Devanagari, 1.0))
+    self.assertEqual(detect.detect_scheme_and_confidence('karmaNyevAdhikAraste'), (detect.TRANSLITERATION_SCHEME.HK, 1.0))
+
+  def testLongText(self):
+    """Once the beginning of a long text settles the scheme, the rest is not looked at."""
+    text = 'karmaṇyevādhikāraste mā phaleṣu kadācana\n' * 200 + 'कर्मण्येवाधिकारस्ते मा फलेषु कदाचन\n' * 1000
+    self.assertEqual(detect.detect_scheme_and_confidence(text), (detect.TRANSLITERATION_SCHEME.IAST, 1.0))
+    self.assertEqual(detect.detect_transliteration_scheme(text[::-1]), detect.TRANSLITERATION_SCHEME.Devanagari)
+
+  def testSchemeName(self):
+    self.assertEqual(detect.scheme_name(detect.TRANSLITERATION_SCHEME.Telugu), 'Telugu')
+
+
+if __name__ == '__main__':
+  unittest.main()
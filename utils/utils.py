@@ -3,34 +3,94 @@
 """General-purpose utils."""
 
 
-import io
+import collections
+import contextlib
+import contextvars
 import logging
+import threading
 
 
-def call_with_log_capture(function, *args, **kwargs):
-  """Call the function with args and kwargs, and return both its result and logging."""
-  logger = logging.getLogger()
-  # NOTE: logger.level, logger.handlers, handler.level are all undocumented API.
-  original_logger_level = logger.level
-  original_handler_levels = [handler.level for handler in logger.handlers]
-  for handler in logger.handlers:
-    handler.setLevel(max(handler.level, original_logger_level))
-  logger.setLevel(logging.DEBUG)
-  log_capturer_stream = io.StringIO()
-  log_capture_handler = logging.StreamHandler(log_capturer_stream)
-  log_capture_handler.setLevel(logging.DEBUG)
-  logger.addHandler(log_capture_handler)
-
-  return_value = function(*args, **kwargs)
-
-  log_contents = log_capturer_stream.getvalue()
-  log_capturer_stream.close()
-  logger.removeHandler(log_capture_handler)
-  for (i, handler) in enumerate(logger.handlers):
-    handler.setLevel(original_handler_levels[i])
-  logger.setLevel(original_logger_level)
-
-  if log_contents:
-    assert log_contents[-1] == '\n'
-    log_contents = log_contents[:-1]
-  return (return_value, log_contents)
+# The Diagnostics that diagnose() adds to, for the current context (see collect_diagnostics).
+_current_diagnostics = contextvars.ContextVar('diagnostics', default=None)
+
+DiagnosticEntry = collections.namedtuple('DiagnosticEntry', ['level', 'message', 'args'])
+
+
+class Diagnostics(object):
+  """The messages noted by diagnose() while collecting, formatted only when Render() is called."""
+
+  def __init__(self):
+    self.entries = []  # [DiagnosticEntry]
+
+  def Render(self, min_level=logging.DEBUG):
+    """The messages of at least min_level, one after another, as logging would format them."""
+    return '\n'.join(entry.message % entry.args if entry.args else entry.message
+                     for entry in self.entries if entry.level >= min_level)
+
+
+@contextlib.contextmanager
+def collect_diagnostics():
+  """Within the block, diagnose() adds to the Diagnostics that this yields.
+
+  The Diagnostics belongs to the current context (thread or task), so concurrent
+  requests each collect only their own.
+  """
+  diagnostics = Diagnostics()
+  token = _current_diagnostics.set(diagnostics)
+  try:
+    yield diagnostics
+  finally:
+    _current_diagnostics.reset(token)
+
+
+def diagnose(level, message, *args):
+  """Note a message (formatted like logging's, only if needed) for the current collect_diagnostics() block.
+
+  It is also logged, if logging is configured to show messages of its level.
+  """
+  diagnostics = _current_diagnostics.get()
+  if diagnostics is not None:
+    diagnostics.entries.append(DiagnosticEntry(level, message, args))
+  if logging.getLogger().isEnabledFor(level):
+    logging.log(level, message, *args)
+
+
+class LruCache(object):
+  """A dict of at most max_size items, dropping the least recently used. Thread-safe.
+
+  Counts hits, misses and evictions (see Stats()).
+  """
+
+  def __init__(self, max_size):
+    self.max_size = max_size
+    self._items = collections.OrderedDict()
+    self._lock = threading.Lock()
+    self._hits = self._misses = self._evictions = 0
+
+  def Get(self, key, default=None):
+    with self._lock:
+      if key in self._items:
+        self._hits += 1
+        self._items.move_to_end(key)
+        return self._items[key]
+      self._misses += 1
+      return default
+
+  def Put(self, key, value):
+    if self.max_size <= 0:
+      return
+    with self._lock:
+      self._items[key] = value
+      self._items.move_to_end(key)
+      while len(self._items) > self.max_size:
+        self._items.popitem(last=False)
+        self._evictions += 1
+
+  def Clear(self):
+    with self._lock:
+      self._items.clear()
+
+  def Stats(self):
+    with self._lock:
+      return {'size': len(self._items), 'max_size': self.max_size,
+              'hits': self._hits, 'misses': self._misses, 'evictions': self._evictions}
@@ -1,18 +1,73 @@
-"""Views for the identify page."""
+"""Views for the identify page, and for identifying as the verse is typed."""
+
+import json
 
 from flask import render_template, request
 
 from data.metrical_data import HtmlDescription as MetreHtmlDescription
 from data.metrical_data import FurtherHtmlDescription
+import pattern_bits
+from transliteration import detect
 from transliteration import transliterate
 
 
+# How many other metres (see VerseResult.Ranked) to show with the result.
+_NUM_ALTERNATIVES = 4
+
+# How many of the metres that a verse being typed could be to send.
+_NUM_CANDIDATES = 10
+
+
 def _display_name(metre_name):
     assert isinstance(metre_name, str)
     both_names = transliterate.AddDevanagariToIast(metre_name)
     return '<font size="+2">%s</font>' % both_names
 
 
+def _metre_blocks(result):
+    metre_blocks = []
+    for (name, table) in result.tables:
+        metre_block = {
+            'metre_description': MetreHtmlDescription(name),
+            'metre_name': _display_name(name),
+            'block': table,
+            'further_description': FurtherHtmlDescription(name),
+        }
+        metre_blocks.append(metre_block)
+    return metre_blocks
+
+
+def _verse_result(result, single):
+    """What results.html shows about a verse, from its VerseResult.
+
+    Other metres are only ranked, and the nearest metres only found, when single
+    (the only verse), as only then are they shown.
+    """
+    full_match = None
+    results = None
+    result_display_names = None
+    if result.results:
+        (full_match, results) = (result.full_match, result.results)
+        result_display_names = [_display_name(m) for m in results]
+    (unit, start, end) = result.verse_range
+    return {
+        'range': '%s %d–%d' % (unit.capitalize(), start + 1, end),
+        'full_match': full_match,
+        'results': results,
+        'result_display_names': result_display_names,
+        'metre_blocks': _metre_blocks(result),
+        'alternatives': [(_display_name(ranked.metre_name), '%.2f' % ranked.score)
+                         for ranked in result.Ranked(_NUM_ALTERNATIVES + 1)
+                         if ranked.metre_name not in (results or [])][:_NUM_ALTERNATIVES] if single else [],
+        # For verses matching nothing: metres within a couple of wrong syllables.
+        'nearest': [] if results or not single else [
+            (_display_name(metre_name), distance)
+            for (distance, metre_name) in result.Nearest(max_distance=2)[:_NUM_ALTERNATIVES]],
+        'debug_scan': result.DebugScan(),
+        'debug_identify': result.DebugIdentify(),
+    }
+
+
 def identify_page(identifier=None):
     if request.method == 'GET':
         return render_template('main_page.html',
@@ -20,26 +75,20 @@ def identify_page(identifier=None):
 
     # POST: identify the verse
     input_verse = request.form.get('input_verse', '')
+    scheme_name = request.form.get('input_scheme', 'auto')
+    try:
+        input_scheme = detect.scheme_from_name(scheme_name)
+    except ValueError as error:
+        return str(error), 400
 
-    identification = identifier.IdentifyFromLines(input_verse.split('\n'))
+    # Longer inputs are split into verses, each identified by itself.
+    verse_results = list(identifier.IdentifyVerses(input_verse, input_scheme))
+    verses = [_verse_result(result, len(verse_results) == 1) for result in verse_results]
 
-    full_match = None
-    results = None
-    result_display_names = None
-    if identification and identification[1]:
-        (full_match, results) = identification
-        result_display_names = [_display_name(m) for m in results]
-
-    metre_blocks = []
-    if identifier.tables:
-        for (name, table) in identifier.tables:
-            metre_block = {
-                'metre_description': MetreHtmlDescription(name),
-                'metre_name': _display_name(name),
-                'block': table,
-                'further_description': FurtherHtmlDescription(name),
-            }
-            metre_blocks.append(metre_block)
+    single = verses[0] if len(verses) == 1 else {}
+    if single:
+        verses = []
+    result_display_names = single.get('result_display_names')
 
     bug_title = 'User feedback'
     bug_body = '''
@@ -53,14 +102,34 @@ The issue is:
 ''' % input_verse
     return render_template('results.html',
                            default_identify_input=input_verse,
-                           results=results,
-                           full_match=full_match,
+                           input_scheme=scheme_name,
+                           verses=verses,
+                           results=single.get('results'),
+                           full_match=single.get('full_match'),
                            first_result_display_name=(result_display_names[0]
                                                       if result_display_names else None),
                            result_display_names=result_display_names,
-                           debug_read=identifier.DebugRead(),
-                           debug_scan=identifier.DebugScan(),
-                           debug_identify=identifier.DebugIdentify(),
-                           metre_blocks=metre_blocks,
+                           debug_read=verse_results[0].DebugRead() if verse_results else '',
+                           debug_scan=single.get('debug_scan', ''),
+                           debug_identify=single.get('debug_identify', ''),
+                           metre_blocks=single.get('metre_blocks'),
+                           alternatives=single.get('alternatives'),
+                           nearest=single.get('nearest'),
                            bug_title=bug_title,
                            bug_body=bug_body)
+
+
+def identify_as_you_type_api(incremental=None):
+    """JSON for the text typed so far (see IncrementalPipeline.Identify)."""
+    try:
+        input_scheme = detect.scheme_from_name(request.form.get('input_scheme', 'auto'))
+    except ValueError as error:
+        return str(error), 400
+    typed = incremental.Identify(request.form.get('input_verse', ''), input_scheme)
+    ret = {
+        'pattern_lines': [pattern_bits.ToString(line) for line in typed.pattern_lines],
+        'exact': typed.exact,
+        'candidates': typed.candidates[:_NUM_CANDIDATES],
+        'num_candidates': len(typed.candidates),
+    }
+    return json.dumps(ret), 200, {'Content-Type': 'application/json'}
@@ -6,6 +6,7 @@ from flask import render_template, request
 
 from texts.read_gretil import metres_for_text, find_alignment
 from print_utils import Print
+from transliteration import detect
 
 
 def main_page():
@@ -20,10 +21,16 @@ def fulltext_data():
     if request.method == 'GET':
         return 'Please POST (with parameter fulltext).'
     text = request.form.get('fulltext', '')
+    scheme_name = request.form.get('input_scheme', 'auto')
+    try:
+        detect.scheme_from_name(scheme_name)
+    except ValueError as error:
+        return str(error), 400
     dummy_args = {
         'print_unidentified_verses': 'brief',
         'print_identified_verses': 'brief',
         'break_at_error': None,
+        'input_scheme': scheme_name,
     }
     ret = metres_for_text(text, dummy_args, custom_splitter=None)
     return json.dumps(ret), 200, {'Content-Type': 'application/json'}